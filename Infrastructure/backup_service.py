@@ -2,14 +2,30 @@
 import os
 import shutil
 import json
+import zipfile
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 from sqlalchemy import text
-from infrastructure.database.session import engine, SessionLocal
+from infrastructure.database.config import get_database_config_manager
+from infrastructure.database.session import run_in_transaction
+from infrastructure.database.read_session import read_session_scope
 from infrastructure.database.models.product_model import ProductModel
 from infrastructure.database.models.order_model import OrderModel
-from infrastructure.database.models.order_item_model import OrderItemModel
+from infrastructure.database.order_totals import set_order_totals_from_lines
+from infrastructure.database.sales_rollup import rebuild_daily_sales
+from infrastructure.database.order_item_writer import insert_order_items, item_row
+from infrastructure.database.change_tracking import record_orders_removed
+from infrastructure.database.repositories.order_repository_sqlalchemy import (
+    OrderFilter, stream_order_models
+)
+from infrastructure.json_stream import read_ndjson, write_json_array, write_ndjson
+
+# سفارشات پشتیبان‌های جدید خط به خط (NDJSON)؛ orders.json فقط در پشتیبان‌های قدیمی
+ORDERS_FILE = "orders.ndjson"
+LEGACY_ORDERS_FILE = "orders.json"
 
 
 class BackupService:
@@ -35,8 +51,9 @@ class BackupService:
             metadata = {
                 "timestamp": datetime.now().isoformat(),
                 "description": description,
-                "version": "1.0",
-                "type": "full_backup"
+                "version": "1.1",
+                "type": "full_backup",
+                "orders_file": ORDERS_FILE
             }
 
             with open(backup_path / "backup_info.json", "w", encoding="utf-8") as f:
@@ -125,11 +142,23 @@ class BackupService:
 
         backup_path.unlink()
 
+    def export_orders(self, path: str, order_filter: OrderFilter = OrderFilter(),
+                      include_archive: bool = True) -> int:
+        """
+        خروجی سفارشات (با آیتم‌ها) برای تحلیل: .json یک آرایه، در غیر این
+        صورت NDJSON. سفارشات دسته به دسته نوشته می‌شوند و حافظه ثابت می‌ماند.
+        """
+        with read_session_scope(timeout_ms=0) as session, \
+                open(path, "w", encoding="utf-8") as f:
+            records = self._orders_data(session, order_filter, include_archive)
+            if Path(path).suffix == ".json":
+                return write_json_array(f, records)
+            return write_ndjson(f, records)
+
     def _backup_database(self, backup_path: Path) -> None:
         """پشتیبان‌گیری از دیتابیس"""
-        session = SessionLocal()
-
-        try:
+        # یک snapshot سازگار روی موتور فقط‌خواندنی، بدون محدودیت زمان گزارش‌ها
+        with read_session_scope(timeout_ms=0) as session:
             # پشتیبان محصولات
             products = session.query(ProductModel).all()
             products_data = [
@@ -146,34 +175,35 @@ class BackupService:
             with open(backup_path / "products.json", "w", encoding="utf-8") as f:
                 json.dump(products_data, f, ensure_ascii=False, indent=2)
 
-            # پشتیبان سفارشات
-            orders = session.query(OrderModel).all()
-            orders_data = []
-
-            for order in orders:
-                order_items = session.query(OrderItemModel).filter_by(order_id=order.id).all()
-                order_data = {
-                    "id": order.id,
-                    "table_number": order.table_number,
-                    "status": order.status,
-                    "discount": order.discount,
-                    "created_at": order.created_at.isoformat() if order.created_at else None,
-                    "items": [
-                        {
-                            "product_name": item.product_name,
-                            "unit_price": item.unit_price,
-                            "quantity": item.quantity
-                        }
-                        for item in order_items
-                    ]
+            # پشتیبان سفارشات (بایگانی شده و زنده)، دسته به دسته و بدون نگه‌داشتن همه در حافظه
+            with open(backup_path / ORDERS_FILE, "w", encoding="utf-8") as f:
+                write_ndjson(f, self._orders_data(session, OrderFilter(), include_archive=True))
+
+    def _orders_data(self, session, order_filter: OrderFilter,
+                     include_archive: bool) -> Iterator[Dict]:
+        # آیتم‌ها همراه هر دسته بارگذاری می‌شوند، نه یک کوئری برای هر سفارش
+        for batch in stream_order_models(session, order_filter, include_archive):
+            for order in batch:
+                yield self._order_data(order, order.items)
+
+    @staticmethod
+    def _order_data(order, order_items) -> Dict:
+        return {
+            "id": order.id,
+            "table_number": order.table_number,
+            "status": order.status,
+            "discount": order.discount,
+            "created_at": order.created_at.isoformat() if order.created_at else None,
+            "items": [
+                {
+                    "product_id": item.product_id,
+                    "product_name": item.product_name,
+                    "unit_price": item.unit_price,
+                    "quantity": item.quantity
                 }
-                orders_data.append(order_data)
-
-            with open(backup_path / "orders.json", "w", encoding="utf-8") as f:
-                json.dump(orders_data, f, ensure_ascii=False, indent=2)
-
-        finally:
-            session.close()
+                for item in order_items
+            ]
+        }
 
     def _backup_config_files(self, backup_path: Path) -> None:
         """پشتیبان‌گیری از فایل‌های تنظیمات"""
@@ -182,19 +212,21 @@ class BackupService:
 
     def _restore_database(self, backup_path: Path) -> None:
         """بازیابی دیتابیس از پشتیبان"""
-        session = SessionLocal()
+        with open(backup_path / "products.json", "r", encoding="utf-8") as f:
+            products_data = json.load(f)
 
-        try:
-            # پاک کردن داده‌های موجود
+        batch_size = get_database_config_manager().config.stream_batch_size
+
+        def restore(session) -> None:
+            # پاک کردن داده‌های موجود؛ سفارشات بایگانی شده به جداول اصلی برمی‌گردند
+            # و در اجرای بعدی بایگانی دوباره منتقل می‌شوند
+            session.execute(text("DELETE FROM order_items_archive"))
+            session.execute(text("DELETE FROM orders_archive"))
             session.execute(text("DELETE FROM order_items"))
             session.execute(text("DELETE FROM orders"))
             session.execute(text("DELETE FROM products"))
-            session.commit()
 
             # بازیابی محصولات
-            with open(backup_path / "products.json", "r", encoding="utf-8") as f:
-                products_data = json.load(f)
-
             for product_data in products_data:
                 product = ProductModel(
                     id=product_data["id"],
@@ -205,62 +237,98 @@ class BackupService:
                 )
                 session.add(product)
 
-            session.commit()
-
-            # بازیابی سفارشات
-            with open(backup_path / "orders.json", "r", encoding="utf-8") as f:
-                orders_data = json.load(f)
-
-            for order_data in orders_data:
-                # ایجاد سفارش
-                order = OrderModel(
-                    id=order_data["id"],
-                    table_number=order_data["table_number"],
-                    status=order_data["status"],
-                    discount=order_data["discount"],
-                    created_at=datetime.fromisoformat(order_data["created_at"]) if order_data["created_at"] else None
-                )
-                session.add(order)
-                session.flush()  # برای گرفتن ID
-
-                # ایجاد آیتم‌های سفارش
-                for item_data in order_data["items"]:
-                    order_item = OrderItemModel(
-                        order_id=order.id,
-                        product_name=item_data["product_name"],
-                        unit_price=item_data["unit_price"],
-                        quantity=item_data["quantity"]
-                    )
-                    session.add(order_item)
-
-            session.commit()
-
-        finally:
-            session.close()
+            session.flush()
+
+            # بازیابی سفارشات؛ همه با یک شماره تغییر جدید که حذف سفارشات قبلی را هم
+            # ثبت می‌کند، تا کلاینت‌ها فهرست را از نو بخوانند
+            restored_seq = record_orders_removed(session)
+            restored_at = datetime.utcnow()
+            with self._open_orders(backup_path) as orders_data:
+                batch = list(islice(orders_data, batch_size))
+                while batch:
+                    self._restore_orders(session, batch, restored_seq, restored_at)
+                    batch = list(islice(orders_data, batch_size))
+
+            # بازسازی جدول خلاصه فروش روزانه از سفارشات بازیابی‌شده
+            rebuild_daily_sales(session.connection())
+
+        # حذف و درج در یک تراکنش انجام می‌شود تا بازیابی ناقص باقی نماند
+        run_in_transaction(restore)
+
+    @staticmethod
+    def _restore_orders(session, orders_data: List[Dict], restored_seq: int,
+                        restored_at: datetime) -> None:
+        """درج یک دسته از سفارشات پشتیبان با آیتم‌هایشان"""
+        item_rows = []
+        for order_data in orders_data:
+            # ایجاد سفارش
+            order = OrderModel(
+                id=order_data["id"],
+                table_number=order_data["table_number"],
+                status=order_data["status"].lower(),
+                discount=order_data["discount"],
+                created_at=datetime.fromisoformat(order_data["created_at"]) if order_data["created_at"] else None,
+                updated_at=restored_at,
+                change_seq=restored_seq
+            )
+            set_order_totals_from_lines(
+                order,
+                [(item["unit_price"], item["quantity"]) for item in order_data["items"]]
+            )
+            session.add(order)
+
+            # آیتم‌های سفارش (شناسه سفارش از پشتیبان می‌آید)
+            for item_data in order_data["items"]:
+                item_rows.append(item_row(
+                    order_data["id"],
+                    item_data["product_name"],
+                    item_data["unit_price"],
+                    item_data["quantity"],
+                    # پشتیبان‌های قدیمی product_id ندارند
+                    item_data.get("product_id")
+                ))
+
+        # درج دسته‌ای آیتم‌های این دسته پس از ثبت سفارشات
+        session.flush()
+        insert_order_items(session, item_rows)
+        # سفارشات نوشته شده دیگر لازم نیستند؛ حافظه با تعداد دسته‌ها رشد نمی‌کند
+        session.expunge_all()
+
+    @staticmethod
+    @contextmanager
+    def _open_orders(backup_path: Path) -> Iterator[Iterator[Dict]]:
+        """سفارشات پشتیبان یکی یکی؛ پشتیبان‌های قدیمی یک آرایه JSON هستند"""
+        if (backup_path / ORDERS_FILE).exists():
+            with open(backup_path / ORDERS_FILE, "r", encoding="utf-8") as f:
+                yield read_ndjson(f)
+        else:
+            with open(backup_path / LEGACY_ORDERS_FILE, "r", encoding="utf-8") as f:
+                yield iter(json.load(f))
 
     def _validate_backup(self, backup_path: Path) -> bool:
-        """بررسی اعتبار فایل پشتیبان"""
+        """بررسی اعتبار فایل پشتیبان (فایل zip ساخته‌شده توسط create_backup)"""
         try:
-            # بررسی وجود فایل اطلاعات پشتیبان
-            info_file = backup_path / "backup_info.json"
-            if not info_file.exists():
-                return False
+            with zipfile.ZipFile(backup_path) as archive:
+                names = set(archive.namelist())
 
-            # بررسی وجود فایل‌های داده
-            if not (backup_path / "products.json").exists():
-                return False
+                # بررسی وجود فایل اطلاعات پشتیبان
+                if "backup_info.json" not in names:
+                    return False
 
-            if not (backup_path / "orders.json").exists():
-                return False
+                # بررسی وجود فایل‌های داده
+                if "products.json" not in names:
+                    return False
+
+                if ORDERS_FILE not in names and LEGACY_ORDERS_FILE not in names:
+                    return False
 
-            # بررسی محتوای فایل اطلاعات
-            with open(info_file, "r", encoding="utf-8") as f:
-                info = json.load(f)
+                # بررسی محتوای فایل اطلاعات
+                info = json.loads(archive.read("backup_info.json").decode("utf-8"))
 
             if info.get("type") != "full_backup":
                 return False
 
             return True
 
-        except (json.JSONDecodeError, KeyError):
+        except (zipfile.BadZipFile, json.JSONDecodeError, KeyError):
             return False
@@ -0,0 +1,132 @@
+# infrastructure/database/archive.py
+"""
+Hot/cold order archival.
+
+Closed and cancelled orders older than `archive_after_days` are moved from
+`orders`/`order_items` into `orders_archive`/`order_items_archive` in the same
+database, so the POS refresh, open-order lookups and the web order list only
+scan recent rows. Archived orders keep their ids and are read-only; reports
+and the web order history read both stores through `all_orders()` and
+`all_order_items()`. The daily sales rollup is not touched by archival.
+
+Run from the command line (optionally with the age in days):
+
+    python -m infrastructure.database.archive [days]
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import Table, func, insert, literal, select, delete, union_all
+from sqlalchemy.orm import Session
+
+from infrastructure.database.change_tracking import record_orders_removed
+from infrastructure.database.config import get_database_config_manager
+from infrastructure.database.models.order_model import OrderModel
+from infrastructure.database.models.order_item_model import OrderItemModel
+from infrastructure.database.models.archive_model import (
+    OrderArchiveModel, OrderItemArchiveModel
+)
+
+ARCHIVABLE_STATUSES = ("closed", "cancelled")
+
+orders_table: Table = OrderModel.__table__
+order_items_table: Table = OrderItemModel.__table__
+orders_archive_table: Table = OrderArchiveModel.__table__
+order_items_archive_table: Table = OrderItemArchiveModel.__table__
+
+
+def _shared_columns(live: Table, archive: Table, exclude=()) -> List[str]:
+    return [column.name for column in live.columns
+            if column.name in archive.columns and column.name not in exclude]
+
+
+def archive_batch(session: Session, cutoff: datetime, batch_size: int) -> int:
+    """Move one batch of old orders with their items; returns how many orders moved"""
+    order_ids = session.execute(
+        select(orders_table.c.id)
+        .where(
+            orders_table.c.status.in_(ARCHIVABLE_STATUSES),
+            orders_table.c.created_at < cutoff,
+            # The newest order never leaves `orders`, so SQLite never reuses
+            # an id that already exists in the archive
+            orders_table.c.id < select(func.max(orders_table.c.id)).scalar_subquery()
+        )
+        .order_by(orders_table.c.id)
+        .limit(batch_size)
+    ).scalars().all()
+    if not order_ids:
+        return 0
+
+    order_columns = _shared_columns(orders_table, orders_archive_table)
+    session.execute(
+        insert(orders_archive_table).from_select(
+            order_columns + ["archived_at"],
+            select(*[orders_table.c[name] for name in order_columns],
+                   literal(datetime.utcnow()))
+            .where(orders_table.c.id.in_(order_ids))
+        )
+    )
+    # Item ids are not kept: the live table may hand them out again
+    item_columns = _shared_columns(order_items_table, order_items_archive_table, exclude=("id",))
+    session.execute(
+        insert(order_items_archive_table).from_select(
+            item_columns,
+            select(*[order_items_table.c[name] for name in item_columns])
+            .where(order_items_table.c.order_id.in_(order_ids))
+            .order_by(order_items_table.c.id)
+        )
+    )
+    session.execute(delete(order_items_table).where(order_items_table.c.order_id.in_(order_ids)))
+    session.execute(delete(orders_table).where(orders_table.c.id.in_(order_ids)))
+    record_orders_removed(session)
+    return len(order_ids)
+
+
+def archive_old_orders(days: Optional[int] = None) -> int:
+    """Archive every eligible order in short transactions; returns the total moved"""
+    from infrastructure.database.session import run_in_transaction
+
+    config = get_database_config_manager().config
+    days = config.archive_after_days if days is None else days
+    if days <= 0:
+        return 0
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    moved = 0
+    while True:
+        count = run_in_transaction(
+            lambda session: archive_batch(session, cutoff, config.archive_batch_size)
+        )
+        moved += count
+        if count < config.archive_batch_size:
+            break
+    if moved:
+        print(f"📦 Archived {moved} order(s) older than {days} days")
+    return moved
+
+
+def all_orders():
+    """Live and archived orders as one selectable (columns of `orders`)"""
+    columns = _shared_columns(orders_table, orders_archive_table)
+    return union_all(
+        select(*[orders_table.c[name] for name in columns]),
+        select(*[orders_archive_table.c[name] for name in columns])
+    ).subquery("all_orders")
+
+
+def all_order_items():
+    """Live and archived order items as one selectable"""
+    columns = _shared_columns(order_items_table, order_items_archive_table, exclude=("id",))
+    return union_all(
+        select(*[order_items_table.c[name] for name in columns]),
+        select(*[order_items_archive_table.c[name] for name in columns])
+    ).subquery("all_order_items")
+
+
+if __name__ == "__main__":
+    import sys
+
+    from infrastructure.database.session import init_db
+
+    init_db()
+    archive_old_orders(int(sys.argv[1]) if len(sys.argv) > 1 else None)
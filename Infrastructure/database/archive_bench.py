@@ -0,0 +1,148 @@
+# infrastructure/database/archive_bench.py
+"""
+Hot-path latency before and after archival. A fresh temporary database is
+filled with two years of synthetic orders (closed and cancelled ones over
+the whole period, a few open ones today), the POS and web order queries are
+timed, the orders older than `archive_after_days` are archived, and the
+same queries are timed again.
+
+    python -m infrastructure.database.archive_bench [orders_per_day] [days]
+"""
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import create_engine, event, func, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from infrastructure.database.archive import archive_batch
+from infrastructure.database.config import get_database_config_manager
+from infrastructure.database.models.archive_model import OrderArchiveModel
+from infrastructure.database.models.order_item_model import OrderItemModel
+from infrastructure.database.models.order_model import OrderModel
+from infrastructure.database.repositories.order_repository_sqlalchemy import (
+    OrderFilter, OrderRepositorySQLAlchemy
+)
+from infrastructure.database.session import apply_sqlite_pragmas
+from infrastructure.database.write_bench import _fresh_database
+
+TABLES = 20
+OPEN_ORDERS = 15
+ROUNDS = 200
+MENU = [("Espresso", 90_000), ("Latte", 140_000), ("Tea", 60_000), ("Croissant", 120_000),
+        ("Cheesecake", 180_000), ("Sandwich", 220_000), ("Water", 30_000)]
+
+
+def _synthetic_orders(session: Session, orders_per_day: int, days: int) -> int:
+    """Orders spread over the last `days` days, inserted day by day"""
+    random.seed(8)
+    now = datetime.utcnow()
+    start = now - timedelta(days=days)
+    total = 0
+    for day in range(days + 1):
+        midnight = start + timedelta(days=day)
+        orders, lines = [], []
+        count = OPEN_ORDERS if day == days else orders_per_day
+        for _ in range(count):
+            created = midnight + timedelta(seconds=random.randint(0, 86399))
+            if day == days:
+                created, status = now - timedelta(minutes=random.randint(1, 120)), "open"
+            else:
+                status = "cancelled" if random.random() < 0.05 else "closed"
+            items = [(name, price, random.randint(1, 3))
+                     for name, price in random.sample(MENU, random.randint(1, 4))]
+            subtotal = sum(price * quantity for _, price, quantity in items)
+            orders.append({"table_number": random.randint(1, TABLES), "status": status,
+                           "discount": 0, "created_at": created, "subtotal": subtotal,
+                           "total": subtotal, "item_count": sum(q for _, _, q in items),
+                           "version": 1, "change_seq": 0})
+            lines.append(items)
+        order_ids = session.scalars(
+            insert(OrderModel).returning(OrderModel.id, sort_by_parameter_order=True), orders
+        ).all()
+        session.execute(insert(OrderItemModel), [
+            {"order_id": order_id, "product_id": None, "product_name": name,
+             "unit_price": price, "quantity": quantity}
+            for order_id, items in zip(order_ids, lines) for name, price, quantity in items
+        ])
+        total += len(orders)
+    return total
+
+
+def _hot_paths() -> List[Tuple[str, Callable[[OrderRepositorySQLAlchemy], object]]]:
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return [
+        ("open order by table", lambda repo: repo.get_open_order_id_by_table(random.randint(1, TABLES))),
+        ("open orders (POS)", lambda repo: repo.list_open_orders()),
+        ("order list, page 1", lambda repo: repo.list_orders_page(OrderFilter(newest_first=True, limit=50))),
+        ("today's orders", lambda repo: repo.list_orders(OrderFilter(created_from=today))),
+        ("table history", lambda repo: repo.list_orders(
+            OrderFilter(table_number=random.randint(1, TABLES), newest_first=True, limit=20))),
+    ]
+
+
+def _time_hot_paths(sessions: sessionmaker) -> Dict[str, Tuple[float, float]]:
+    timings = {}
+    with sessions() as session:
+        repo = OrderRepositorySQLAlchemy(session)
+        for name, query in _hot_paths():
+            query(repo)  # warm up the statement cache and the page cache
+            samples = []
+            for _ in range(ROUNDS):
+                started = time.perf_counter()
+                query(repo)
+                samples.append((time.perf_counter() - started) * 1000)
+                session.expunge_all()
+            samples.sort()
+            timings[name] = (statistics.median(samples),
+                             samples[min(len(samples) - 1, int(len(samples) * 0.99))])
+    return timings
+
+
+def run_benchmark(orders_per_day: int = 150, days: int = 730) -> None:
+    config = get_database_config_manager().config
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(_fresh_database(directory, "archive.db"))
+        event.listen(engine, "connect", lambda conn, record: apply_sqlite_pragmas(conn, config))
+        sessions = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+        started = time.perf_counter()
+        with sessions() as session, session.begin():
+            total = _synthetic_orders(session, orders_per_day, days)
+        print(f"{total} orders over {days} days generated in {time.perf_counter() - started:.1f} s")
+        with engine.connect() as conn:
+            conn.exec_driver_sql("ANALYZE")
+        before = _time_hot_paths(sessions)
+
+        started = time.perf_counter()
+        cutoff = datetime.utcnow() - timedelta(days=config.archive_after_days)
+        while True:
+            with sessions() as session, session.begin():
+                moved = archive_batch(session, cutoff, config.archive_batch_size)
+            if moved < config.archive_batch_size:
+                break
+        with sessions() as session:
+            live = session.scalar(select(func.count()).select_from(OrderModel))
+            archived = session.scalar(select(func.count()).select_from(OrderArchiveModel))
+        print(f"archived {archived} orders older than {config.archive_after_days} days "
+              f"in {time.perf_counter() - started:.1f} s, {live} stay live")
+        with engine.connect() as conn:
+            conn.exec_driver_sql("ANALYZE")
+        after = _time_hot_paths(sessions)
+        engine.dispose()
+
+    print(f"{'':<22}{'before p50':>11}{'p99':>8}{'after p50':>11}{'p99':>8}")
+    for name in before:
+        print(f"{name:<22}{before[name][0]:>11.2f}{before[name][1]:>8.2f}"
+              f"{after[name][0]:>11.2f}{after[name][1]:>8.2f}")
+
+
+if __name__ == "__main__":
+    run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 150,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 730,
+    )
@@ -0,0 +1,73 @@
+# infrastructure/database/async_session.py
+"""
+Async engine for the web API.
+
+The FastAPI routes run on the single event loop started by
+`ServerRunner._run_server`; they must never wait on SQLite synchronously.
+This engine talks to the same cafe.db through aiosqlite, with the same
+pragma profile as the desktop engine in `session.py`.
+"""
+from typing import AsyncIterator
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from infrastructure.database.session import DATABASE_URL, apply_sqlite_pragmas, db_config
+from infrastructure.database.query_stats import instrument_engine
+from infrastructure.database.slow_query_log import install_slow_query_log
+from infrastructure.database.read_session import configure_read_only_engine
+
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    connect_args={"timeout": db_config.busy_timeout_ms / 1000}
+)
+
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    apply_sqlite_pragmas(dbapi_connection, db_config)
+
+
+instrument_engine(async_engine.sync_engine)
+install_slow_query_log(async_engine.sync_engine, db_config)
+
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency: one session per request, closed (and rolled back
+    if uncommitted) when the response is done"""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+# Read-only engine for the dashboard and reports (see read_session.py):
+# separate pool, query_only connections, one snapshot per request
+async_read_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    connect_args={"timeout": db_config.busy_timeout_ms / 1000}
+)
+configure_read_only_engine(async_read_engine.sync_engine, db_config)
+instrument_engine(async_read_engine.sync_engine)
+install_slow_query_log(async_read_engine.sync_engine, db_config)
+
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=async_read_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+async def get_async_read_session() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency for read-only routes"""
+    async with AsyncReadSessionLocal() as session:
+        yield session
@@ -0,0 +1,88 @@
+# infrastructure/database/change_detector.py
+"""
+Cheap cross-process change detection.
+
+`PRAGMA data_version` returns a different value whenever another connection
+(in this process or any other one, e.g. the web server) has committed to the
+database file since the previous call on the same connection, and costs a
+few microseconds. The detector keeps one private connection for it and only
+when it moved reads the per-table counters that triggers keep in
+`change_counters` (rows named `table:<name>`, installed by migration 7).
+
+Pollers create a `ChangeWatch` for the tables they show and skip their
+reload while `changed()` is empty:
+
+    watch = get_change_detector().watch(("orders", "order_items"))
+    if watch.changed():
+        reload()
+"""
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Set
+
+TABLE_COUNTER_PREFIX = "table:"
+
+
+class ChangeDetector:
+    """Reports per-table change counters, reading them only after a commit"""
+
+    def __init__(self, database_path: str):
+        # Autocommit connection: it must never hold a read snapshot open
+        self._conn = sqlite3.connect(database_path, check_same_thread=False,
+                                     isolation_level=None)
+        self._lock = threading.Lock()
+        self._data_version: Optional[int] = None
+        self._versions: Dict[str, int] = {}
+
+    def versions(self) -> Dict[str, int]:
+        """Current counter of every watched table"""
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                rows = self._conn.execute(
+                    "SELECT name, value FROM change_counters WHERE name LIKE ?",
+                    (TABLE_COUNTER_PREFIX + "%",)
+                ).fetchall()
+                self._versions = {
+                    name[len(TABLE_COUNTER_PREFIX):]: value for name, value in rows
+                }
+                self._data_version = data_version
+            return self._versions
+
+    def watch(self, tables: Iterable[str]) -> "ChangeWatch":
+        return ChangeWatch(self, tables)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class ChangeWatch:
+    """One poller's view: which of its tables changed since it last asked"""
+
+    def __init__(self, detector: ChangeDetector, tables: Iterable[str]):
+        self._detector = detector
+        self._tables = tuple(tables)
+        # None until the first poll, so that poll reports every table
+        self._seen: Dict[str, Optional[int]] = {table: None for table in self._tables}
+
+    def changed(self) -> Set[str]:
+        versions = self._detector.versions()
+        changed = {table for table in self._tables
+                   if versions.get(table) != self._seen[table]}
+        for table in changed:
+            self._seen[table] = versions.get(table)
+        return changed
+
+
+_change_detector: Optional[ChangeDetector] = None
+_change_detector_lock = threading.Lock()
+
+
+def get_change_detector() -> ChangeDetector:
+    """Process-wide detector on the configured database file"""
+    global _change_detector
+    with _change_detector_lock:
+        if _change_detector is None:
+            from infrastructure.database.session import engine
+            _change_detector = ChangeDetector(engine.url.database)
+        return _change_detector
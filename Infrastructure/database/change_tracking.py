@@ -0,0 +1,71 @@
+# infrastructure/database/change_tracking.py
+"""
+Order versions and the global change sequence.
+
+Every write to an order bumps its `version`, stamps `updated_at` and gives it
+the next value of the `orders` change counter in `change_seq`. The counter
+is incremented inside the writing transaction, and SQLite lets only one
+writer commit at a time, so sequence numbers become visible in increasing
+order: a client that remembers the highest sequence it has seen (its
+cursor) can ask for `change_seq > cursor` and never miss a change.
+
+Orders deleted from `orders` (moved to the archive, or wiped by a restore)
+leave no row to find that way. Each such removal takes a sequence number
+too and records it in the `orders_removed` counter: a client whose cursor
+is older reloads its list instead of merging changes.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from infrastructure.database.models.change_counter_model import ChangeCounterModel
+
+ORDERS_COUNTER = "orders"
+REMOVED_COUNTER = "orders_removed"  # change_seq of the latest removal
+
+
+def next_change_seq(session: Session, name: str = ORDERS_COUNTER) -> int:
+    """Allocate the next sequence number of a counter in the current transaction"""
+    return session.execute(
+        text(
+            "INSERT INTO change_counters (name, value) VALUES (:name, 1)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + 1"
+            " RETURNING value"
+        ),
+        {"name": name}
+    ).scalar_one()
+
+
+def current_change_seq(session: Session, name: str = ORDERS_COUNTER) -> int:
+    """Latest sequence number handed out (0 before the first change)"""
+    return session.execute(
+        select(ChangeCounterModel.value).where(ChangeCounterModel.name == name)
+    ).scalar() or 0
+
+
+def record_orders_removed(session: Session) -> int:
+    """Record that orders left `orders` in the current transaction; returns its sequence number"""
+    seq = next_change_seq(session)
+    session.execute(
+        text(
+            "INSERT INTO change_counters (name, value) VALUES (:name, :seq)"
+            " ON CONFLICT(name) DO UPDATE SET value = excluded.value"
+        ),
+        {"name": REMOVED_COUNTER, "seq": seq}
+    )
+    return seq
+
+
+def orders_removed_since(session: Session, cursor: int) -> bool:
+    """Whether orders were removed after `cursor` (then changes alone are not enough)"""
+    return current_change_seq(session, REMOVED_COUNTER) > cursor
+
+
+def touch_order(session: Session, order_model, now: Optional[datetime] = None) -> int:
+    """Record a change to an order: new version, updated_at and change_seq"""
+    order_model.version = (order_model.version or 0) + 1
+    order_model.updated_at = now or datetime.utcnow()
+    order_model.change_seq = next_change_seq(session)
+    return order_model.change_seq
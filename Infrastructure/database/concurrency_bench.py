@@ -0,0 +1,126 @@
+# infrastructure/database/concurrency_bench.py
+"""
+Mixed read/write benchmark for the SQLite engine profile: reader threads
+poll the newest orders with their items (like the POS refresh and the web
+order list), while writer threads save orders. The workload runs once on a
+bare engine with SQLite's defaults (rollback journal, synchronous=FULL, no
+retry), and once with the configured profile from `database_config.json`
+(WAL, synchronous, busy_timeout, cache/mmap sizes) plus `with_busy_retry`.
+Each run uses a fresh temporary database.
+
+    python -m infrastructure.database.concurrency_bench [readers] [writers] [seconds]
+"""
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from infrastructure.database.config import DatabaseConfig, get_database_config_manager
+from infrastructure.database.repositories.order_repository_sqlalchemy import (
+    OrderFilter, OrderRepositorySQLAlchemy
+)
+from infrastructure.database.session import apply_sqlite_pragmas, is_busy_error, with_busy_retry
+from infrastructure.database.write_bench import _fresh_database, save_order
+
+NEWEST_ORDERS = OrderFilter(newest_first=True, limit=20)
+SEED_ORDERS = 500
+
+
+def _run_for(seconds: float, workers: Dict[str, int], work: Callable[[str, int], None]) -> Dict:
+    """Run `work(kind, index)` in a loop on every worker thread until the time is up"""
+    results = {kind: {"latencies": [], "errors": 0} for kind in workers}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(kind: str, index: int) -> None:
+        latencies, errors = [], 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                work(kind, index)
+            except Exception as e:
+                if not is_busy_error(e):
+                    raise
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+        with lock:
+            results[kind]["latencies"].extend(latencies)
+            results[kind]["errors"] += errors
+
+    pool = [threading.Thread(target=worker, args=(kind, i))
+            for kind, count in workers.items() for i in range(count)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return results
+
+
+def bench_profile(url: str, config: Optional[DatabaseConfig], readers: int, writers: int,
+                  seconds: float) -> Dict:
+    """`config` None: the bare engine the app used before the profile"""
+    connect_args = {"check_same_thread": False}
+    if config is not None:
+        connect_args["timeout"] = config.busy_timeout_ms / 1000
+    engine = create_engine(url, pool_size=readers + writers, max_overflow=0,
+                           connect_args=connect_args)
+    if config is not None:
+        event.listen(engine, "connect", lambda conn, record: apply_sqlite_pragmas(conn, config))
+    sessions = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    def write_once(table_number: int) -> None:
+        with sessions() as session, session.begin():
+            save_order(session, table_number)
+
+    for number in range(SEED_ORDERS):
+        write_once(number % 20 + 1)
+
+    def work(kind: str, index: int) -> None:
+        if kind == "read":
+            with sessions() as session:
+                OrderRepositorySQLAlchemy(session).list_orders(NEWEST_ORDERS)
+        elif config is None:
+            write_once(index + 1)
+        else:
+            with_busy_retry(lambda: write_once(index + 1))
+
+    results = _run_for(seconds, {"read": readers, "write": writers}, work)
+    engine.dispose()
+    return results
+
+
+def _report(name: str, results: Dict, seconds: float) -> None:
+    for kind in ("read", "write"):
+        latencies = sorted(results[kind]["latencies"])
+        if latencies:
+            p50 = statistics.median(latencies)
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        else:
+            p50 = p99 = float("nan")
+        print(f"{name:<16}{kind:<7}{len(latencies) / seconds:>9.0f}"
+              f"{p50:>9.1f}{p99:>9.1f}{results[kind]['errors']:>9}")
+
+
+def run_benchmark(readers: int = 4, writers: int = 4, seconds: float = 5.0) -> None:
+    config = get_database_config_manager().config
+    print(f"{readers} readers + {writers} writers for {seconds:g} s each "
+          f"(profile: journal_mode={config.journal_mode}, synchronous={config.synchronous})")
+    print(f"{'':<16}{'':<7}{'ops/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'locked':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, profile in (("before", None), ("engine profile", config)):
+            url = _fresh_database(directory, f"{name.replace(' ', '_')}.db")
+            _report(name, bench_profile(url, profile, readers, writers, seconds), seconds)
+
+
+if __name__ == "__main__":
+    run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 4,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 5.0,
+    )
@@ -0,0 +1,98 @@
+# infrastructure/database/config.py - Database Engine Configuration
+import json
+import os
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+
+@dataclass
+class DatabaseConfig:
+    """SQLite engine profile shared by the desktop POS and the web server"""
+    database_url: str = "sqlite:///cafe.db"
+    journal_mode: str = "WAL"  # WAL lets readers proceed while one writer commits
+    synchronous: str = "NORMAL"  # Safe with WAL, much cheaper than FULL
+    busy_timeout_ms: int = 5000  # How long SQLite itself waits for a lock
+    cache_size_kb: int = 16384  # Page cache per connection (negative PRAGMA value)
+    mmap_size_mb: int = 64
+    temp_store: str = "MEMORY"
+    busy_retry_attempts: int = 5  # Retries on top of busy_timeout for write transactions
+    busy_retry_backoff_ms: int = 50  # Initial backoff, doubled on every retry
+    archive_after_days: int = 180  # Closed/cancelled orders older than this move to the archive tables (0 disables)
+    archive_batch_size: int = 500  # Orders moved per archival transaction
+    stream_batch_size: int = 500  # Orders per batch when backups and exports stream the history
+    order_items_loading: str = "selectin"  # How order lists load their items: selectin, subquery or joined
+    write_batch_window_ms: int = 0  # Extra wait for more writes when several are queued (group commit)
+    write_batch_max_units: int = 64  # Write units sharing one COMMIT at most
+    report_timeout_ms: int = 15000  # Reports/dashboards are cancelled after this (0 disables)
+    maintenance_start_hour: int = 3  # Quiet hours (local time) for the daily maintenance run
+    maintenance_end_hour: int = 5  # Same value as the start hour disables the schedule
+    maintenance_vacuum_pages: int = 1000  # Pages freed per incremental_vacuum transaction
+    slow_query_log: bool = False  # Log statements slower than the threshold with their query plan
+    slow_query_threshold_ms: int = 100
+    slow_query_log_file: str = "logs/slow_queries.log"
+    slow_query_log_max_kb: int = 1024  # Rotated at this size, 3 old files are kept
+
+
+class DatabaseConfigManager:
+    """Manages database configuration persistence"""
+
+    CONFIG_FILE = "database_config.json"
+
+    def __init__(self, config_dir: str = "Config"):
+        self.config_dir = config_dir
+        self.config_path = os.path.join(config_dir, self.CONFIG_FILE)
+        self._config: Optional[DatabaseConfig] = None
+
+    @property
+    def config(self) -> DatabaseConfig:
+        if self._config is None:
+            self._config = self.load()
+        return self._config
+
+    def load(self) -> DatabaseConfig:
+        """Load configuration from file"""
+        try:
+            if os.path.exists(self.config_path):
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    known = DatabaseConfig.__dataclass_fields__
+                    return DatabaseConfig(**{k: v for k, v in data.items() if k in known})
+        except Exception as e:
+            print(f"Error loading database config: {e}")
+
+        # Return default config
+        config = DatabaseConfig()
+        self.save(config)
+        return config
+
+    def save(self, config: DatabaseConfig) -> bool:
+        """Save configuration to file"""
+        try:
+            os.makedirs(self.config_dir, exist_ok=True)
+            with open(self.config_path, 'w', encoding='utf-8') as f:
+                json.dump(asdict(config), f, indent=2, ensure_ascii=False)
+            self._config = config
+            return True
+        except Exception as e:
+            print(f"Error saving database config: {e}")
+            return False
+
+    def update(self, **kwargs) -> DatabaseConfig:
+        """Update configuration with new values (applies on next start)"""
+        config = self.config
+        for key, value in kwargs.items():
+            if hasattr(config, key):
+                setattr(config, key, value)
+        self.save(config)
+        return config
+
+
+# Global instance
+_config_manager: Optional[DatabaseConfigManager] = None
+
+
+def get_database_config_manager() -> DatabaseConfigManager:
+    global _config_manager
+    if _config_manager is None:
+        _config_manager = DatabaseConfigManager()
+    return _config_manager
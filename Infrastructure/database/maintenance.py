@@ -0,0 +1,187 @@
+# infrastructure/database/maintenance.py
+"""
+Scheduled database maintenance.
+
+Once a day, inside the quiet hours configured by `maintenance_start_hour` /
+`maintenance_end_hour`, a background thread runs these steps on cafe.db:
+
+1. `ANALYZE` on the first run, `PRAGMA optimize` afterwards (planner stats)
+2. `PRAGMA incremental_vacuum` in batches of `maintenance_vacuum_pages`,
+   returning the pages freed by deleted rows to the file system
+   (needs `auto_vacuum=INCREMENTAL`, switched on by migration 8)
+3. `PRAGMA wal_checkpoint(TRUNCATE)`: copy the WAL back and truncate it
+4. `PRAGMA quick_check`
+
+Every step runs in autocommit mode, so POS writes can slip in between the
+vacuum batches. Each run is recorded in `maintenance_runs` with its duration
+and the bytes it reclaimed; the backup dialog shows the history.
+
+Run by hand:
+
+    python -m infrastructure.database.maintenance
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import desc, select, text
+from sqlalchemy.engine import Connection
+
+from infrastructure.database.config import get_database_config_manager
+from infrastructure.database.models.maintenance_run_model import MaintenanceRunModel
+
+POLL_SECONDS = 300
+# Two runs are never closer than this, so one quiet window gives one run
+MIN_RUN_INTERVAL = timedelta(hours=12)
+
+
+def _file_size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _database_sizes(database_path: str):
+    return _file_size(database_path), _file_size(database_path + "-wal")
+
+
+def in_quiet_hours(hour: int, start_hour: int, end_hour: int) -> bool:
+    """True if `hour` is in [start, end), which may wrap past midnight"""
+    if start_hour == end_hour:
+        return False
+    if start_hour < end_hour:
+        return start_hour <= hour < end_hour
+    return hour >= start_hour or hour < end_hour
+
+
+def _optimize(conn: Connection) -> None:
+    has_stats = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+    )).scalar()
+    conn.execute(text("PRAGMA optimize" if has_stats else "ANALYZE"))
+
+
+INCREMENTAL = 2  # PRAGMA auto_vacuum value
+
+
+def _incremental_vacuum(conn: Connection, pages_per_batch: int) -> None:
+    # Without INCREMENTAL (migration 8 not applied yet) the pragma is a
+    # no-op and the free list would never shrink
+    if conn.execute(text("PRAGMA auto_vacuum")).scalar() != INCREMENTAL:
+        return
+    dbapi_connection = conn.connection.dbapi_connection
+    free_pages = conn.execute(text("PRAGMA freelist_count")).scalar()
+    while free_pages:
+        # executescript steps the pragma to completion; a plain execute
+        # frees a single page
+        dbapi_connection.executescript(f"PRAGMA incremental_vacuum({int(pages_per_batch)})")
+        remaining = conn.execute(text("PRAGMA freelist_count")).scalar()
+        if remaining >= free_pages:
+            break
+        free_pages = remaining
+
+
+def _checkpoint(conn: Connection) -> None:
+    busy, _, _ = conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)")).one()
+    if busy:
+        print("⚠️ WAL checkpoint incomplete: another connection is reading")
+
+
+def _quick_check(conn: Connection) -> str:
+    problems = conn.execute(text("PRAGMA quick_check")).scalars().all()
+    return problems[0] if problems else "ok"
+
+
+def run_maintenance(trigger: str = "manual") -> MaintenanceRunModel:
+    """Run every maintenance step and record the run"""
+    from infrastructure.database.session import engine, run_in_transaction
+
+    config = get_database_config_manager().config
+    database_path = engine.url.database
+    run = MaintenanceRunModel(started_at=datetime.utcnow(), trigger=trigger)
+    run.db_bytes_before, run.wal_bytes_before = _database_sizes(database_path)
+    started = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            _optimize(conn)
+            _incremental_vacuum(conn, config.maintenance_vacuum_pages)
+            _checkpoint(conn)
+            run.integrity = _quick_check(conn)
+    except Exception as e:
+        run.error = str(e)
+    run.duration_ms = int((time.perf_counter() - started) * 1000)
+    run.db_bytes_after, wal_bytes_after = _database_sizes(database_path)
+    run.reclaimed_bytes = max(
+        0, run.db_bytes_before + run.wal_bytes_before - run.db_bytes_after - wal_bytes_after
+    )
+
+    run_in_transaction(lambda session: session.add(run))
+    if run.error:
+        print(f"❌ Database maintenance failed after {run.duration_ms} ms: {run.error}")
+    else:
+        print(f"🧹 Database maintenance: {run.duration_ms} ms, "
+              f"{run.reclaimed_bytes // 1024} KB reclaimed, integrity {run.integrity}")
+    return run
+
+
+def recent_runs(limit: int = 20) -> List[MaintenanceRunModel]:
+    """Latest maintenance runs, newest first"""
+    from infrastructure.database.read_session import read_session_scope
+
+    with read_session_scope() as session:
+        return session.execute(
+            select(MaintenanceRunModel).order_by(desc(MaintenanceRunModel.started_at)).limit(limit)
+        ).scalars().all()
+
+
+class MaintenanceScheduler:
+    """Background thread that starts one maintenance run per quiet window"""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def is_due(self, now: Optional[datetime] = None) -> bool:
+        config = get_database_config_manager().config
+        now = now or datetime.now()
+        if not in_quiet_hours(now.hour, config.maintenance_start_hour,
+                              config.maintenance_end_hour):
+            return False
+        last = recent_runs(limit=1)
+        return not last or datetime.utcnow() - last[0].started_at >= MIN_RUN_INTERVAL
+
+    def _run(self) -> None:
+        while not self._stop.wait(POLL_SECONDS):
+            try:
+                if self.is_due():
+                    run_maintenance("scheduled")
+            except Exception as e:
+                print(f"❌ Database maintenance scheduler: {e}")
+
+
+_scheduler: Optional[MaintenanceScheduler] = None
+
+
+def get_maintenance_scheduler() -> MaintenanceScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = MaintenanceScheduler()
+    return _scheduler
+
+
+if __name__ == "__main__":
+    from infrastructure.database.session import init_db
+
+    init_db()
+    run_maintenance()
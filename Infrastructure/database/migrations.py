@@ -0,0 +1,257 @@
+# infrastructure/database/migrations.py
+"""
+Versioned schema migrations for existing cafe.db files.
+
+`Base.metadata.create_all` creates missing tables but never alters existing
+ones, so anything added to a model after a shop has been deployed (indexes,
+columns, backfills) is registered here as an ordered migration step. The
+applied versions are recorded in the `schema_version` table; when the
+database is already up to date, startup costs a single query.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+    transactional: bool = True
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str, transactional: bool = True):
+    """
+    Register an upgrade step; versions must be unique and increasing.
+    Non-transactional steps run in autocommit mode (e.g. for VACUUM).
+    """
+    def decorator(func: Callable[[Connection], None]):
+        if MIGRATIONS and MIGRATIONS[-1].version >= version:
+            raise ValueError(f"Migration {version} registered out of order")
+        MIGRATIONS.append(Migration(version, description, func, transactional))
+        return func
+    return decorator
+
+
+# ============== Helpers ==============
+
+def create_index(conn: Connection, name: str, table: str, columns: Sequence[str]) -> None:
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    ))
+
+
+def column_exists(conn: Connection, table: str, column: str) -> bool:
+    rows = conn.execute(text(f"PRAGMA table_info({table})")).fetchall()
+    return any(row[1] == column for row in rows)
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """Add a column unless create_all already created it on a fresh database"""
+    if not column_exists(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+# ============== Migrations ==============
+
+@migration(1, "Index order_items.order_id")
+def _index_order_items_order_id(conn: Connection) -> None:
+    create_index(conn, "ix_order_items_order_id", "order_items", ["order_id"])
+
+
+@migration(2, "Composite indexes for open-order lookup and date-range reports")
+def _index_orders(conn: Connection) -> None:
+    create_index(conn, "ix_orders_table_status_created", "orders",
+                 ["table_number", "status", "created_at"])
+    create_index(conn, "ix_orders_status_created", "orders", ["status", "created_at"])
+    create_index(conn, "ix_orders_created_at", "orders", ["created_at"])
+
+
+@migration(3, "Denormalized subtotal/total/item_count on orders")
+def _order_totals(conn: Connection) -> None:
+    add_column(conn, "orders", "subtotal", "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, "orders", "total", "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, "orders", "item_count", "INTEGER NOT NULL DEFAULT 0")
+    conn.execute(text(
+        "UPDATE orders SET"
+        " subtotal = (SELECT COALESCE(SUM(unit_price * quantity), 0)"
+        "             FROM order_items WHERE order_items.order_id = orders.id),"
+        " item_count = (SELECT COUNT(*) FROM order_items"
+        "               WHERE order_items.order_id = orders.id)"
+    ))
+    conn.execute(text(
+        "UPDATE orders SET total = MAX(0, subtotal - COALESCE(discount, 0))"
+    ))
+
+
+@migration(4, "order_items.product_id with backfill by product name")
+def _order_items_product_id(conn: Connection) -> None:
+    add_column(conn, "order_items", "product_id", "INTEGER REFERENCES products(id)")
+    create_index(conn, "ix_order_items_product_order", "order_items",
+                 ["product_id", "order_id"])
+    # Historical rows only have the name snapshot; prefer the active product
+    # when a name was reused, and leave custom items (no match) as NULL
+    conn.execute(text(
+        "UPDATE order_items SET product_id = ("
+        "  SELECT products.id FROM products"
+        "  WHERE products.name = order_items.product_name"
+        "  ORDER BY products.is_active DESC, products.id LIMIT 1)"
+        " WHERE product_id IS NULL"
+    ))
+
+
+@migration(5, "Lowercase order statuses and build the daily sales rollup")
+def _daily_sales_rollup(conn: Connection) -> None:
+    # The desktop used to store "CLOSED"/"OPEN" while the web stores "closed"/"open"
+    conn.execute(text("UPDATE orders SET status = lower(status) WHERE status != lower(status)"))
+    # The rollup of closed orders as sales_rollup.rebuild_daily_sales built it
+    # then; steps keep their own SQL so later code changes cannot alter them
+    all_orders = (
+        "(SELECT id, status, created_at, discount, subtotal, total FROM orders"
+        " UNION ALL"
+        " SELECT id, status, created_at, discount, subtotal, total FROM orders_archive)"
+    )
+    all_order_items = (
+        "(SELECT order_id, product_id, product_name, unit_price, quantity FROM order_items"
+        " UNION ALL"
+        " SELECT order_id, product_id, product_name, unit_price, quantity FROM order_items_archive)"
+    )
+    conn.execute(text("DELETE FROM daily_product_sales"))
+    conn.execute(text("DELETE FROM daily_sales"))
+    conn.execute(text(
+        "INSERT INTO daily_sales (day, orders_count, gross_sales, total_discounts, net_sales)"
+        " SELECT date(created_at), COUNT(*), SUM(subtotal),"
+        "        SUM(COALESCE(discount, 0)), SUM(total)"
+        f" FROM {all_orders}"
+        " WHERE lower(status) = 'closed' AND created_at IS NOT NULL"
+        " GROUP BY date(created_at)"
+    ))
+    conn.execute(text(
+        "INSERT INTO daily_product_sales"
+        " (day, product_id, product_name, quantity, revenue, orders_count)"
+        " SELECT date(o.created_at), i.product_id, MAX(i.product_name),"
+        "        SUM(i.quantity), SUM(i.unit_price * i.quantity),"
+        "        COUNT(DISTINCT i.order_id)"
+        f" FROM {all_order_items} i JOIN {all_orders} o ON o.id = i.order_id"
+        " WHERE lower(o.status) = 'closed' AND o.created_at IS NOT NULL"
+        " GROUP BY date(o.created_at), i.product_id,"
+        "          CASE WHEN i.product_id IS NULL THEN i.product_name END"
+    ))
+
+
+@migration(6, "Order version/updated_at and the global change sequence")
+def _order_versions(conn: Connection) -> None:
+    for table in ("orders", "orders_archive"):
+        add_column(conn, table, "version", "INTEGER NOT NULL DEFAULT 1")
+        add_column(conn, table, "updated_at", "DATETIME")
+        conn.execute(text(f"UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL"))
+    add_column(conn, "orders", "change_seq", "INTEGER NOT NULL DEFAULT 0")
+    create_index(conn, "ix_orders_change_seq", "orders", ["change_seq"])
+    # Existing orders get distinct sequence numbers in id order
+    conn.execute(text("UPDATE orders SET change_seq = id WHERE change_seq = 0"))
+    conn.execute(text(
+        "INSERT OR REPLACE INTO change_counters (name, value)"
+        " SELECT 'orders', COALESCE(MAX(change_seq), 0) FROM orders"
+    ))
+
+
+@migration(7, "Per-table change counters maintained by triggers")
+def _table_change_counters(conn: Connection) -> None:
+    # Read by infrastructure/database/change_detector.py as `table:<name>`
+    for table in ("orders", "order_items", "products", "users"):
+        name = f"table:{table}"
+        conn.execute(
+            text("INSERT OR IGNORE INTO change_counters (name, value) VALUES (:name, 0)"),
+            {"name": name}
+        )
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_counter"
+                f" AFTER {operation} ON {table}"
+                f" BEGIN UPDATE change_counters SET value = value + 1 WHERE name = '{name}'; END"
+            ))
+
+
+@migration(8, "Incremental auto_vacuum (rebuilds the file once)", transactional=False)
+def _incremental_auto_vacuum(conn: Connection) -> None:
+    # Switching from NONE only takes effect through a full VACUUM; afterwards
+    # the maintenance run returns free pages with PRAGMA incremental_vacuum
+    if conn.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+        conn.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+
+
+@migration(9, "Indexes for paging orders by table, status and product")
+def _index_order_pages(conn: Connection) -> None:
+    # Secondary indexes end in the rowid (id), so each one also serves
+    # ORDER BY created_at, id for the keyset pages
+    create_index(conn, "ix_orders_table_created", "orders", ["table_number", "created_at"])
+    create_index(conn, "ix_orders_archive_status_created", "orders_archive",
+                 ["status", "created_at"])
+    create_index(conn, "ix_orders_archive_table_created", "orders_archive",
+                 ["table_number", "created_at"])
+    create_index(conn, "ix_order_items_archive_product_order", "order_items_archive",
+                 ["product_id", "order_id"])
+
+
+# ============== Runner ==============
+
+LATEST_VERSION = MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def _ensure_version_table(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        " version INTEGER PRIMARY KEY,"
+        " description TEXT NOT NULL,"
+        " applied_at DATETIME NOT NULL)"
+    ))
+
+
+def get_current_version(conn: Connection) -> int:
+    _ensure_version_table(conn)
+    return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def _record_version(conn: Connection, step: Migration) -> None:
+    conn.execute(
+        text("INSERT INTO schema_version (version, description, applied_at) "
+             "VALUES (:version, :description, :applied_at)"),
+        {"version": step.version, "description": step.description,
+         "applied_at": datetime.utcnow()}
+    )
+
+
+def run_migrations(engine: Engine) -> int:
+    """Apply pending migrations in order; returns how many were applied"""
+    with engine.begin() as conn:
+        current = get_current_version(conn)
+    if current >= LATEST_VERSION:
+        return 0
+
+    applied = 0
+    for step in MIGRATIONS:
+        if step.version <= current:
+            continue
+        if step.transactional:
+            # Each step commits together with its version row, so a failed
+            # upgrade leaves the database at the last completed version
+            with engine.begin() as conn:
+                step.upgrade(conn)
+                _record_version(conn, step)
+        else:
+            # Such steps must be safe to re-run if recording the version fails
+            with engine.connect() as conn:
+                step.upgrade(conn.execution_options(isolation_level="AUTOCOMMIT"))
+            with engine.begin() as conn:
+                _record_version(conn, step)
+        print(f"🔧 Applied migration {step.version}: {step.description}")
+        applied += 1
+    return applied
@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+
+from infrastructure.database.base import Base
+
+
+class OrderArchiveModel(Base):
+    """Closed/cancelled orders moved out of `orders` (see infrastructure/database/archive.py)"""
+    __tablename__ = "orders_archive"
+    __table_args__ = (
+        Index("ix_orders_archive_created_at", "created_at"),
+        Index("ix_orders_archive_status_created", "status", "created_at"),
+        Index("ix_orders_archive_table_created", "table_number", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)  # همان شناسه سفارش در جدول orders
+    table_number = Column(Integer, nullable=True)
+    status = Column(String, nullable=False)
+    discount = Column(Integer, default=0)
+    created_at = Column(DateTime)
+    subtotal = Column(Integer, nullable=False, default=0, server_default="0")
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    item_count = Column(Integer, nullable=False, default=0, server_default="0")
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, nullable=False)
+
+    items = relationship("OrderItemArchiveModel", back_populates="order",
+                         order_by="OrderItemArchiveModel.id", passive_deletes=True)
+
+
+class OrderItemArchiveModel(Base):
+    """Items of archived orders"""
+    __tablename__ = "order_items_archive"
+    __table_args__ = (
+        Index("ix_order_items_archive_product_order", "product_id", "order_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders_archive.id"), index=True)
+    product_id = Column(Integer, nullable=True)
+    product_name = Column(String, nullable=False)
+    unit_price = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+    order = relationship("OrderArchiveModel", back_populates="items")
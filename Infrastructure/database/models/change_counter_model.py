@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String
+
+from infrastructure.database.base import Base
+
+
+class ChangeCounterModel(Base):
+    """Monotonic change sequences (see infrastructure/database/change_tracking.py)"""
+    __tablename__ = "change_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
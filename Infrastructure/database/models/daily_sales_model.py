@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, Date, Index
+
+from infrastructure.database.base import Base
+
+
+class DailySalesModel(Base):
+    """Rollup of closed orders per day (see infrastructure/database/sales_rollup.py)"""
+    __tablename__ = "daily_sales"
+
+    day = Column(Date, primary_key=True)
+    orders_count = Column(Integer, nullable=False, default=0)
+    gross_sales = Column(Integer, nullable=False, default=0)
+    total_discounts = Column(Integer, nullable=False, default=0)
+    net_sales = Column(Integer, nullable=False, default=0)
+
+
+class DailyProductSalesModel(Base):
+    """Per-product rollup of closed orders per day"""
+    __tablename__ = "daily_product_sales"
+    __table_args__ = (
+        Index("ix_daily_product_sales_day_product", "day", "product_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    product_id = Column(Integer, nullable=True)  # NULL برای آیتم‌های سفارشی
+    product_name = Column(String, nullable=False)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Integer, nullable=False, default=0)
+    orders_count = Column(Integer, nullable=False, default=0)
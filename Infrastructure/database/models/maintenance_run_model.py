@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, Text
+
+from infrastructure.database.base import Base
+
+
+class MaintenanceRunModel(Base):
+    """One database maintenance run (see infrastructure/database/maintenance.py)"""
+    __tablename__ = "maintenance_runs"
+
+    id = Column(Integer, primary_key=True)
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    trigger = Column(String, nullable=False)  # scheduled / manual
+    duration_ms = Column(Integer, nullable=False, default=0)
+    db_bytes_before = Column(Integer, nullable=False, default=0)
+    db_bytes_after = Column(Integer, nullable=False, default=0)
+    wal_bytes_before = Column(Integer, nullable=False, default=0)
+    reclaimed_bytes = Column(Integer, nullable=False, default=0)
+    integrity = Column(String, nullable=True)  # "ok" or the first quick_check problem
+    error = Column(Text, nullable=True)
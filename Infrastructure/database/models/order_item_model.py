@@ -1,13 +1,22 @@
-from sqlalchemy import Column, Integer, ForeignKey, String
+from sqlalchemy import Column, Integer, ForeignKey, Index, String
+from sqlalchemy.orm import relationship
 
 from infrastructure.database.base import Base
+from infrastructure.database.models import product_model  # noqa: F401  (products FK target)
 
 
 class OrderItemModel(Base):
     __tablename__ = "order_items"
+    __table_args__ = (
+        Index("ix_order_items_product_order", "product_id", "order_id"),
+    )
 
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
+    # محصول منو؛ نام و قیمت زمان سفارش جداگانه نگه داشته می‌شوند و آیتم‌های سفارشی product_id ندارند
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=True)
     product_name = Column(String, nullable=False)
     unit_price = Column(Integer, nullable=False)
     quantity = Column(Integer, nullable=False)
+
+    order = relationship("OrderModel", back_populates="items")
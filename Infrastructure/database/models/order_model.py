@@ -1,14 +1,40 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.orm import relationship
 from datetime import datetime
 
 from infrastructure.database.base import Base
+from infrastructure.database.models import order_item_model  # noqa: F401  (items relationship target)
 
 
 class OrderModel(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_table_status_created", "table_number", "status", "created_at"),
+        Index("ix_orders_status_created", "status", "created_at"),
+        Index("ix_orders_created_at", "created_at"),
+        Index("ix_orders_table_created", "table_number", "created_at"),
+        Index("ix_orders_change_seq", "change_seq"),
+    )
 
     id = Column(Integer, primary_key=True)
     table_number = Column(Integer, nullable=True)  # شماره میز (NULL برای بیرون بر)
     status = Column(String, nullable=False)
     discount = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # مجموع‌های ذخیره‌شده (هنگام نوشتن آیتم‌ها به‌روزرسانی می‌شوند)
+    subtotal = Column(Integer, nullable=False, default=0, server_default="0")
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    item_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # نسخه سفارش و شماره تغییر سراسری (infrastructure/database/change_tracking.py)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, nullable=True)
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # آیتم‌ها به ترتیب ثبت؛ لیست‌ها با items_loader() بارگذاری می‌کنند
+    # (infrastructure/database/order_loading.py)، نه یک کوئری برای هر سفارش
+    items = relationship("OrderItemModel", back_populates="order",
+                         order_by="OrderItemModel.id", passive_deletes=True)
+
+    # Every UPDATE/DELETE is checked against the version that was loaded
+    # (WHERE version = ?); touch_order sets the new value itself
+    __mapper_args__ = {"version_id_col": version, "version_id_generator": False}
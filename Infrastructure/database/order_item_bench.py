@@ -0,0 +1,89 @@
+# infrastructure/database/order_item_bench.py
+"""
+Micro-benchmark of the order item write path: saving orders with 1, 20 and
+200 items, once adding one ORM object per item (the old path) and once
+through `insert_order_items` (one multi-row INSERT ... RETURNING). Each
+size runs on a fresh temporary database with the configured pragmas.
+
+    python -m infrastructure.database.order_item_bench [orders]
+"""
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+from infrastructure.database.config import get_database_config_manager
+from infrastructure.database.models.order_item_model import OrderItemModel
+from infrastructure.database.models.order_model import OrderModel
+from infrastructure.database.order_item_writer import insert_order_items, item_row
+from infrastructure.database.query_stats import instrument_engine, track_queries
+from infrastructure.database.session import apply_sqlite_pragmas
+from infrastructure.database.write_bench import _fresh_database
+
+ITEM_COUNTS = (1, 20, 200)
+
+
+def _items(count: int):
+    return [(f"Item {number}", 10_000 + number, number % 3 + 1) for number in range(count)]
+
+
+def add_orm_items(session: Session, order_id: int, items) -> List[int]:
+    """The old path: one OrderItemModel per item, ids read back after the flush"""
+    models = [OrderItemModel(order_id=order_id, product_id=None, product_name=name,
+                             unit_price=price, quantity=quantity)
+              for name, price, quantity in items]
+    session.add_all(models)
+    session.flush()
+    return [model.id for model in models]
+
+
+def add_bulk_items(session: Session, order_id: int, items) -> List[int]:
+    return insert_order_items(session, [item_row(order_id, name, price, quantity)
+                                        for name, price, quantity in items])
+
+
+def bench(url: str, item_count: int, orders: int,
+          add_items: Callable[[Session, int, list], List[int]]) -> dict:
+    config = get_database_config_manager().config
+    engine = create_engine(url)
+    event.listen(engine, "connect", lambda conn, record: apply_sqlite_pragmas(conn, config))
+    instrument_engine(engine)
+    sessions = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    items = _items(item_count)
+    latencies = []
+    with track_queries("order item bench") as stats:
+        for number in range(orders):
+            started = time.perf_counter()
+            with sessions() as session, session.begin():
+                order = OrderModel(table_number=number % 20 + 1, status="open", discount=0)
+                session.add(order)
+                session.flush()
+                item_ids = add_items(session, order.id, items)
+                assert len(item_ids) == item_count and all(item_ids)
+            latencies.append((time.perf_counter() - started) * 1000)
+    engine.dispose()
+    return {"latencies": latencies, "statements": stats.count / orders}
+
+
+def run_benchmark(orders: int = 200) -> None:
+    print(f"{orders} orders per run")
+    print(f"{'':<18}{'items':>6}{'p50 ms':>9}{'p99 ms':>9}{'items/s':>10}{'stmts':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for item_count in ITEM_COUNTS:
+            for name, add_items in (("ORM object/item", add_orm_items),
+                                    ("bulk INSERT", add_bulk_items)):
+                url = _fresh_database(directory, f"{add_items.__name__}_{item_count}.db")
+                result = bench(url, item_count, orders, add_items)
+                latencies = sorted(result["latencies"])
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                items_per_second = item_count * orders / (sum(latencies) / 1000)
+                print(f"{name:<18}{item_count:>6}{statistics.median(latencies):>9.2f}"
+                      f"{p99:>9.2f}{items_per_second:>10.0f}{result['statements']:>7.0f}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
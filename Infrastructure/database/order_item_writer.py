@@ -0,0 +1,99 @@
+# infrastructure/database/order_item_writer.py
+"""
+Bulk write path for order items.
+
+Items are inserted with one multi-row `INSERT ... RETURNING` per order
+(or per batch of orders) instead of one ORM object at a time; SQLAlchemy
+splits very large batches to stay under SQLite's parameter limit and falls
+back to per-row inserts where RETURNING is not available. SQLite does not
+promise the order of RETURNING rows (asking SQLAlchemy to sort them makes
+it send one INSERT per row), so the ids are matched back to the input rows
+by their values; identical rows are interchangeable.
+
+Edits of an existing order go through `sync_order_items`, which compares the
+wanted items with the stored rows and only inserts, updates or deletes what
+changed, so unchanged items keep their ids.
+
+The async web routes use the same code through `AsyncSession.run_sync`.
+"""
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from infrastructure.database.models.order_item_model import OrderItemModel
+
+
+def item_row(order_id: int, product_name: str, unit_price: int, quantity: int,
+             product_id: Optional[int] = None) -> Dict:
+    return {
+        "order_id": order_id,
+        "product_id": product_id,
+        "product_name": product_name,
+        "unit_price": unit_price,
+        "quantity": quantity,
+    }
+
+
+_ROW_VALUES = ("order_id", "product_id", "product_name", "unit_price", "quantity")
+
+
+def insert_order_items(session: Session, rows: Sequence[Dict]) -> List[int]:
+    """Insert item rows in bulk; returns their new ids in input order"""
+    if not rows:
+        return []
+    inserted = session.execute(
+        insert(OrderItemModel).returning(
+            OrderItemModel.id, *[OrderItemModel.__table__.c[name] for name in _ROW_VALUES]
+        ),
+        list(rows)
+    ).all()
+    ids_by_values: Dict[tuple, List[int]] = {}
+    for item in sorted(inserted, key=lambda item: item.id, reverse=True):
+        ids_by_values.setdefault(tuple(item[1:]), []).append(item.id)
+    return [ids_by_values[tuple(row[name] for name in _ROW_VALUES)].pop() for row in rows]
+
+
+def _identity(product_id: Optional[int], product_name: str, unit_price: int):
+    """Items are the same line when product, name snapshot and price all match"""
+    return (product_id, product_name, unit_price)
+
+
+def sync_order_items(session: Session, order_id: int, rows: Sequence[Dict]) -> List[int]:
+    """
+    Make the order's items match `rows` with a minimal diff; returns the item
+    ids in the order of `rows`. Lines that still exist keep their id, and
+    only changed quantities are updated.
+    """
+    existing: Dict[tuple, List] = {}
+    for item in session.execute(
+        select(OrderItemModel.id, OrderItemModel.product_id, OrderItemModel.product_name,
+               OrderItemModel.unit_price, OrderItemModel.quantity)
+        .where(OrderItemModel.order_id == order_id)
+        .order_by(OrderItemModel.id)
+    ):
+        existing.setdefault(
+            _identity(item.product_id, item.product_name, item.unit_price), []
+        ).append(item)
+
+    item_ids: List[Optional[int]] = []
+    updates, inserts = [], []
+    for position, row in enumerate(rows):
+        matches = existing.get(_identity(row["product_id"], row["product_name"], row["unit_price"]))
+        if matches:
+            item = matches.pop(0)
+            item_ids.append(item.id)
+            if item.quantity != row["quantity"]:
+                updates.append({"id": item.id, "quantity": row["quantity"]})
+        else:
+            item_ids.append(None)
+            inserts.append((position, row))
+
+    removed = [item.id for items in existing.values() for item in items]
+    if removed:
+        session.execute(delete(OrderItemModel).where(OrderItemModel.id.in_(removed)))
+    if updates:
+        session.execute(update(OrderItemModel), updates)
+    for (position, _), item_id in zip(inserts, insert_order_items(session, [row for _, row in inserts])):
+        item_ids[position] = item_id
+    return item_ids
@@ -0,0 +1,65 @@
+# infrastructure/database/order_loading.py
+"""
+How orders load their items.
+
+`OrderModel.items` and `OrderArchiveModel.items` are plain lazy
+relationships: touching them on an order loaded without an eager-load
+option costs one query per order. Code that needs the items of several
+orders loads them with `items_loader()`, whose strategy comes from
+`order_items_loading` in the database config:
+
+- "selectin" (default): the orders, then their items with one
+  `WHERE order_id IN (...)` query per 500 orders
+- "subquery": the items query repeats the order query as a subquery,
+  so it is two queries for any number of orders
+- "joined": one LEFT OUTER JOIN; results need `.unique()`
+
+Results of statements with the loader should always go through
+`.unique()`, so switching the strategy never changes the calling code.
+"""
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import joinedload, selectinload, subqueryload
+
+from infrastructure.database.config import get_database_config_manager
+from infrastructure.database.models.order_model import OrderModel
+
+LOADING_STRATEGIES = {
+    "selectin": selectinload,
+    "subquery": subqueryload,
+    "joined": joinedload,
+}
+
+_loaders: Dict[Tuple[type, str], object] = {}
+_statements: Dict[Tuple[object, str], object] = {}
+
+
+def _strategy(strategy: Optional[str]) -> str:
+    strategy = strategy or get_database_config_manager().config.order_items_loading
+    if strategy not in LOADING_STRATEGIES:
+        raise ValueError(
+            f"Unknown order_items_loading '{strategy}' "
+            f"(expected one of: {', '.join(LOADING_STRATEGIES)})"
+        )
+    return strategy
+
+
+def items_loader(model=OrderModel, strategy: Optional[str] = None):
+    """Loader option for `model.items` (OrderModel or OrderArchiveModel)"""
+    key = (model, _strategy(strategy))
+    loader = _loaders.get(key)
+    if loader is None:
+        loader = _loaders[key] = LOADING_STRATEGIES[key[1]](model.items)
+    return loader
+
+
+def with_items(statement, model=OrderModel, strategy: Optional[str] = None):
+    """
+    A prebuilt (module-level) order statement plus the items loader. The
+    result is kept per strategy, so the statement keeps its cache key.
+    """
+    key = (statement, _strategy(strategy))
+    loaded = _statements.get(key)
+    if loaded is None:
+        loaded = _statements[key] = statement.options(items_loader(model, key[1]))
+    return loaded
@@ -0,0 +1,95 @@
+# infrastructure/database/order_totals.py
+"""
+Denormalized order totals.
+
+`orders.subtotal`, `orders.total` and `orders.item_count` are written
+together with the items so that listings, dashboards and reports can read
+them without touching `order_items`. Every code path that changes an
+order's items or discount must go through `set_order_totals` (with
+`totals_statement` when the items are only known to the database).
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from infrastructure.database.models.order_model import OrderModel
+from infrastructure.database.models.order_item_model import OrderItemModel
+
+
+def set_order_totals(order_model: OrderModel, subtotal: int, item_count: int) -> None:
+    """Store totals on the order; total never goes below zero"""
+    order_model.subtotal = subtotal
+    order_model.total = max(0, subtotal - (order_model.discount or 0))
+    order_model.item_count = item_count
+
+
+def set_order_totals_from_lines(order_model: OrderModel,
+                                lines: Iterable[Tuple[int, int]]) -> None:
+    """Totals from (unit_price, quantity) pairs already in memory"""
+    lines = list(lines)
+    set_order_totals(
+        order_model,
+        sum(price * quantity for price, quantity in lines),
+        len(lines)
+    )
+
+
+def totals_statement(order_id: int):
+    """(subtotal, item_count) of one order, computed from its items"""
+    return (
+        select(
+            func.coalesce(func.sum(OrderItemModel.unit_price * OrderItemModel.quantity), 0),
+            func.count(OrderItemModel.id)
+        )
+        .where(OrderItemModel.order_id == order_id)
+    )
+
+
+def _actual_totals_query():
+    items = (
+        select(
+            OrderItemModel.order_id.label("order_id"),
+            func.sum(OrderItemModel.unit_price * OrderItemModel.quantity).label("subtotal"),
+            func.count(OrderItemModel.id).label("item_count")
+        )
+        .group_by(OrderItemModel.order_id)
+        .subquery()
+    )
+    actual_subtotal = func.coalesce(items.c.subtotal, 0)
+    actual_count = func.coalesce(items.c.item_count, 0)
+    return (
+        select(OrderModel, actual_subtotal.label("actual_subtotal"),
+               actual_count.label("actual_item_count"))
+        .outerjoin(items, items.c.order_id == OrderModel.id)
+        .where(
+            (OrderModel.subtotal != actual_subtotal)
+            | (OrderModel.item_count != actual_count)
+            | (OrderModel.total != func.max(0, actual_subtotal - func.coalesce(OrderModel.discount, 0)))
+        )
+    )
+
+
+def find_inconsistent_order_totals(session: Session) -> List[Dict]:
+    """Orders whose stored totals disagree with their items"""
+    return [
+        {
+            "order_id": order.id,
+            "stored_subtotal": order.subtotal,
+            "actual_subtotal": actual_subtotal,
+            "stored_item_count": order.item_count,
+            "actual_item_count": actual_item_count,
+        }
+        for order, actual_subtotal, actual_item_count
+        in session.execute(_actual_totals_query())
+    ]
+
+
+def repair_order_totals(session: Session) -> int:
+    """Fix every inconsistent order; returns how many were repaired"""
+    repaired = 0
+    for order, actual_subtotal, actual_item_count in session.execute(_actual_totals_query()).all():
+        set_order_totals(order, actual_subtotal, actual_item_count)
+        repaired += 1
+    session.flush()
+    return repaired
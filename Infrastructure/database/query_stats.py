@@ -0,0 +1,134 @@
+# infrastructure/database/query_stats.py
+"""
+Per-context SQL statistics.
+
+Engine event hooks time every statement and add it to the `QueryStats` of
+each context that is active in the current task/thread: an API request
+(see the Server-Timing middleware in web/api.py), a Qt timer callback or a
+service call. Contexts nest, so a service call inside a request is counted
+in both.
+
+    with track_queries("load orders") as stats:
+        ...
+    print(stats.count, stats.total_ms, stats.slowest_sql)
+
+    with assert_max_queries(3):
+        client.get("/api/orders")
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from typing import Callable, Iterator, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@dataclass
+class QueryStats:
+    label: str
+    count: int = 0
+    total_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_sql: Optional[str] = None
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms >= self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_sql = statement
+
+    def summary(self) -> str:
+        return (f"{self.label}: {self.count} queries, {self.total_ms:.1f} ms"
+                f" (slowest {self.slowest_ms:.1f} ms)")
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing response header"""
+        return (f'db;dur={self.total_ms:.1f};desc="{self.count} queries",'
+                f' db-slowest;dur={self.slowest_ms:.1f}')
+
+
+_active: ContextVar[Tuple[QueryStats, ...]] = ContextVar("query_stats", default=())
+
+
+def active_labels() -> Tuple[str, ...]:
+    """Labels of the active contexts, outermost first"""
+    return tuple(stats.label for stats in _active.get())
+
+
+@contextmanager
+def track_queries(label: str) -> Iterator[QueryStats]:
+    """Count and time the statements executed inside the block"""
+    stats = QueryStats(label)
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+def log_queries(label: Optional[str] = None) -> Callable:
+    """
+    Decorator for UI callbacks and service calls: one log line per call that
+    ran SQL. Nested calls are counted in the outer context but only the
+    outermost one logs.
+    """
+    def decorator(func: Callable) -> Callable:
+        name = label or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            outermost = not _active.get()
+            with track_queries(name) as stats:
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    if outermost and stats.count:
+                        print(f"🗄️ {stats.summary()}")
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def assert_max_queries(limit: int, label: str = "block") -> Iterator[QueryStats]:
+    """Fail if the wrapped code issues more than `limit` statements"""
+    with track_queries(label) as stats:
+        yield stats
+    if stats.count > limit:
+        raise AssertionError(
+            f"{label} issued {stats.count} queries (at most {limit} expected);"
+            f" slowest: {stats.slowest_sql}"
+        )
+
+
+# ============== Engine hooks ==============
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    active = _active.get()
+    if active:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for stats in active:
+            stats.record(statement, elapsed_ms)
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Install the timing hooks on a (sync) engine; safe to call twice"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
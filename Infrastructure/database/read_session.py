@@ -0,0 +1,142 @@
+# infrastructure/database/read_session.py
+"""
+Read-only engine for reports, dashboards and exports.
+
+Reports get their own connection pool, so a long month report never holds a
+connection that order writes are waiting for. Every connection is opened
+with `PRAGMA query_only` (nothing can be written through it by mistake) and
+runs its whole unit of work in one explicit read transaction: under WAL
+that is a consistent snapshot of the database which never blocks the writer.
+
+A read transaction that runs past `report_timeout_ms` is interrupted through
+SQLite's progress handler and raises ReportTimeoutError, so a heavy report
+fails quickly instead of freezing the till.
+
+    with read_session_scope() as session:
+        ...
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.util import await_only
+
+from infrastructure.database.config import DatabaseConfig
+from infrastructure.database.session import (
+    DATABASE_URL, TrackedSession, apply_sqlite_pragmas, db_config
+)
+from infrastructure.database.query_stats import instrument_engine
+from infrastructure.database.slow_query_log import install_slow_query_log
+
+PROGRESS_INTERVAL = 10_000  # SQLite VM steps between two deadline checks
+
+
+class ReportTimeoutError(TimeoutError):
+    """A read-only unit of work ran past its time limit and was interrupted"""
+
+
+class _Deadline:
+    """Per-connection deadline checked by SQLite's progress handler"""
+
+    __slots__ = ("at",)
+
+    def __init__(self):
+        self.at: Optional[float] = None
+
+    def expired(self) -> int:
+        # Non-zero makes SQLite abort the running statement
+        return 1 if self.at is not None and time.monotonic() > self.at else 0
+
+
+def _set_progress_handler(dbapi_connection, deadline: _Deadline) -> None:
+    if hasattr(dbapi_connection, "set_progress_handler"):  # sqlite3
+        dbapi_connection.set_progress_handler(deadline.expired, PROGRESS_INTERVAL)
+    else:  # aiosqlite adapter: the handler runs on aiosqlite's worker thread
+        await_only(dbapi_connection.driver_connection.set_progress_handler(
+            deadline.expired, PROGRESS_INTERVAL
+        ))
+
+
+def configure_read_only_engine(engine: Engine, config: DatabaseConfig) -> None:
+    """Hooks shared by the desktop and the async (web) read engine"""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, config)
+        # The driver only opens transactions before writes; BEGIN is
+        # emitted in _on_begin instead so that reads share one snapshot
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA query_only=ON")
+        finally:
+            cursor.close()
+        deadline = _Deadline()
+        connection_record.info["deadline"] = deadline
+        _set_progress_handler(dbapi_connection, deadline)
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        timeout_ms = conn.get_execution_options().get("timeout_ms", config.report_timeout_ms)
+        deadline = conn.connection.info["deadline"]
+        deadline.at = time.monotonic() + timeout_ms / 1000 if timeout_ms else None
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute("BEGIN")
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, "commit")
+    @event.listens_for(engine, "rollback")
+    def _on_end(conn):
+        conn.connection.info["deadline"].at = None
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(exception_context):
+        conn = exception_context.connection
+        if conn is None or "interrupted" not in str(exception_context.original_exception):
+            return None
+        deadline = conn.connection.info["deadline"]
+        if deadline.at is not None and deadline.expired():
+            timeout_ms = conn.get_execution_options().get("timeout_ms", config.report_timeout_ms)
+            return ReportTimeoutError(
+                f"Report query cancelled after {timeout_ms} ms"
+            )
+        return None
+
+
+read_engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    connect_args={"timeout": db_config.busy_timeout_ms / 1000}
+)
+configure_read_only_engine(read_engine, db_config)
+instrument_engine(read_engine)
+install_slow_query_log(read_engine, db_config)
+
+
+ReadSessionLocal = sessionmaker(
+    bind=read_engine,
+    class_=TrackedSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+@contextmanager
+def read_session_scope(timeout_ms: Optional[int] = None) -> Iterator[Session]:
+    """
+    Read-only unit of work: one snapshot, ended and closed with the block.
+    `timeout_ms` overrides `report_timeout_ms` for this block (0: no limit).
+    """
+    bind = read_engine if timeout_ms is None else read_engine.execution_options(
+        timeout_ms=timeout_ms
+    )
+    session = ReadSessionLocal(bind=bind)
+    try:
+        yield session
+    finally:
+        session.close()
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Iterable, List
 from domain.entities.order import Order
 
 
@@ -11,3 +12,7 @@ class OrderRepository(ABC):
     @abstractmethod
     def get_by_id(self, order_id: int) -> Order:
         pass
+
+    @abstractmethod
+    def get_many(self, order_ids: Iterable[int]) -> List[Order]:
+        pass
@@ -1,12 +1,197 @@
+import base64
+from datetime import datetime
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import bindparam, or_, select
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 
-from domain.entities.order import Order
+from domain.entities.order import Order, OrderConflictError
 from domain.entities.order_item import OrderItem
 from .order_repository import OrderRepository
 from domain.entities.enums import OrderStatus
 
 from infrastructure.database.models.order_model import OrderModel
 from infrastructure.database.models.order_item_model import OrderItemModel
+from infrastructure.database.models.archive_model import OrderArchiveModel
+from infrastructure.database.order_totals import set_order_totals_from_lines
+from infrastructure.database.order_item_writer import (
+    insert_order_items, item_row, sync_order_items
+)
+from infrastructure.database import sales_rollup
+from infrastructure.database.change_tracking import (
+    current_change_seq, orders_removed_since, touch_order
+)
+from infrastructure.database.config import get_database_config_manager
+from infrastructure.database.order_loading import items_loader, with_items
+
+
+# Hot lookups are built once: per call only the bound parameters change, and
+# SQLAlchemy reuses the compiled SQL through the statement's memoized cache key
+_OPEN_ORDER_BY_TABLE = (
+    select(OrderModel)
+    .where(OrderModel.table_number == bindparam("table_number"),
+           OrderModel.status == "open")
+    .order_by(OrderModel.created_at.desc())
+    .limit(1)
+)
+_ORDERS_BY_IDS = (
+    select(OrderModel)
+    .where(OrderModel.id.in_(bindparam("order_ids", expanding=True)))
+)
+
+
+class OrderChange(NamedTuple):
+    """An order written after a change cursor"""
+    order_id: int
+    table_number: Optional[int]
+    status: str
+    version: int
+    change_seq: int
+
+
+class OrderFilter(NamedTuple):
+    """Which orders list_orders returns; unset fields do not filter"""
+    status: Optional[str] = None
+    table_number: Optional[int] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None  # exclusive
+    newest_first: bool = False
+    limit: Optional[int] = None
+    min_total: Optional[int] = None
+    max_total: Optional[int] = None
+    product_id: Optional[int] = None  # orders with at least one item of this product
+
+
+class OrderCursor(NamedTuple):
+    """
+    Position after the last order of a page: its (created_at, id) and
+    whether it came from the archive. Clients get it as an opaque token.
+    """
+    created_at: datetime
+    id: int
+    archived: bool = False
+
+    def encode(self) -> str:
+        raw = f"{self.created_at.isoformat()}|{self.id}|{int(self.archived)}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "OrderCursor":
+        """ValueError for a token that was not made by encode()"""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+            created_at, order_id, archived = raw.split("|")
+            return cls(datetime.fromisoformat(created_at), int(order_id), archived == "1")
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError(f"Invalid order cursor: {token!r}") from e
+
+
+class OrderPage(NamedTuple):
+    orders: list  # domain Orders (list_orders_page) or order models (fetch_order_page)
+    next_cursor: Optional[OrderCursor]  # None on the last page
+
+
+DEFAULT_PAGE_SIZE = 50
+
+
+def _filtered_orders(model, order_filter: OrderFilter, after: Optional[OrderCursor] = None):
+    """`model` rows matching the filter in (created_at, id) order, after `after`"""
+    query = select(model)
+    if order_filter.status is not None:
+        query = query.where(model.status == order_filter.status)
+    if order_filter.table_number is not None:
+        query = query.where(model.table_number == order_filter.table_number)
+    if order_filter.created_from is not None:
+        query = query.where(model.created_at >= order_filter.created_from)
+    if order_filter.created_to is not None:
+        query = query.where(model.created_at < order_filter.created_to)
+    if order_filter.min_total is not None:
+        query = query.where(model.total >= order_filter.min_total)
+    if order_filter.max_total is not None:
+        query = query.where(model.total <= order_filter.max_total)
+    if order_filter.product_id is not None:
+        query = query.where(model.items.any(product_id=order_filter.product_id))
+    if after is not None:
+        # Spelled out instead of a row value so SQLite ranges over the index
+        if order_filter.newest_first:
+            query = query.where(model.created_at <= after.created_at,
+                                or_(model.created_at < after.created_at, model.id < after.id))
+        else:
+            query = query.where(model.created_at >= after.created_at,
+                                or_(model.created_at > after.created_at, model.id > after.id))
+    if order_filter.newest_first:
+        return query.order_by(model.created_at.desc(), model.id.desc())
+    return query.order_by(model.created_at, model.id)
+
+
+def order_page_statement(model, order_filter: OrderFilter,
+                         after: Optional[OrderCursor] = None, limit: int = DEFAULT_PAGE_SIZE):
+    """
+    One page of `model` (OrderModel or OrderArchiveModel) with its items,
+    ordered by (created_at, id) and continuing after `after` (keyset). The
+    position comes from an index instead of OFFSET, so page 1000 costs the
+    same as page 1; one extra row is fetched to know whether more follow.
+    """
+    return (_filtered_orders(model, order_filter, after)
+            .options(items_loader(model))
+            .limit(limit + 1))
+
+
+def _sources(order_filter: OrderFilter, include_archive: bool) -> List[bool]:
+    """Tables to read in listing order (True: the archive, holding the older orders)"""
+    if not include_archive:
+        return [False]
+    return [False, True] if order_filter.newest_first else [True, False]
+
+
+def fetch_order_page(session: Session, order_filter: OrderFilter,
+                     after: Optional[OrderCursor] = None,
+                     include_archive: bool = False) -> OrderPage:
+    """
+    One page of order models (items loaded). With `include_archive` the
+    archive continues the listing: after the live orders when newest first,
+    before them when oldest first, as archived orders are the older ones.
+    """
+    limit = order_filter.limit or DEFAULT_PAGE_SIZE
+    sources = _sources(order_filter, include_archive)
+    if after is not None:
+        sources = sources[sources.index(after.archived):] if after.archived in sources else []
+    orders: list = []
+    last_archived = False  # where orders[-1] came from
+    for archived in sources:
+        model = OrderArchiveModel if archived else OrderModel
+        cursor = after if after is not None and after.archived == archived else None
+        wanted = limit - len(orders)
+        rows = session.execute(
+            order_page_statement(model, order_filter, cursor, wanted)
+        ).unique().scalars().all()
+        if rows[:wanted]:
+            orders.extend(rows[:wanted])
+            last_archived = archived
+        if len(rows) > wanted:
+            last = orders[-1]
+            return OrderPage(orders, OrderCursor(last.created_at, last.id, last_archived))
+    return OrderPage(orders, None)
+
+
+def stream_order_models(session: Session, order_filter: OrderFilter = OrderFilter(),
+                        include_archive: bool = False,
+                        batch_size: Optional[int] = None) -> Iterator[list]:
+    """
+    Every order matching the filter (its limit is ignored) as lists of at
+    most `batch_size` models with their items. Rows are fetched from the
+    open cursor batch by batch (yield_per), so memory depends on the batch
+    size, not on the history: drop each batch before taking the next.
+    """
+    batch_size = batch_size or get_database_config_manager().config.stream_batch_size
+    for archived in _sources(order_filter, include_archive):
+        model = OrderArchiveModel if archived else OrderModel
+        # selectin is the loader that works batch by batch with yield_per
+        statement = _filtered_orders(model, order_filter).options(items_loader(model, "selectin"))
+        result = session.execute(statement, execution_options={"yield_per": batch_size})
+        for batch in result.scalars().partitions():
+            yield batch
 
 
 class OrderRepositorySQLAlchemy(OrderRepository):
@@ -16,119 +201,192 @@ class OrderRepositorySQLAlchemy(OrderRepository):
     def save(self, order: Order) -> int:
         order_model = OrderModel(
             table_number=order.table_number,
-            status=order.status.value,
+            status=self._status_value(order),
             discount=order.discount.amount
         )
         self.session.add(order_model)
+        touch_order(self.session, order_model)  # version 1 and its change_seq
         self.session.flush()  # گرفتن ID
 
-        for item in order.get_items():
-            item_model = OrderItemModel(
-                order_id=order_model.id,
-                product_name=item.name,
-                unit_price=item.unit_price.amount,
-                quantity=item.quantity
-            )
-            self.session.add(item_model)
+        insert_order_items(self.session, self._item_rows(order_model.id, order))
 
-        self.session.commit()
+        set_order_totals_from_lines(order_model, self._item_lines(order))
+        self.session.flush()
+        if sales_rollup.is_closed(order_model.status):
+            sales_rollup.add_order(self.session, order_model)
+        order.mark_persisted(order_model.id, order_model.version)
         return order_model.id
 
     def get_by_id(self, order_id: int) -> Order:
-        from domain.value_objects.money import Money
-
-        order_model = self.session.get(OrderModel, order_id)
+        order_model = self.session.get(OrderModel, order_id, options=[items_loader()])
 
         if not order_model:
             raise Exception("Order not found")
 
-        order = Order(table_number=order_model.table_number)
-        order.discount = Money(order_model.discount)
-        order.status = OrderStatus(order_model.status)
+        return self._to_domain(order_model)
+    
+    def get_many(self, order_ids: Iterable[int]) -> List[Order]:
+        """Orders with these ids, in the given order (missing ids are skipped)"""
+        order_ids = list(order_ids)
+        if not order_ids:
+            return []
+        order_models = {
+            order_model.id: order_model
+            for order_model in self.session.execute(
+                with_items(_ORDERS_BY_IDS), {"order_ids": order_ids}
+            ).unique().scalars()
+        }
+        return [self._to_domain(order_models[order_id])
+                for order_id in order_ids if order_id in order_models]
+    
+    def list_orders(self, order_filter: OrderFilter = OrderFilter()) -> List[Order]:
+        """Orders matching the filter with their items (see order_loading.py)"""
+        query = _filtered_orders(OrderModel, order_filter).options(items_loader())
+        if order_filter.limit is not None:
+            query = query.limit(order_filter.limit)
+        return [self._to_domain(order_model)
+                for order_model in self.session.execute(query).unique().scalars()]
+    
+    def list_orders_page(self, order_filter: OrderFilter = OrderFilter(),
+                         after: Optional[OrderCursor] = None,
+                         include_archive: bool = False) -> OrderPage:
+        """
+        Orders matching the filter one page (`order_filter.limit`) at a time:
+        pass the returned next_cursor back as `after` for the next page.
+        """
+        page = fetch_order_page(self.session, order_filter, after, include_archive)
+        return OrderPage([self._to_domain(model) for model in page.orders], page.next_cursor)
+    
+    def _find_open_order_model(self, table_number: int, load_items: bool = False):
+        statement = with_items(_OPEN_ORDER_BY_TABLE) if load_items else _OPEN_ORDER_BY_TABLE
+        return self.session.execute(
+            statement, {"table_number": table_number}
+        ).unique().scalars().first()
 
-        items = (
-            self.session.query(OrderItemModel)
-            .filter_by(order_id=order_id)
-            .all()
-        )
+    @staticmethod
+    def _to_domain(order_model: OrderModel) -> Order:
+        """Domain order from a model whose items are loaded"""
+        from domain.value_objects.money import Money
 
-        for i in items:
+        order = Order(table_number=order_model.table_number)
+        order.created_at = order_model.created_at
+        order.discount = Money(order_model.discount)
+        for item_model in order_model.items:
             order.add_item(
-                name=i.product_name,
-                price=i.unit_price,
-                quantity=i.quantity
+                name=item_model.product_name,
+                price=item_model.unit_price,
+                quantity=item_model.quantity,
+                product_id=item_model.product_id
             )
+        # Status last: items cannot be added to a closed order
+        # (statuses are stored lowercase, the enum is uppercase)
+        status_str = order_model.status.upper() if order_model.status else "OPEN"
+        try:
+            order.status = OrderStatus[status_str]
+        except KeyError:
+            order.status = OrderStatus.OPEN
 
+        order.mark_persisted(order_model.id, order_model.version)
         return order
-    
+
+    def get_open_order_id_by_table(self, table_number: int) -> Optional[int]:
+        """Get the ID of the open order for a table, or None"""
+        order_model = self._find_open_order_model(table_number)
+        return order_model.id if order_model else None
+
     def get_open_order_by_table(self, table_number: int) -> Order:
         """Get open order for a specific table"""
-        from domain.value_objects.money import Money
-        
-        # Find open order for this table
-        order_model = (
-            self.session.query(OrderModel)
-            .filter_by(table_number=table_number, status="open")
-            .order_by(OrderModel.created_at.desc())
-            .first()
-        )
+        order_model = self._find_open_order_model(table_number, load_items=True)
         
         if not order_model:
             return None
         
-        # Convert to domain Order
-        order = Order(table_number=order_model.table_number)
-        order.discount = Money(order_model.discount)
-        # Convert lowercase status to uppercase for enum
-        status_str = order_model.status.upper() if order_model.status else "OPEN"
-        try:
-            order.status = OrderStatus[status_str]
-        except KeyError:
-            order.status = OrderStatus.OPEN
-        
-        # Load order items
-        items = (
-            self.session.query(OrderItemModel)
-            .filter_by(order_id=order_model.id)
-            .all()
-        )
-        
-        for item_model in items:
-            order.add_item(
-                name=item_model.product_name,
-                price=item_model.unit_price,
-                quantity=item_model.quantity
-            )
-        
-        return order
+        return self._to_domain(order_model)
+    
+    def list_open_orders(self) -> List[Order]:
+        """All open orders, oldest first, with their items"""
+        return self.list_orders(OrderFilter(status="open"))
     
-    def update_order(self, order_id: int, order: Order) -> None:
-        """Update existing order"""
+    def update_order(self, order_id: int, order: Order,
+                     expected_version: Optional[int] = None) -> None:
+        """
+        Update existing order. With `expected_version` the write only happens
+        if nobody changed the order since that version was read; otherwise
+        OrderConflictError is raised (also when a concurrent writer wins the
+        race, through the version check in the UPDATE itself).
+        """
         order_model = self.session.get(OrderModel, order_id)
         if not order_model:
             raise Exception("Order not found")
+        if expected_version is not None and order_model.version != expected_version:
+            raise OrderConflictError(order_id, expected_version, order_model.version)
+        
+        # A closed order leaves the daily rollup before its items are replaced
+        if sales_rollup.is_closed(order_model.status):
+            sales_rollup.remove_order(self.session, order_model)
         
         # Update order fields
-        order_model.status = order.status.value
+        order_model.status = self._status_value(order)
         order_model.discount = order.discount.amount
         
-        # Update items - remove old items and add new ones
-        self.session.query(OrderItemModel).filter_by(order_id=order_id).delete()
-        
-        for item in order.get_items():
-            item_model = OrderItemModel(
-                order_id=order_id,
-                product_name=item.name,
-                unit_price=item.unit_price.amount,
-                quantity=item.quantity
-            )
-            self.session.add(item_model)
+        # Update items - only rows that changed are written
+        sync_order_items(self.session, order_id, self._item_rows(order_id, order))
         
-        self.session.commit()
+        set_order_totals_from_lines(order_model, self._item_lines(order))
+        touch_order(self.session, order_model)
+        try:
+            self.session.flush()
+        except StaleDataError as e:
+            raise OrderConflictError(order_id, expected_version) from e
+        if sales_rollup.is_closed(order_model.status):
+            sales_rollup.add_order(self.session, order_model)
+        order.mark_persisted(order_model.id, order_model.version)
+    
+    def get_change_cursor(self) -> int:
+        """Latest change sequence number; nothing changed while it stays the same"""
+        return current_change_seq(self.session)
+    
+    def get_changes_since(self, cursor: int, limit: int = 500) -> Tuple[int, List[OrderChange]]:
+        """
+        Orders written after `cursor`, oldest change first, and the cursor to
+        pass next time. When `limit` rows come back there may be more.
+        """
+        rows = self.session.execute(
+            select(OrderModel.id, OrderModel.table_number, OrderModel.status,
+                   OrderModel.version, OrderModel.change_seq)
+            .where(OrderModel.change_seq > cursor)
+            .order_by(OrderModel.change_seq)
+            .limit(limit)
+        ).all()
+        changes = [OrderChange(*row) for row in rows]
+        return (changes[-1].change_seq if changes else cursor), changes
+    
+    def orders_removed_since(self, cursor: int) -> bool:
+        """
+        Whether orders were archived or wiped by a restore after `cursor`.
+        Those never appear in get_changes_since(): reload instead.
+        """
+        return orders_removed_since(self.session, cursor)
+    
+    @staticmethod
+    def _status_value(order: Order) -> str:
+        # Statuses are stored lowercase ("open", "closed", "cancelled"), as the web API does
+        return order.status.value.lower()
+    
+    @staticmethod
+    def _item_rows(order_id: int, order: Order):
+        return [
+            item_row(order_id, item.name, item.unit_price.amount, item.quantity, item.product_id)
+            for item in order.get_items()
+        ]
+    
+    @staticmethod
+    def _item_lines(order: Order):
+        return [(item.unit_price.amount, item.quantity) for item in order.get_items()]
     
     def add(self, order_item: OrderItem) -> None:
         self.session.add(order_item)
-        self.session.commit()
+        self.session.flush()
 
     def list(self):
         return self.session.query(OrderItem).all()
\ No newline at end of file
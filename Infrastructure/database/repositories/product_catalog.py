@@ -0,0 +1,224 @@
+# infrastructure/database/repositories/product_catalog.py
+"""
+In-memory menu shared by the whole process.
+
+The menu is read on every product click but changes a few times a week.
+ProductCatalog publishes it as a MenuCatalog: an immutable, versioned
+snapshot with the products by id, the active products by category and the
+sorted category list. Readers take the current snapshot and keep using it;
+nothing in it ever changes, so one screen renders from one consistent menu
+without locks. It stays correct this way:
+
+- Writes through ProductRepositorySQLAlchemy are applied write-through once
+  their write unit is committed (`call_after_commit`): the catalog builds a
+  new snapshot with the change and swaps it in. A unit that fails is never
+  applied.
+- Every snapshot records the `table:products` change counter it matches
+  (change_detector.py). A write from another connection or process, such
+  as the web server, a restore or the seeding at startup, moves the counter
+  past it, and the next read loads a new snapshot (one query).
+
+`get_product_catalog().stats` counts hits and loads.
+"""
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from infrastructure.database.change_detector import TABLE_COUNTER_PREFIX, get_change_detector
+from infrastructure.database.models.change_counter_model import ChangeCounterModel
+from infrastructure.database.models.product_model import ProductModel
+
+PRODUCTS_TABLE = "products"
+
+_ALL_PRODUCTS = select(ProductModel).order_by(ProductModel.id)
+_PRODUCTS_VERSION = select(ChangeCounterModel.value).where(
+    ChangeCounterModel.name == TABLE_COUNTER_PREFIX + PRODUCTS_TABLE
+)
+
+
+def products_version(session: Session) -> Optional[int]:
+    """The products change counter as `session` sees it"""
+    return session.execute(_PRODUCTS_VERSION).scalar()
+
+
+class MenuProduct(NamedTuple):
+    """A product as the menu shows it (read-only)"""
+    id: int
+    name: str
+    price: int
+    category: str
+    is_active: bool
+
+
+@dataclass(frozen=True, eq=False)
+class MenuCatalog:
+    """Immutable snapshot of the menu; edits publish a new one"""
+    version: int  # grows with every published snapshot
+    products_version: Optional[int]  # products change counter it matches
+    by_id: Mapping[int, MenuProduct]  # every product, active or not, by id
+    active: Tuple[MenuProduct, ...]  # by id
+    active_by_category: Mapping[str, Tuple[MenuProduct, ...]]
+    categories: Tuple[str, ...]  # sorted, only those with active products
+
+    @classmethod
+    def build(cls, version: int, products_version: Optional[int],
+              products: Iterable[MenuProduct]) -> "MenuCatalog":
+        by_id = {product.id: product for product in sorted(products)}
+        active = tuple(product for product in by_id.values() if product.is_active)
+        by_category: Dict[str, List[MenuProduct]] = {}
+        for product in active:
+            by_category.setdefault(product.category, []).append(product)
+        return cls(
+            version=version,
+            products_version=products_version,
+            by_id=MappingProxyType(by_id),
+            active=active,
+            active_by_category=MappingProxyType(
+                {category: tuple(items) for category, items in by_category.items()}
+            ),
+            categories=tuple(sorted(by_category)),
+        )
+
+    def get(self, product_id: int) -> Optional[MenuProduct]:
+        return self.by_id.get(product_id)
+
+    def in_category(self, category: Optional[str]) -> Tuple[MenuProduct, ...]:
+        """Active products of `category`; every active product for None"""
+        if category is None:
+            return self.active
+        return self.active_by_category.get(category, ())
+
+    def with_product(self, product: MenuProduct, version: int,
+                     products_version: Optional[int]) -> "MenuCatalog":
+        """A new snapshot with `product` added or replaced"""
+        products = dict(self.by_id)
+        products[product.id] = product
+        return MenuCatalog.build(version, products_version, products.values())
+
+
+@dataclass
+class CatalogStats:
+    hits: int = 0  # reads answered from the current snapshot
+    loads: int = 0  # reads that loaded a new snapshot
+    write_throughs: int = 0  # committed repository writes published without a load
+    invalidations: int = 0  # loads caused by another connection's write
+
+    @property
+    def hit_ratio(self) -> float:
+        reads = self.hits + self.loads
+        return self.hits / reads if reads else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.hit_ratio:.0%} hits ({self.hits} hits, {self.loads} loads, "
+                f"{self.write_throughs} write-through, {self.invalidations} invalidated)")
+
+
+class ProductCatalog:
+    """Publishes MenuCatalog snapshots of the products table"""
+
+    def __init__(self, detector=None):
+        self._detector = detector
+        self._lock = threading.Lock()  # serializes publishes; never held during a query
+        self._snapshot: Optional[MenuCatalog] = None
+        self._published = 0
+        self.stats = CatalogStats()
+
+    def snapshot(self, session: Optional[Session] = None) -> MenuCatalog:
+        """
+        The current menu. Loads a new snapshot (with `session`, or a
+        read-only session of its own) only when the products changed.
+        """
+        snapshot = self._snapshot
+        if self._is_current(snapshot):
+            self.stats.hits += 1
+            return snapshot
+        # Loaded without the lock: a web route's session (AsyncSession.run_sync)
+        # hands the event loop to other requests while its query runs, and
+        # they would block the loop thread on a lock held across that await
+        if session is not None:
+            version, products = self._read(session)
+        else:
+            from infrastructure.database.read_session import read_session_scope
+
+            with read_session_scope() as read_session:
+                version, products = self._read(read_session)
+        return self._publish_loaded(version, products, stale=snapshot is not None)
+
+    def apply(self, product: MenuProduct, version_before: Optional[int],
+              version_after: Optional[int]) -> None:
+        """
+        Write-through of one committed write that moved the products counter
+        from `version_before` to `version_after`. When the snapshot does not
+        match `version_before`, something else was written in between and
+        the next read loads instead.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.products_version != version_before:
+                return
+            self._publish(snapshot.with_product(product, self._next_version(), version_after))
+            self.stats.write_throughs += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+    def _is_current(self, snapshot: Optional[MenuCatalog]) -> bool:
+        # Without change counters (database not migrated) nothing is kept
+        if snapshot is None or snapshot.products_version is None:
+            return False
+        detector = self._detector or get_change_detector()
+        return detector.versions().get(PRODUCTS_TABLE) == snapshot.products_version
+
+    @staticmethod
+    def _read(session: Session) -> Tuple[Optional[int], List[MenuProduct]]:
+        # Counter first: a write between the two reads leaves the snapshot
+        # older than the counter says, so the next read loads again
+        version = products_version(session)
+        products = [
+            MenuProduct(model.id, model.name, model.price, model.category, bool(model.is_active))
+            for model in session.execute(_ALL_PRODUCTS).scalars()
+        ]
+        return version, products
+
+    def _publish_loaded(self, version: Optional[int], products: List[MenuProduct],
+                        stale: bool = False) -> MenuCatalog:
+        """
+        Publish a loaded menu unless a load or write-through that finished
+        first already published the same or a newer products version.
+        """
+        with self._lock:
+            current = self._snapshot
+            if stale:
+                self.stats.invalidations += 1
+            self.stats.loads += 1
+            if (current is not None and current.products_version is not None
+                    and version is not None and current.products_version >= version):
+                return current
+            return self._publish(MenuCatalog.build(self._next_version(), version, products))
+
+    def _next_version(self) -> int:
+        self._published += 1
+        return self._published
+
+    def _publish(self, snapshot: MenuCatalog) -> MenuCatalog:
+        # One reference assignment: readers see the old or the new menu
+        self._snapshot = snapshot
+        return snapshot
+
+
+_catalog: Optional[ProductCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_product_catalog() -> ProductCatalog:
+    """Process-wide catalog of the configured database"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ProductCatalog()
+        return _catalog
@@ -1,15 +1,38 @@
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from domain.entities.product import Product
 from domain.repository.product_repository import ProductRepository
 from infrastructure.database.models.product_model import ProductModel
+from infrastructure.database.repositories.product_catalog import (
+    MenuProduct, get_product_catalog, products_version
+)
+from infrastructure.database.write_queue import call_after_commit
+
+# Built once; only the bound parameters change per call
+_ALL_PRODUCTS = select(ProductModel)
+_ACTIVE_PRODUCTS = select(ProductModel).where(ProductModel.is_active == True)  # noqa: E712
+_ACTIVE_PRODUCTS_BY_CATEGORY = _ACTIVE_PRODUCTS.where(
+    ProductModel.category == bindparam("category")
+)
+
+# session.info flag: this session wrote products, its reads skip the catalog
+_WROTE_PRODUCTS = "wrote_products"
 
 
 class ProductRepositorySQLAlchemy(ProductRepository):
+    """
+    Reads come from the shared menu snapshot (product_catalog.py) unless
+    this session has written products itself; writes go to the database
+    and, once committed, into a new snapshot.
+    """
+
     def __init__(self, session: Session):
         self.session = session
+        self.catalog = get_product_catalog()
 
     def save(self, product: Product) -> int:
+        version_before = products_version(self.session)
         product_model = ProductModel(
             name=product.name,
             price=product.price,
@@ -17,84 +40,104 @@ class ProductRepositorySQLAlchemy(ProductRepository):
             is_active=product.is_active
         )
         self.session.add(product_model)
-        self.session.commit()
+        self.session.flush()
+        self._write_through(product_model, version_before)
         return product_model.id
 
     def get_by_id(self, product_id: int) -> Optional[Product]:
+        if self._use_catalog():
+            product = self.catalog.snapshot(self.session).get(product_id)
+            return self._from_menu(product) if product else None
+
         product_model = self.session.get(ProductModel, product_id)
         if not product_model:
             return None
 
-        return Product(
-            id=product_model.id,
-            name=product_model.name,
-            price=product_model.price,
-            category=product_model.category,
-            is_active=product_model.is_active
-        )
+        return self._to_product(product_model)
 
     def get_all(self) -> List[Product]:
         """دریافت همه محصولات (فعال و غیرفعال)"""
-        product_models = self.session.query(ProductModel).all()
-
-        return [
-            Product(
-                id=model.id,
-                name=model.name,
-                price=model.price,
-                category=model.category,
-                is_active=model.is_active
-            )
-            for model in product_models
-        ]
+        if self._use_catalog():
+            return [self._from_menu(p) for p in self.catalog.snapshot(self.session).by_id.values()]
+
+        product_models = self.session.execute(_ALL_PRODUCTS).scalars().all()
+        return [self._to_product(model) for model in product_models]
 
     def get_all_active(self) -> List[Product]:
-        product_models = (
-            self.session.query(ProductModel)
-            .filter_by(is_active=True)
-            .all()
-        )
+        if self._use_catalog():
+            return [self._from_menu(p) for p in self.catalog.snapshot(self.session).active]
 
-        return [
-            Product(
-                id=model.id,
-                name=model.name,
-                price=model.price,
-                category=model.category,
-                is_active=model.is_active
-            )
-            for model in product_models
-        ]
+        product_models = self.session.execute(_ACTIVE_PRODUCTS).scalars().all()
+        return [self._to_product(model) for model in product_models]
 
     def get_by_category(self, category: str) -> List[Product]:
-        product_models = (
-            self.session.query(ProductModel)
-            .filter_by(category=category, is_active=True)
-            .all()
-        )
+        if self._use_catalog():
+            return [self._from_menu(p)
+                    for p in self.catalog.snapshot(self.session).in_category(category)]
 
-        return [
-            Product(
-                id=model.id,
-                name=model.name,
-                price=model.price,
-                category=model.category,
-                is_active=model.is_active
-            )
-            for model in product_models
-        ]
+        product_models = self.session.execute(
+            _ACTIVE_PRODUCTS_BY_CATEGORY, {"category": category}
+        ).scalars().all()
+        return [self._to_product(model) for model in product_models]
+
+    def get_categories(self) -> List[str]:
+        """دسته‌بندی‌های دارای محصول فعال، مرتب شده"""
+        if self._use_catalog():
+            return list(self.catalog.snapshot(self.session).categories)
+
+        return sorted({product.category for product in self.get_all_active()})
 
     def update(self, product: Product) -> None:
         product_model = self.session.get(ProductModel, product.id)
         if product_model:
+            version_before = products_version(self.session)
             product_model.name = product.name
             product_model.price = product.price
             product_model.category = product.category
             product_model.is_active = product.is_active
-            self.session.commit()
+            self.session.flush()
+            self._write_through(product_model, version_before)
 
     def delete(self, product_id: int) -> None:
         product_model = self.session.get(ProductModel, product_id)
         if product_model:
+            version_before = products_version(self.session)
             product_model.is_active = False
-            self.session.commit()
+            self.session.flush()
+            self._write_through(product_model, version_before)
+
+    def _use_catalog(self) -> bool:
+        return not self.session.info.get(_WROTE_PRODUCTS)
+
+    def _write_through(self, product_model: ProductModel, version_before: Optional[int]) -> None:
+        """Apply a flushed write to the catalog once its transaction commits"""
+        self.session.info[_WROTE_PRODUCTS] = True
+        product = MenuProduct(product_model.id, product_model.name, product_model.price,
+                              product_model.category, bool(product_model.is_active))
+        version_after = products_version(self.session)
+        # Outside a write unit nothing is registered; the catalog then
+        # reloads on its next read because the counter moved
+        call_after_commit(
+            self.session, lambda: self.catalog.apply(product, version_before, version_after)
+        )
+
+    @staticmethod
+    def _from_menu(product: MenuProduct) -> Product:
+        # A fresh entity: callers may change it, the snapshot stays as it is
+        return Product(
+            id=product.id,
+            name=product.name,
+            price=product.price,
+            category=product.category,
+            is_active=product.is_active
+        )
+
+    @staticmethod
+    def _to_product(model: ProductModel) -> Product:
+        return Product(
+            id=model.id,
+            name=model.name,
+            price=model.price,
+            category=model.category,
+            is_active=model.is_active
+        )
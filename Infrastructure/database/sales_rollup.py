@@ -0,0 +1,162 @@
+# infrastructure/database/sales_rollup.py
+"""
+Daily sales rollup.
+
+`daily_sales` and `daily_product_sales` hold the totals of closed orders,
+one row per day (the date of `orders.created_at`), so that month and range
+reports read a handful of rows instead of aggregating `orders` and
+`order_items` for every day. They are adjusted in the same transaction that
+moves an order into or out of the closed state; `rebuild_daily_sales`
+recomputes them from the raw tables.
+
+Rebuild from the command line:
+
+    python -m infrastructure.database.sales_rollup
+"""
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import case, func, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from infrastructure.database.models.order_model import OrderModel
+from infrastructure.database.models.order_item_model import OrderItemModel
+from infrastructure.database.models.daily_sales_model import (
+    DailySalesModel, DailyProductSalesModel
+)
+
+CLOSED_STATUS = "closed"
+
+
+def is_closed(status: Optional[str]) -> bool:
+    return (status or "").lower() == CLOSED_STATUS
+
+
+def order_day(order_model: OrderModel) -> date:
+    return (order_model.created_at or datetime.utcnow()).date()
+
+
+def add_order(session: Session, order_model: OrderModel) -> None:
+    """Count a closed order in the rollup (its items and totals must be written)"""
+    _apply(session, order_model, 1)
+
+
+def remove_order(session: Session, order_model: OrderModel) -> None:
+    """Take a previously closed order out of the rollup, before its items change"""
+    _apply(session, order_model, -1)
+
+
+def on_status_change(session: Session, order_model: OrderModel,
+                     old_status: Optional[str]) -> None:
+    """Adjust the rollup after `order_model.status` changed from `old_status`"""
+    was_closed, now_closed = is_closed(old_status), is_closed(order_model.status)
+    if now_closed and not was_closed:
+        add_order(session, order_model)
+    elif was_closed and not now_closed:
+        remove_order(session, order_model)
+
+
+def _apply(session: Session, order_model: OrderModel, sign: int) -> None:
+    session.flush()
+    day = order_day(order_model)
+
+    daily = session.get(DailySalesModel, day)
+    if daily is None:
+        daily = DailySalesModel(day=day, orders_count=0, gross_sales=0,
+                                total_discounts=0, net_sales=0)
+        session.add(daily)
+    daily.orders_count += sign
+    daily.gross_sales += sign * order_model.subtotal
+    daily.total_discounts += sign * (order_model.discount or 0)
+    daily.net_sales += sign * order_model.total
+
+    # Custom items (no product_id) are kept apart by name
+    custom_name = case(
+        (OrderItemModel.product_id.is_(None), OrderItemModel.product_name),
+        else_=None
+    )
+    lines = session.execute(
+        select(
+            OrderItemModel.product_id,
+            func.max(OrderItemModel.product_name),
+            func.sum(OrderItemModel.quantity),
+            func.sum(OrderItemModel.unit_price * OrderItemModel.quantity)
+        )
+        .where(OrderItemModel.order_id == order_model.id)
+        .group_by(OrderItemModel.product_id, custom_name)
+    ).all()
+
+    rows = {
+        _product_key(row.product_id, row.product_name): row
+        for row in session.query(DailyProductSalesModel).filter_by(day=day)
+    }
+    for product_id, product_name, quantity, revenue in lines:
+        row = rows.get(_product_key(product_id, product_name))
+        if row is None:
+            row = DailyProductSalesModel(day=day, product_id=product_id,
+                                         product_name=product_name,
+                                         quantity=0, revenue=0, orders_count=0)
+            session.add(row)
+        if product_id is not None and sign > 0:
+            row.product_name = product_name  # latest name snapshot
+        row.quantity += sign * quantity
+        row.revenue += sign * revenue
+        row.orders_count += sign
+        if row.orders_count <= 0 and row not in session.new:
+            session.delete(row)
+
+    if daily.orders_count <= 0 and daily not in session.new:
+        session.delete(daily)
+    session.flush()
+
+
+def _product_key(product_id: Optional[int], product_name: str):
+    return (product_id, None) if product_id is not None else (None, product_name)
+
+
+# Live and archived rows (see infrastructure/database/archive.py)
+_ALL_ORDERS = (
+    "(SELECT id, status, created_at, discount, subtotal, total FROM orders"
+    " UNION ALL"
+    " SELECT id, status, created_at, discount, subtotal, total FROM orders_archive)"
+)
+_ALL_ORDER_ITEMS = (
+    "(SELECT order_id, product_id, product_name, unit_price, quantity FROM order_items"
+    " UNION ALL"
+    " SELECT order_id, product_id, product_name, unit_price, quantity FROM order_items_archive)"
+)
+
+
+def rebuild_daily_sales(conn: Connection) -> int:
+    """Recompute the whole rollup from live and archived orders; returns the number of days"""
+    conn.execute(text("DELETE FROM daily_product_sales"))
+    conn.execute(text("DELETE FROM daily_sales"))
+    conn.execute(text(
+        "INSERT INTO daily_sales (day, orders_count, gross_sales, total_discounts, net_sales)"
+        " SELECT date(created_at), COUNT(*), SUM(subtotal),"
+        "        SUM(COALESCE(discount, 0)), SUM(total)"
+        f" FROM {_ALL_ORDERS}"
+        " WHERE lower(status) = :closed AND created_at IS NOT NULL"
+        " GROUP BY date(created_at)"
+    ), {"closed": CLOSED_STATUS})
+    conn.execute(text(
+        "INSERT INTO daily_product_sales"
+        " (day, product_id, product_name, quantity, revenue, orders_count)"
+        " SELECT date(o.created_at), i.product_id, MAX(i.product_name),"
+        "        SUM(i.quantity), SUM(i.unit_price * i.quantity),"
+        "        COUNT(DISTINCT i.order_id)"
+        f" FROM {_ALL_ORDER_ITEMS} i JOIN {_ALL_ORDERS} o ON o.id = i.order_id"
+        " WHERE lower(o.status) = :closed AND o.created_at IS NOT NULL"
+        " GROUP BY date(o.created_at), i.product_id,"
+        "          CASE WHEN i.product_id IS NULL THEN i.product_name END"
+    ), {"closed": CLOSED_STATUS})
+    return conn.execute(text("SELECT COUNT(*) FROM daily_sales")).scalar()
+
+
+if __name__ == "__main__":
+    from infrastructure.database.session import init_db, run_in_transaction
+
+    init_db()
+    days = run_in_transaction(lambda session: rebuild_daily_sales(session.connection()))
+    print(f"✅ Daily sales rollup rebuilt for {days} day(s)")
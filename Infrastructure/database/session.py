@@ -1,22 +1,160 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Iterator, TypeVar
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
 
 from infrastructure.database.base import Base
+from infrastructure.database.config import DatabaseConfig, get_database_config_manager
+from infrastructure.database.query_stats import instrument_engine
+from infrastructure.database.slow_query_log import install_slow_query_log
+
+T = TypeVar("T")
+
+db_config = get_database_config_manager().config
+
+DATABASE_URL = db_config.database_url
+
+
+def apply_sqlite_pragmas(dbapi_connection, config: DatabaseConfig) -> None:
+    """Apply the engine profile to a freshly opened SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={config.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={config.synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config.busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA cache_size={-int(config.cache_size_kb)}")
+        cursor.execute(f"PRAGMA mmap_size={int(config.mmap_size_mb) * 1024 * 1024}")
+        cursor.execute(f"PRAGMA temp_store={config.temp_store}")
+    finally:
+        cursor.close()
 
-DATABASE_URL = "sqlite:///cafe.db"
 
 engine = create_engine(
     DATABASE_URL,
     echo=False,
-    future=True
+    future=True,
+    connect_args={"timeout": db_config.busy_timeout_ms / 1000}
 )
 
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    apply_sqlite_pragmas(dbapi_connection, db_config)
+
+
+instrument_engine(engine)
+install_slow_query_log(engine, db_config)
+
+
+# Sessions that have been opened but not closed yet (leak detection)
+_open_sessions: "weakref.WeakSet[Session]" = weakref.WeakSet()
+
+
+class TrackedSession(Session):
+    """Session that registers itself until it is closed"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _open_sessions.add(self)
+
+    def close(self) -> None:
+        super().close()
+        _open_sessions.discard(self)
+
+
 SessionLocal = sessionmaker(
     bind=engine,
+    class_=TrackedSession,
     autoflush=False,
-    autocommit=False
+    autocommit=False,
+    # Objects returned from a unit of work stay readable after it closes
+    expire_on_commit=False
 )
 
 
+def open_session_count() -> int:
+    """Number of sessions created through SessionLocal and not closed yet"""
+    return len(_open_sessions)
+
+
+@contextmanager
+def assert_no_session_leaks() -> Iterator[None]:
+    """Fail if the wrapped code leaves more sessions open than it found"""
+    before = open_session_count()
+    yield
+    leaked = open_session_count() - before
+    if leaked > 0:
+        raise AssertionError(f"{leaked} database session(s) left open")
+
+
+def is_busy_error(error: Exception) -> bool:
+    """True if the error is SQLite reporting a locked/busy database"""
+    if not isinstance(error, OperationalError):
+        return False
+    message = str(error.orig).lower() if error.orig is not None else str(error).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def with_busy_retry(work: Callable[[], T], on_retry: Callable[[], None] = None) -> T:
+    """
+    Run a write transaction, retrying it when SQLite reports SQLITE_BUSY.
+    `work` must be safe to re-run from scratch; `on_retry` is called before
+    each new attempt.
+    """
+    attempts = max(1, db_config.busy_retry_attempts)
+    delay = db_config.busy_retry_backoff_ms / 1000
+    for attempt in range(attempts):
+        try:
+            return work()
+        except OperationalError as e:
+            if not is_busy_error(e) or attempt == attempts - 1:
+                raise
+            if on_retry is not None:
+                on_retry()
+            time.sleep(delay)
+            delay *= 2
+
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    Unit of work: one session per operation, committed when the block
+    succeeds, rolled back when it raises, and always closed.
+    """
+    session = SessionLocal()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def run_in_transaction(work: Callable[[Session], T]) -> T:
+    """
+    Run `work` as one write unit on the single writer thread and wait for it
+    (see write_queue.py). It may share a transaction with other units and is
+    re-run as a whole if another process holds the write lock.
+    """
+    from infrastructure.database.write_queue import get_write_queue
+
+    return get_write_queue().submit(work).result()
+
+
 def init_db():
+    """Create missing tables, then bring existing databases up to date"""
+    # Register every model on Base.metadata before create_all
+    from infrastructure.database.models import (  # noqa: F401
+        archive_model, change_counter_model, daily_sales_model, maintenance_run_model,
+        order_item_model, order_model, product_model, user_model
+    )
+    from infrastructure.database.migrations import run_migrations
+
     Base.metadata.create_all(engine)
+    run_migrations(engine)
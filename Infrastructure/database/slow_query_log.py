@@ -0,0 +1,203 @@
+# infrastructure/database/slow_query_log.py
+"""
+Opt-in slow-query log.
+
+When `slow_query_log` is enabled in the database config, every statement
+that takes longer than `slow_query_threshold_ms` is written to a rotating
+file (`slow_query_log_file`) together with its parameters, the code that
+issued it and SQLite's `EXPLAIN QUERY PLAN` for it:
+
+    2026-10-17 12:30:01 152.3 ms
+      caller:  ReportService.get_table_performance (report_service.py:212)
+      context: GET /api/reports/tables
+      sql:     SELECT ... FROM orders WHERE ...
+      params:  ('2026-10-01 00:00:00', 'closed')
+      plan:
+        SCAN orders
+        USE TEMP B-TREE FOR GROUP BY
+
+The hooks stay installed while the log is disabled and then only read a
+flag, so it can be switched on from the desktop settings without a restart.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import greenlet
+except ImportError:  # only installed with the async (web) extras
+    greenlet = None
+
+from infrastructure.database.config import DatabaseConfig
+from infrastructure.database.query_stats import active_labels
+
+LOG_BACKUP_COUNT = 3
+MAX_PARAMS_CHARS = 500
+
+# Statements SQLite can explain; PRAGMA/DDL/transaction control are skipped
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# Frames in these modules are plumbing, never the "caller" of a statement
+_INTERNAL_MODULES = (
+    "infrastructure.database.session",
+    "infrastructure.database.async_session",
+    "infrastructure.database.query_stats",
+    "infrastructure.database.slow_query_log",
+)
+_APP_PACKAGES = ("application.", "infrastructure.", "web.", "ui.", "domain.")
+
+_logger = logging.getLogger("cafe.slow_queries")
+_logger.propagate = False
+# Our own file handler: handlers added by whoever configures logging do not replace it
+_handler: Optional[RotatingFileHandler] = None
+_handler_lock = threading.Lock()
+
+
+def _ensure_handler(config: DatabaseConfig) -> None:
+    global _handler
+    if _handler is not None:
+        return
+    with _handler_lock:
+        if _handler is not None:
+            return
+        directory = os.path.dirname(config.slow_query_log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = RotatingFileHandler(
+            config.slow_query_log_file,
+            maxBytes=config.slow_query_log_max_kb * 1024,
+            backupCount=LOG_BACKUP_COUNT,
+            encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s",
+                                               "%Y-%m-%d %H:%M:%S"))
+        _logger.addHandler(handler)
+        _logger.setLevel(logging.WARNING)
+        _handler = handler
+
+
+def _app_frame(frame) -> Optional[str]:
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith(_APP_PACKAGES) and module not in _INTERNAL_MODULES:
+            code = frame.f_code
+            return (f"{getattr(code, 'co_qualname', code.co_name)} "
+                    f"({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return None
+
+
+def find_caller() -> Optional[str]:
+    """Innermost application frame (repository method, service, route)"""
+    caller = _app_frame(sys._getframe(1))
+    if caller is None and greenlet is not None:
+        # The async engine runs statements in a child greenlet; the awaiting
+        # route is suspended in its parent
+        parent = greenlet.getcurrent().parent
+        if parent is not None:
+            caller = _app_frame(parent.gr_frame)
+    return caller
+
+
+def format_params(parameters, executemany: bool) -> str:
+    if executemany and parameters:
+        text = f"{parameters[0]!r} (+{len(parameters) - 1} more rows)"
+    else:
+        text = repr(parameters)
+    if len(text) > MAX_PARAMS_CHARS:
+        text = text[:MAX_PARAMS_CHARS] + "..."
+    return text
+
+
+def explain_query_plan(dbapi_connection, statement: str, parameters,
+                       executemany: bool) -> List[str]:
+    """`EXPLAIN QUERY PLAN` rows as indented lines; the statement is not run"""
+    if not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return []
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters or ())
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def read_slow_query_log(max_bytes: int = 200_000, config: Optional[DatabaseConfig] = None) -> str:
+    """Tail of the current log file, for the desktop viewer"""
+    if config is None:
+        from infrastructure.database.config import get_database_config_manager
+        config = get_database_config_manager().config
+    path = config.slow_query_log_file
+    if not os.path.exists(path):
+        return ""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - max_bytes))
+        data = f.read()
+    text = data.decode("utf-8", errors="replace")
+    if size > max_bytes:
+        # Drop the partial first line
+        text = text.split("\n", 1)[-1]
+    return text
+
+
+def install_slow_query_log(engine: Engine, config: DatabaseConfig) -> None:
+    """Install the hooks on a (sync) engine; `config` is read on every statement"""
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if config.slow_query_log and context is not None:
+            context._slow_query_start = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_start", None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms < config.slow_query_threshold_ms:
+            return
+        try:
+            plan = explain_query_plan(conn.connection.dbapi_connection,
+                                      statement, parameters, executemany)
+        except Exception as e:
+            plan = [f"(EXPLAIN failed: {e})"]
+        caller = find_caller() or "-"
+        labels = " > ".join(active_labels()) or "-"
+        lines = [
+            f"{elapsed_ms:.1f} ms",
+            f"  caller:  {caller}",
+            f"  context: {labels}",
+            f"  sql:     {' '.join(statement.split())}",
+            f"  params:  {format_params(parameters, executemany)}",
+        ]
+        if plan:
+            lines.append("  plan:")
+            lines.extend("    " + line for line in plan)
+        try:
+            _ensure_handler(config)
+            _logger.warning("\n".join(lines) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not write slow query log: {e}")
+            return
+        print(f"🐢 Slow query ({elapsed_ms:.0f} ms) in {caller} -> {config.slow_query_log_file}")
+
+    if getattr(engine, "_slow_query_log_installed", False):
+        return
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    engine._slow_query_log_installed = True
@@ -0,0 +1,115 @@
+# infrastructure/database/statement_bench.py
+"""
+Micro-benchmark: legacy `session.query` lookups rebuilt on every call versus
+the prebuilt statements the repositories use now. Both sides run the same
+SQL against the configured database, so the difference is the per-call
+Python overhead of building the query and its cache key.
+
+    python -m infrastructure.database.statement_bench [calls]
+"""
+import asyncio
+import sys
+import timeit
+from typing import Callable, List, Tuple
+
+from sqlalchemy import bindparam, select
+
+from infrastructure.database.session import SessionLocal, init_db
+from infrastructure.database.models.order_model import OrderModel
+from infrastructure.database.models.order_item_model import OrderItemModel
+from infrastructure.database.models.product_model import ProductModel
+from infrastructure.database.models.user_model import UserModel
+from infrastructure.database.repositories import order_repository_sqlalchemy as orders
+from infrastructure.database.repositories import product_repository_sqlalchemy as products
+from infrastructure.database.order_loading import items_loader, with_items
+
+REPEAT = 5
+
+_ITEMS_BY_ORDER = (
+    select(OrderItemModel)
+    .where(OrderItemModel.order_id == bindparam("order_id"))
+    .order_by(OrderItemModel.id)
+)
+
+
+def _best_us(func: Callable[[], object], calls: int) -> float:
+    func()  # warm the compiled cache
+    return min(timeit.repeat(func, number=calls, repeat=REPEAT)) / calls * 1_000_000
+
+
+def _sync_cases(session) -> List[Tuple[str, Callable, Callable]]:
+    table_number = 1
+    order_id = session.execute(select(OrderModel.id).limit(1)).scalar() or 0
+    category = session.execute(select(ProductModel.category).limit(1)).scalar() or ""
+    return [
+        ("open order by table",
+         lambda: session.query(OrderModel)
+         .filter_by(table_number=table_number, status="open")
+         .order_by(OrderModel.created_at.desc()).first(),
+         lambda: session.execute(orders._OPEN_ORDER_BY_TABLE,
+                                 {"table_number": table_number}).scalars().first()),
+        ("open order with items",
+         lambda: session.query(OrderModel)
+         .options(items_loader())
+         .filter_by(table_number=table_number, status="open")
+         .order_by(OrderModel.created_at.desc()).first(),
+         lambda: session.execute(with_items(orders._OPEN_ORDER_BY_TABLE),
+                                 {"table_number": table_number}).unique().scalars().first()),
+        ("order items by order",
+         lambda: session.query(OrderItemModel).filter_by(order_id=order_id).all(),
+         lambda: session.execute(_ITEMS_BY_ORDER, {"order_id": order_id}).scalars().all()),
+        ("active products",
+         lambda: session.query(ProductModel).filter_by(is_active=True).all(),
+         lambda: session.execute(products._ACTIVE_PRODUCTS).scalars().all()),
+        ("active products by category",
+         lambda: session.query(ProductModel)
+         .filter_by(category=category, is_active=True).all(),
+         lambda: session.execute(products._ACTIVE_PRODUCTS_BY_CATEGORY,
+                                 {"category": category}).scalars().all()),
+    ]
+
+
+async def _user_lookup_us(calls: int) -> Tuple[float, float]:
+    from infrastructure.database.async_session import AsyncSessionLocal
+    from web.auth import _USER_BY_USERNAME
+
+    async with AsyncSessionLocal() as db:
+        username = (await db.execute(select(UserModel.username).limit(1))).scalar() or ""
+
+        async def run(build) -> float:
+            await build()
+            best = None
+            for _ in range(REPEAT):
+                loop = asyncio.get_running_loop()
+                started = loop.time()
+                for _ in range(calls):
+                    await build()
+                elapsed = loop.time() - started
+                best = elapsed if best is None else min(best, elapsed)
+            return best / calls * 1_000_000
+
+        async def rebuilt():
+            return (await db.execute(select(UserModel).filter_by(username=username))).scalars().first()
+
+        async def prebuilt():
+            return (await db.execute(_USER_BY_USERNAME, {"username": username})).scalars().first()
+
+        return await run(rebuilt), await run(prebuilt)
+
+
+def run_benchmark(calls: int = 2000) -> None:
+    init_db()
+    print(f"{'lookup':<30}{'rebuilt µs':>12}{'prebuilt µs':>13}{'saved':>8}")
+    session = SessionLocal()
+    try:
+        for name, rebuilt, prebuilt in _sync_cases(session):
+            before, after = _best_us(rebuilt, calls), _best_us(prebuilt, calls)
+            print(f"{name:<30}{before:>12.1f}{after:>13.1f}{1 - after / before:>8.0%}")
+    finally:
+        session.close()
+    before, after = asyncio.run(_user_lookup_us(calls))
+    print(f"{'user by username (async)':<30}{before:>12.1f}{after:>13.1f}{1 - after / before:>8.0%}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,171 @@
+# infrastructure/database/write_bench.py
+"""
+Contention benchmark: N threads each saving orders (an order, three items,
+totals and its change_seq), once with every thread writing through its own
+session with `with_busy_retry`, once through the single-writer WriteQueue.
+Both runs use a fresh temporary database with the configured pragmas.
+
+    python -m infrastructure.database.write_bench [threads] [writes_per_thread]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, List
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+from infrastructure.database.base import Base
+from infrastructure.database.change_tracking import touch_order
+from infrastructure.database.config import DatabaseConfig, get_database_config_manager
+from infrastructure.database.models.order_model import OrderModel
+from infrastructure.database.order_item_writer import insert_order_items, item_row
+from infrastructure.database.order_totals import set_order_totals_from_lines
+from infrastructure.database.query_stats import instrument_engine
+from infrastructure.database.session import apply_sqlite_pragmas, is_busy_error
+from infrastructure.database.slow_query_log import install_slow_query_log
+from infrastructure.database.write_queue import WriteQueue, create_writer_engine
+
+ITEMS = [("Espresso", 90_000, 2), ("Croissant", 120_000, 1), ("Water", 30_000, 1)]
+
+
+def save_order(session: Session, table_number: int) -> int:
+    order = OrderModel(table_number=table_number, status="open", discount=0)
+    session.add(order)
+    touch_order(session, order)
+    session.flush()
+    insert_order_items(session, [item_row(order.id, name, price, quantity, None)
+                                 for name, price, quantity in ITEMS])
+    set_order_totals_from_lines(order, [(price, quantity) for _, price, quantity in ITEMS])
+    return order.id
+
+
+def _fresh_database(directory: str, name: str) -> str:
+    from infrastructure.database.models import (  # noqa: F401
+        archive_model, change_counter_model, daily_sales_model, maintenance_run_model,
+        order_item_model, order_model, product_model, user_model
+    )
+    from infrastructure.database.migrations import run_migrations
+
+    url = f"sqlite:///{os.path.join(directory, name)}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    engine.dispose()
+    return url
+
+
+def _run_threads(threads: int, writes: int, write: Callable[[int], None]) -> List[float]:
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def worker(index: int) -> None:
+        mine = []
+        for _ in range(writes):
+            started = time.perf_counter()
+            write(index + 1)
+            mine.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(mine)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies
+
+
+def bench_direct(url: str, config: DatabaseConfig, threads: int, writes: int) -> dict:
+    """Every thread opens its own transactions and retries on SQLITE_BUSY"""
+    engine = create_engine(url, pool_size=threads, max_overflow=0,
+                           connect_args={"timeout": config.busy_timeout_ms / 1000,
+                                         "check_same_thread": False})
+    event.listen(engine, "connect", lambda conn, record: apply_sqlite_pragmas(conn, config))
+    # Same statement hooks as the writer engine, so only the write path differs
+    instrument_engine(engine)
+    install_slow_query_log(engine, config)
+    sessions = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    retries = failures = 0
+    lock = threading.Lock()
+
+    def write(table_number: int) -> None:
+        nonlocal retries, failures
+        delay = config.busy_retry_backoff_ms / 1000
+        for attempt in range(max(1, config.busy_retry_attempts)):
+            try:
+                with sessions() as session, session.begin():
+                    save_order(session, table_number)
+                return
+            except Exception as e:
+                if not is_busy_error(e):
+                    raise
+                with lock:
+                    retries += 1
+                time.sleep(delay)
+                delay *= 2
+        with lock:
+            failures += 1
+
+    started = time.perf_counter()
+    latencies = _run_threads(threads, writes, write)
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    return {"elapsed": elapsed, "latencies": latencies, "retries": retries,
+            "failures": failures, "batches": None}
+
+
+def bench_queue(url: str, config: DatabaseConfig, threads: int, writes: int) -> dict:
+    """Every thread submits write units to one writer thread"""
+    write_queue = WriteQueue(create_writer_engine(url, config), config)
+    failures = 0
+
+    def write(table_number: int) -> None:
+        nonlocal failures
+        try:
+            write_queue.submit(lambda session: save_order(session, table_number)).result()
+        except Exception:
+            failures += 1
+
+    started = time.perf_counter()
+    latencies = _run_threads(threads, writes, write)
+    elapsed = time.perf_counter() - started
+    write_queue.stop()
+    write_queue._engine.dispose()
+    return {"elapsed": elapsed, "latencies": latencies,
+            "retries": write_queue.stats.busy_retries, "failures": failures,
+            "batches": write_queue.stats.batches}
+
+
+def _report(name: str, result: dict) -> None:
+    latencies = sorted(result["latencies"])
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    batches = "-" if result["batches"] is None else str(result["batches"])
+    print(f"{name:<24}{len(latencies) / result['elapsed']:>10.0f}"
+          f"{statistics.median(latencies):>9.1f}{p99:>9.1f}"
+          f"{batches:>9}{result['retries']:>9}{result['failures']:>9}")
+
+
+def run_benchmark(threads: int = 8, writes: int = 200) -> None:
+    config = get_database_config_manager().config
+    print(f"{threads} threads x {writes} orders, synchronous={config.synchronous}")
+    print(f"{'':<24}{'orders/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'batches':>9}{'retries':>9}{'failed':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        _report("direct + busy retry",
+                bench_direct(_fresh_database(directory, "direct.db"), config, threads, writes))
+        for window_ms in (0, config.write_batch_window_ms):
+            queue_config = DatabaseConfig(**{**config.__dict__, "write_batch_window_ms": window_ms})
+            url = _fresh_database(directory, f"queue_{window_ms}.db")
+            _report(f"write queue ({window_ms} ms)",
+                    bench_queue(url, queue_config, threads, writes))
+
+
+if __name__ == "__main__":
+    run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+    )
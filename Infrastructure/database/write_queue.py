@@ -0,0 +1,317 @@
+# infrastructure/database/write_queue.py
+"""
+Single writer for cafe.db.
+
+SQLite lets one connection write at a time. Instead of the Qt main thread,
+the uvicorn thread and background jobs contending for that lock (and
+retrying on SQLITE_BUSY), every write unit goes through one queue to one
+writer thread, which owns the only writing connection:
+
+    order_id = run_in_transaction(lambda session: repo(session).save(order))
+    order = await run_write(lambda session: ...)  # from async routes
+
+A write unit is a callable taking a Session. Units queued while the writer
+is busy share one transaction and one COMMIT (group commit, at most
+`write_batch_max_units` per batch); when several are waiting, the writer
+also holds the batch open for `write_batch_window_ms` to collect more.
+Inside a shared batch each unit runs in its own SAVEPOINT: a unit that
+raises is rolled back alone and its future gets the exception. Futures
+resolve once the COMMIT is done.
+
+The writer opens each transaction with BEGIN IMMEDIATE, so it holds the
+write lock before a unit's first read: what a unit reads cannot change
+before it writes. When another process holds the lock, the whole batch is
+re-run (units must be safe to re-run, as with `with_busy_retry`).
+"""
+import asyncio
+import atexit
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, TypeVar
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+
+from infrastructure.database.config import DatabaseConfig
+from infrastructure.database.session import (
+    DATABASE_URL, TrackedSession, apply_sqlite_pragmas, db_config, is_busy_error
+)
+from infrastructure.database.query_stats import instrument_engine
+from infrastructure.database.slow_query_log import install_slow_query_log
+
+T = TypeVar("T")
+
+_AFTER_COMMIT = "after_commit"  # session.info key of the batch's commit callbacks
+
+
+def create_writer_engine(url: str, config: DatabaseConfig) -> Engine:
+    """Engine for the writer thread: one connection, explicit BEGIN IMMEDIATE"""
+    engine = create_engine(
+        url,
+        echo=False,
+        pool_size=1,
+        max_overflow=0,
+        connect_args={"timeout": config.busy_timeout_ms / 1000, "check_same_thread": False}
+    )
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, config)
+        # The driver's implicit transactions break SAVEPOINT; _on_begin
+        # opens the transaction instead
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+        finally:
+            cursor.close()
+
+    instrument_engine(engine)
+    install_slow_query_log(engine, config)
+    return engine
+
+
+@dataclass
+class _WriteUnit:
+    work: Callable[[Session], Any]
+    future: Future
+    context: contextvars.Context  # the caller's query_stats contexts
+
+
+@dataclass
+class WriteQueueStats:
+    units: int = 0
+    batches: int = 0
+    largest_batch: int = 0
+    busy_retries: int = 0
+
+
+class WriteQueue:
+    """Queue of write units executed by one writer thread"""
+
+    def __init__(self, engine: Engine, config: DatabaseConfig):
+        self._engine = engine
+        self._config = config
+        self._sessions = sessionmaker(
+            bind=engine, class_=TrackedSession, autoflush=False, expire_on_commit=False
+        )
+        self._queue: "queue.SimpleQueue[Optional[_WriteUnit]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._session: Optional[Session] = None  # the batch being executed
+        self.stats = WriteQueueStats()
+
+    def submit(self, work: Callable[[Session], T]) -> "Future[T]":
+        """Queue a write unit; the future resolves after its batch committed"""
+        future: Future = Future()
+        unit = _WriteUnit(work, future, contextvars.copy_context())
+        if threading.current_thread() is self._thread:
+            if self._session is not None:
+                # A unit calling run_in_transaction itself joins its own transaction
+                return self._run_nested(work)
+            # An after-commit callback: its batch is committed, so the unit runs
+            # now as a batch of its own (queued, run_in_transaction would wait
+            # for the writer thread forever)
+            self._execute([unit])
+            return future
+        self._ensure_started()
+        self._queue.put(unit)
+        return future
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Finish the queued units, then end the writer thread"""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def _run_nested(self, work: Callable[[Session], T]) -> "Future[T]":
+        future: Future = Future()
+        callbacks = self._session.info[_AFTER_COMMIT]
+        mark = len(callbacks)
+        try:
+            with self._session.begin_nested():
+                future.set_result(work(self._session))
+        except Exception as e:
+            del callbacks[mark:]
+            future.set_exception(e)
+        return future
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stopping = self._collect(first)
+            self._execute(batch)
+            if stopping:
+                return
+
+    def _collect(self, first: _WriteUnit):
+        """
+        The first unit plus everything already queued. Only when other writers
+        are waiting too does it wait up to the batch window for more: a lone
+        write is never delayed.
+        """
+        batch = [first]
+        deadline = None
+        while len(batch) < self._config.write_batch_max_units:
+            try:
+                if deadline is None:
+                    unit = self._queue.get_nowait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    unit = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                if deadline is not None or len(batch) == 1 or not self._config.write_batch_window_ms:
+                    break
+                deadline = time.monotonic() + self._config.write_batch_window_ms / 1000
+                continue
+            if unit is None:
+                return batch, True
+            batch.append(unit)
+        return batch, False
+
+    def _execute(self, batch: List[_WriteUnit]) -> None:
+        units = [unit for unit in batch if unit.future.set_running_or_notify_cancel()]
+        if not units:
+            return
+        attempts = max(1, self._config.busy_retry_attempts)
+        delay = self._config.busy_retry_backoff_ms / 1000
+        for attempt in range(attempts):
+            outcomes = []
+            session = self._sessions()
+            session.info[_AFTER_COMMIT] = []
+            self._session = session
+            try:
+                if len(units) == 1:
+                    # Nothing to isolate it from: no SAVEPOINT round trip
+                    outcomes.append(units[0].context.run(self._run_single, session, units[0]))
+                else:
+                    for unit in units:
+                        outcomes.append(unit.context.run(self._run_unit, session, unit))
+                session.commit()
+                callbacks = session.info[_AFTER_COMMIT]
+            except OperationalError as e:
+                session.rollback()
+                if is_busy_error(e) and attempt < attempts - 1:
+                    self.stats.busy_retries += 1
+                    time.sleep(delay)
+                    delay *= 2
+                    continue
+                self._fail(units, e)
+                return
+            except Exception as e:
+                session.rollback()
+                self._fail(units, e)
+                return
+            finally:
+                self._session = None
+                session.close()
+
+            self.stats.units += len(units)
+            self.stats.batches += 1
+            self.stats.largest_batch = max(self.stats.largest_batch, len(units))
+            # Before the futures: a caller sees the effects once its write returns
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"⚠️ After-commit callback failed: {e}")
+            for unit, (ok, value) in zip(units, outcomes):
+                if ok:
+                    unit.future.set_result(value)
+                else:
+                    unit.future.set_exception(value)
+            return
+
+    @staticmethod
+    def _run_unit(session: Session, unit: _WriteUnit):
+        """(True, result) or (False, exception); a busy database fails the batch"""
+        callbacks = session.info[_AFTER_COMMIT]
+        mark = len(callbacks)
+        try:
+            with session.begin_nested():
+                return True, unit.work(session)
+        except OperationalError as e:
+            if is_busy_error(e):
+                raise
+            del callbacks[mark:]
+            return False, e
+        except Exception as e:
+            del callbacks[mark:]
+            return False, e
+
+    @staticmethod
+    def _run_single(session: Session, unit: _WriteUnit):
+        """A batch of one: a failing unit rolls back the whole transaction"""
+        try:
+            result = unit.work(session)
+            session.flush()
+            return True, result
+        except OperationalError as e:
+            if is_busy_error(e):
+                raise
+            session.rollback()
+            session.info[_AFTER_COMMIT].clear()
+            return False, e
+        except Exception as e:
+            session.rollback()
+            session.info[_AFTER_COMMIT].clear()
+            return False, e
+
+    @staticmethod
+    def _fail(units: List[_WriteUnit], error: Exception) -> None:
+        for unit in units:
+            unit.future.set_exception(error)
+
+
+def call_after_commit(session: Session, callback: Callable[[], None]) -> bool:
+    """
+    Run `callback` on the writer thread once the write unit that owns
+    `session` is committed; dropped if the unit fails. False (and nothing
+    registered) when `session` is not a writer session.
+    """
+    callbacks = session.info.get(_AFTER_COMMIT)
+    if callbacks is None:
+        return False
+    callbacks.append(callback)
+    return True
+
+
+_write_queue: Optional[WriteQueue] = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue() -> WriteQueue:
+    """Process-wide writer on the configured database"""
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = WriteQueue(create_writer_engine(DATABASE_URL, db_config), db_config)
+            atexit.register(_write_queue.stop, 5)
+        return _write_queue
+
+
+async def run_write(work: Callable[[Session], T]) -> T:
+    """Run a write unit from async code without blocking the event loop"""
+    return await asyncio.wrap_future(get_write_queue().submit(work))
@@ -4,10 +4,14 @@ Initialization Service for Cafe Management System
 Creates default admin user and ensures database is properly set up
 """
 from datetime import datetime
-from infrastructure.database.session import SessionLocal, init_db, engine
+from infrastructure.database.session import SessionLocal, init_db, run_in_transaction
+from infrastructure.database.archive import archive_old_orders
+from infrastructure.database.maintenance import get_maintenance_scheduler
+from infrastructure.database.order_totals import (
+    find_inconsistent_order_totals, repair_order_totals
+)
 from infrastructure.database.models.user_model import UserModel
 from infrastructure.database.models.product_model import ProductModel
-from infrastructure.database.base import Base
 from web.auth import get_password_hash
 
 
@@ -22,7 +26,7 @@ class InitializationService:
     def initialize_database():
         """Initialize database tables"""
         print("🔧 Initializing database...")
-        Base.metadata.create_all(bind=engine)
+        init_db()
         print("✅ Database tables created/verified")
     
     @staticmethod
@@ -135,6 +139,23 @@ class InitializationService:
         finally:
             session.close()
     
+    @staticmethod
+    def archive_old_orders() -> int:
+        """Archive orders older than `archive_after_days`; never blocks startup"""
+        try:
+            return archive_old_orders()
+        except Exception as e:
+            print(f"❌ Error archiving old orders: {str(e)}")
+            return 0
+    
+    @staticmethod
+    def start_maintenance_scheduler() -> None:
+        """Daily ANALYZE/vacuum/checkpoint/integrity check in the quiet hours"""
+        try:
+            get_maintenance_scheduler().start()
+        except Exception as e:
+            print(f"❌ Error starting database maintenance: {str(e)}")
+    
     @staticmethod
     def full_initialization():
         """Perform complete initialization"""
@@ -151,6 +172,12 @@ class InitializationService:
         # Step 3: Create sample products
         InitializationService.create_sample_products()
         
+        # Step 4: Move old closed/cancelled orders to the archive tables
+        InitializationService.archive_old_orders()
+        
+        # Step 5: Background database maintenance
+        InitializationService.start_maintenance_scheduler()
+        
         print("\n" + "=" * 60)
         print("✅ INITIALIZATION COMPLETE")
         print("=" * 60 + "\n")
@@ -165,6 +192,7 @@ class InitializationService:
                 "admin_exists": False,
                 "products_count": 0,
                 "users_count": 0,
+                "inconsistent_order_totals": 0,
                 "status": "healthy"
             }
             
@@ -176,11 +204,16 @@ class InitializationService:
             health["users_count"] = session.query(UserModel).count()
             health["products_count"] = session.query(ProductModel).count()
             
+            # Stored order totals that disagree with their items
+            health["inconsistent_order_totals"] = len(find_inconsistent_order_totals(session))
+            
             # Determine overall status
             if not health["admin_exists"]:
                 health["status"] = "needs_admin"
             elif health["products_count"] == 0:
                 health["status"] = "needs_products"
+            elif health["inconsistent_order_totals"]:
+                health["status"] = "needs_totals_repair"
             
             return health
             
@@ -190,11 +223,20 @@ class InitializationService:
                 "admin_exists": False,
                 "products_count": 0,
                 "users_count": 0,
+                "inconsistent_order_totals": 0,
                 "status": "error",
                 "error": str(e)
             }
         finally:
             session.close()
+    
+    @staticmethod
+    def repair_order_totals() -> int:
+        """Recompute stored order totals that disagree with their items"""
+        repaired = run_in_transaction(repair_order_totals)
+        if repaired:
+            print(f"🔧 Repaired totals of {repaired} order(s)")
+        return repaired
 
 
 def initialize_application():
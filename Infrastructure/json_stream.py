@@ -0,0 +1,54 @@
+# infrastructure/json_stream.py
+"""
+JSON output that is written record by record instead of built in memory.
+
+Backups and exports pass an iterator of dicts (typically fed by
+`stream_order_models`), so only the record being encoded is held at once:
+
+    with open(path, "w", encoding="utf-8") as f:
+        count = write_ndjson(f, records)
+
+NDJSON is one JSON object per line and can be read back the same way with
+`read_ndjson`. `write_json_array` writes a plain JSON array for readers
+that expect one document.
+"""
+import json
+from typing import IO, Any, Dict, Iterable, Iterator
+
+
+def _encode(record: Any) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+def write_ndjson(f: IO[str], records: Iterable[Any]) -> int:
+    """One record per line; returns the number of records written"""
+    count = 0
+    for record in records:
+        f.write(_encode(record))
+        f.write("\n")
+        count += 1
+    return count
+
+
+def read_ndjson(f: IO[str]) -> Iterator[Dict]:
+    """Records of an NDJSON file one by one (blank lines are skipped)"""
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {number}: {e}") from e
+
+
+def write_json_array(f: IO[str], records: Iterable[Any]) -> int:
+    """A JSON array with one record per line; returns the number of records"""
+    count = 0
+    f.write("[")
+    for record in records:
+        f.write(",\n" if count else "\n")
+        f.write(_encode(record))
+        count += 1
+    f.write("\n]\n" if count else "]\n")
+    return count
@@ -3,7 +3,7 @@ import hashlib
 from typing import Optional, Tuple
 from datetime import datetime
 
-from infrastructure.database.session import SessionLocal
+from infrastructure.database.session import session_scope, run_in_transaction
 from infrastructure.database.models.user_model import UserModel
 
 
@@ -13,13 +13,11 @@ class AuthService:
     _current_user = None
     
     def __init__(self):
-        self.session = SessionLocal()
         self._ensure_admin_exists()
     
     def _ensure_admin_exists(self):
         """Create default admin if no users exist"""
-        user_count = self.session.query(UserModel).count()
-        if user_count == 0:
+        if not self.has_users():
             # No users, will prompt for registration
             pass
     
@@ -29,7 +27,8 @@ class AuthService:
     
     def has_users(self) -> bool:
         """Check if any users exist in the system"""
-        return self.session.query(UserModel).count() > 0
+        with session_scope() as session:
+            return session.query(UserModel).count() > 0
     
     def register(self, username: str, password: str, full_name: str, role: str = "cashier") -> Tuple[bool, str]:
         """Register a new user"""
@@ -41,44 +40,50 @@ class AuthService:
         if len(full_name) < 2:
             return False, "نام کامل باید حداقل ۲ کاراکتر باشد"
         
-        # Check if username exists
-        existing = self.session.query(UserModel).filter_by(username=username).first()
-        if existing:
-            return False, "این نام کاربری قبلاً استفاده شده است"
-        
-        # Create user
-        user = UserModel(
-            username=username,
-            password_hash=self._hash_password(password),
-            full_name=full_name,
-            role=role,
-            is_active=True
-        )
+        def create(session) -> bool:
+            # Check if username exists
+            existing = session.query(UserModel).filter_by(username=username).first()
+            if existing:
+                return False
+            
+            # Create user
+            session.add(UserModel(
+                username=username,
+                password_hash=self._hash_password(password),
+                full_name=full_name,
+                role=role,
+                is_active=True
+            ))
+            return True
         
         try:
-            self.session.add(user)
-            self.session.commit()
+            if not run_in_transaction(create):
+                return False, "این نام کاربری قبلاً استفاده شده است"
             return True, "ثبت‌نام با موفقیت انجام شد"
         except Exception as e:
-            self.session.rollback()
             return False, f"خطا در ثبت‌نام: {str(e)}"
     
     def login(self, username: str, password: str) -> Tuple[bool, str]:
         """Login user"""
-        user = self.session.query(UserModel).filter_by(username=username).first()
-        
-        if not user:
-            return False, "نام کاربری یافت نشد"
+        def authenticate(session) -> Tuple[Optional[UserModel], str]:
+            user = session.query(UserModel).filter_by(username=username).first()
+            
+            if not user:
+                return None, "نام کاربری یافت نشد"
+            
+            if not user.is_active:
+                return None, "این حساب غیرفعال شده است"
+            
+            if user.password_hash != self._hash_password(password):
+                return None, "رمز عبور اشتباه است"
+            
+            # Update last login
+            user.last_login = datetime.utcnow()
+            return user, ""
         
-        if not user.is_active:
-            return False, "این حساب غیرفعال شده است"
-        
-        if user.password_hash != self._hash_password(password):
-            return False, "رمز عبور اشتباه است"
-        
-        # Update last login
-        user.last_login = datetime.utcnow()
-        self.session.commit()
+        user, error = run_in_transaction(authenticate)
+        if user is None:
+            return False, error
         
         # Set current user
         AuthService._current_user = user
@@ -101,14 +106,16 @@ class AuthService:
     
     def get_all_users(self):
         """Get all users"""
-        return self.session.query(UserModel).all()
+        with session_scope() as session:
+            return session.query(UserModel).all()
     
     def deactivate_user(self, user_id: int) -> bool:
         """Deactivate a user"""
-        user = self.session.query(UserModel).get(user_id)
-        if user:
-            user.is_active = False
-            self.session.commit()
-            return True
-        return False
+        def deactivate(session) -> bool:
+            user = session.get(UserModel, user_id)
+            if user:
+                user.is_active = False
+                return True
+            return False
+        return run_in_transaction(deactivate)
 
@@ -1,22 +1,41 @@
 from domain.entities.product import Product
-from infrastructure.database.session import SessionLocal
+from infrastructure.database.session import session_scope, run_in_transaction
+from infrastructure.database.query_stats import log_queries
 from infrastructure.database.repositories.product_repository_sqlalchemy import (
     ProductRepositorySQLAlchemy
 )
-from typing import List
+from infrastructure.database.repositories.product_catalog import (
+    CatalogStats, MenuCatalog, get_product_catalog
+)
+from typing import Callable, List, TypeVar
+
+T = TypeVar("T")
 
 
 class MenuService:
-    def __init__(self):
-        self.session = SessionLocal()
-        self.product_repo = ProductRepositorySQLAlchemy(self.session)
+    # منوی خالی فقط یک بار در هر اجرا بررسی می‌شود؛ باز کردن دیالوگ‌ها کوئری ندارد
+    _menu_checked = False
 
+    def __init__(self):
         # مقداردهی اولیه منو در صورت خالی بودن دیتابیس
-        self._initialize_menu_if_empty()
+        if not MenuService._menu_checked:
+            self._initialize_menu_if_empty()
+            MenuService._menu_checked = True
+
+    def _read(self, query: Callable[[ProductRepositorySQLAlchemy], T]) -> T:
+        """اجرای یک خواندن در واحد کاری جداگانه"""
+        with session_scope() as session:
+            return query(ProductRepositorySQLAlchemy(session))
+
+    def _write(self, command: Callable[[ProductRepositorySQLAlchemy], T]) -> T:
+        """اجرای یک نوشتن در تراکنش جداگانه"""
+        return run_in_transaction(
+            lambda session: command(ProductRepositorySQLAlchemy(session))
+        )
 
     def _initialize_menu_if_empty(self):
         """مقداردهی اولیه منو با محصولات پایه"""
-        if not self.product_repo.get_all_active():
+        if not self.get_menu_catalog().active:
             initial_products = [
                 Product(0, "قهوه", 50000, "نوشیدنی گرم"),
                 Product(0, "لاته", 65000, "نوشیدنی گرم"),
@@ -29,20 +48,33 @@ class MenuService:
                 Product(0, "نوشابه", 20000, "نوشیدنی سرد"),
             ]
 
-            for product in initial_products:
-                self.product_repo.save(product)
+            def seed(repo):
+                for product in initial_products:
+                    repo.save(product)
+
+            self._write(seed)
 
+    def get_menu_catalog(self) -> MenuCatalog:
+        """
+        نسخه فعلی منو (فقط خواندنی). یک صفحه را از یک نسخه بسازید تا
+        دسته‌ها و محصولات با هم بخوانند؛ ویرایش‌ها نسخه جدیدی منتشر می‌کنند.
+        """
+        return get_product_catalog().snapshot()
+
+    @log_queries()
     def get_active_products(self) -> List[Product]:
         """دریافت تمام محصولات فعال"""
-        return self.product_repo.get_all_active()
+        return self._read(lambda repo: repo.get_all_active())
 
+    @log_queries()
     def get_products_by_category(self, category: str) -> List[Product]:
         """دریافت محصولات بر اساس دسته‌بندی"""
-        return self.product_repo.get_by_category(category)
+        return self._read(lambda repo: repo.get_by_category(category))
 
+    @log_queries()
     def get_product_by_id(self, product_id: int) -> Product:
         """دریافت محصول بر اساس ID"""
-        product = self.product_repo.get_by_id(product_id)
+        product = self._read(lambda repo: repo.get_by_id(product_id))
         if not product:
             raise ValueError(f"محصول با ID {product_id} یافت نشد")
         return product
@@ -53,7 +85,7 @@ class MenuService:
             raise ValueError("قیمت باید مثبت باشد")
 
         product = Product(0, name, price, category)
-        return self.product_repo.save(product)
+        return self._write(lambda repo: repo.save(product))
 
     def update_product(self, product_id: int, name: str = None, price: int = None,
                       category: str = None) -> None:
@@ -69,21 +101,25 @@ class MenuService:
         if category is not None:
             product.category = category
 
-        self.product_repo.update(product)
+        self._write(lambda repo: repo.update(product))
 
     def delete_product(self, product_id: int) -> None:
         """حذف محصول (غیرفعال کردن)"""
-        self.product_repo.delete(product_id)
+        self._write(lambda repo: repo.delete(product_id))
 
+    @log_queries()
     def get_categories(self) -> List[str]:
         """دریافت لیست دسته‌بندی‌های موجود"""
-        products = self.get_active_products()
-        categories = set(product.category for product in products)
-        return sorted(list(categories))
+        return self._read(lambda repo: repo.get_categories())
 
+    @log_queries()
     def get_all_products(self) -> List[Product]:
         """دریافت تمام محصولات (فعال و غیرفعال)"""
-        return self.product_repo.get_all()
+        return self._read(lambda repo: repo.get_all())
+
+    def get_cache_stats(self) -> CatalogStats:
+        """آمار کش منو (درصد خواندن‌هایی که از حافظه پاسخ داده شدند)"""
+        return get_product_catalog().stats
 
     def update_product_price(self, product_id: int, new_price: int) -> None:
         """به‌روزرسانی قیمت محصول"""
@@ -91,16 +127,16 @@ class MenuService:
             raise ValueError("قیمت باید مثبت باشد")
         product = self.get_product_by_id(product_id)
         product.price = new_price
-        self.product_repo.update(product)
+        self._write(lambda repo: repo.update(product))
 
     def deactivate_product(self, product_id: int) -> None:
         """غیرفعال کردن محصول"""
         product = self.get_product_by_id(product_id)
         product.is_active = False
-        self.product_repo.update(product)
+        self._write(lambda repo: repo.update(product))
 
     def activate_product(self, product_id: int) -> None:
         """فعال کردن محصول"""
         product = self.get_product_by_id(product_id)
         product.is_active = True
-        self.product_repo.update(product)
\ No newline at end of file
+        self._write(lambda repo: repo.update(product))
\ No newline at end of file
@@ -1,20 +1,28 @@
-from domain.entities.order import Order
-from infrastructure.database.session import SessionLocal
+import copy
+from typing import Tuple
+
+from domain.entities.order import Order, OrderConflictError
+from domain.entities.enums import OrderStatus
+from infrastructure.database.session import session_scope, run_in_transaction
 from infrastructure.database.repositories.order_repository_sqlalchemy import (
     OrderRepositorySQLAlchemy
 )
+from infrastructure.database.change_detector import get_change_detector
+from infrastructure.database.query_stats import log_queries
 from infrastructure.printer.receipt_printer import ReceiptPrinter
 from domain.entities.order_item import OrderItem
 from domain.value_objects.money import Money
 
 
 class OrderService:
+    CHANGES_BATCH = 500
+
     def __init__(self):
         self.orders = {}  # table_number -> Order object
         self.current_table = None
-        self.session = SessionLocal()
-        self.repo = OrderRepositorySQLAlchemy(self.session)
         self.printer = ReceiptPrinter()
+        self._change_cursor = None  # آخرین شماره تغییر سفارش‌ها که دیده شده
+        self._order_watch = None
 
     @property
     def current_order(self):
@@ -23,7 +31,10 @@ class OrderService:
             return None
         if self.current_table not in self.orders:
             # Check if there's an open order in database for this table
-            db_order = self.repo.get_open_order_by_table(self.current_table)
+            with session_scope() as session:
+                db_order = OrderRepositorySQLAlchemy(session).get_open_order_by_table(
+                    self.current_table
+                )
             if db_order:
                 # Load existing order from database
                 self.orders[self.current_table] = db_order
@@ -32,11 +43,11 @@ class OrderService:
                 self.orders[self.current_table] = Order(table_number=self.current_table)
         return self.orders[self.current_table]
 
-    def add_item(self, name: str, price: int, quantity: int = 1):
+    def add_item(self, name: str, price: int, quantity: int = 1, product_id: int = None):
         if self.current_order is None:
             raise ValueError("لطفاً ابتدا میز را انتخاب کنید")
         try:
-            self.current_order.add_item(name, price, quantity)
+            self.current_order.add_item(name, price, quantity, product_id)
         except ValueError as e:
             raise ValueError(f"خطا در افزودن آیتم: {e}")
 
@@ -93,34 +104,57 @@ class OrderService:
         except ValueError as e:
             raise ValueError(f"خطا در بستن سفارش: {e}")
 
+    @log_queries()
     def close_and_save(self) -> int:
         if self.current_order is None:
             raise ValueError("هیچ سفارشی انتخاب نشده است")
         try:
-            self.current_order.close()
-            
-            # Check if order already exists in database (from web)
-            from infrastructure.database.models.order_model import OrderModel
-            order_model = (
-                self.session.query(OrderModel)
-                .filter_by(table_number=self.current_table, status="open")
-                .order_by(OrderModel.created_at.desc())
-                .first()
-            )
-            
-            if order_model:
-                # Update existing order
-                self.repo.update_order(order_model.id, self.current_order)
-                order_id = order_model.id
-            else:
-                # Save as new order
-                order_id = self.repo.save(self.current_order)
+            order = self.current_order
+            closed = copy.deepcopy(order)
+            closed.close()
+            table_number = self.current_table
+
+            def save(session) -> Tuple[int, Order]:
+                # هر اجرا روی کپی تازه‌ای کار می‌کند: صف نوشتن ممکن است این واحد را
+                # دوباره اجرا کند (قفل بودن دیتابیس) یا COMMIT شکست بخورد، و
+                # سفارش حافظه نباید ادغام یا شناسه‌ای را ببیند که ذخیره نشده است
+                order = copy.deepcopy(closed)
+                repo = OrderRepositorySQLAlchemy(session)
+                # سفارشی که از دیتابیس خوانده شده، یا سفارش باز همین میز (از وب)
+                existing_id = order.id or repo.get_open_order_id_by_table(table_number)
+                if not existing_id:
+                    # Save as new order
+                    return repo.save(order), order
+                if order.id != existing_id:
+                    # سفارش محلی جدید است ولی از وب سفارشی برای این میز باز شده
+                    order.merge_remote(repo.get_by_id(existing_id))
+                try:
+                    repo.update_order(existing_id, order, expected_version=order.version)
+                except OrderConflictError:
+                    # در این فاصله از وب تغییر کرده: تغییرات دو طرف ادغام می‌شوند
+                    remote = repo.get_by_id(existing_id)
+                    if remote.status != OrderStatus.OPEN:
+                        # سفارش بسته یا لغو شده را نمی‌توان ادغام کرد
+                        raise
+                    order.merge_remote(remote)
+                    repo.update_order(existing_id, order, expected_version=order.version)
+                return existing_id, order
+
+            order_id, saved = run_in_transaction(save)
+            # فقط پس از COMMIT، سفارش حافظه همان نسخه ذخیره شده می‌شود
+            order.items = saved.items
+            order.discount = saved.discount
+            order.status = saved.status
+            order.mark_persisted(saved.id, saved.version)
             
             # حذف سفارش بسته شده از حافظه
             if self.current_table in self.orders:
                 del self.orders[self.current_table]
             return order_id
         except Exception as e:
+            if isinstance(e, OrderConflictError):
+                # سفارش دوباره از دیتابیس خوانده می‌شود تا کاربر نسخه جدید را ببیند
+                self.set_table(self.current_table)
             raise ValueError(f"خطا در ذخیره سفارش: {str(e)}")
 
     def clear_current_order(self):
@@ -128,6 +162,7 @@ class OrderService:
         if self.current_table and self.current_table in self.orders:
             del self.orders[self.current_table]
 
+    @log_queries()
     def set_table(self, table_number: int):
         """تعیین شماره میز فعلی و بارگذاری سفارش باز از دیتابیس"""
         self.current_table = table_number
@@ -140,15 +175,62 @@ class OrderService:
         # Accessing current_order will load from DB or create new
         _ = self.current_order
 
+    @log_queries()
+    def refresh_if_changed(self) -> bool:
+        """
+        بارگذاری دوباره سفارش میز فعلی فقط اگر از بیرون (مثلاً وب) تغییر کرده باشد.
+        وقتی چیزی تغییر نکرده فقط شمارنده تغییرات خوانده می‌شود.
+        """
+        if self.current_table is None:
+            return False
+        # تا وقتی هیچ اتصالی در جدول سفارش‌ها ننوشته، حتی کوئری هم لازم نیست
+        if self._order_watch is None:
+            self._order_watch = get_change_detector().watch(("orders", "order_items"))
+        if not self._order_watch.changed():
+            return False
+        with session_scope() as session:
+            repo = OrderRepositorySQLAlchemy(session)
+            if self._change_cursor is None:
+                self._change_cursor = repo.get_change_cursor()
+                return False
+            if repo.get_change_cursor() == self._change_cursor:
+                return False
+            cursor, changes = repo.get_changes_since(self._change_cursor, self.CHANGES_BATCH)
+            # سفارش حذف شده (بایگانی یا بازیابی پشتیبان) در تغییرات دیده نمی‌شود
+            removed = repo.orders_removed_since(self._change_cursor)
+        self._change_cursor = cursor
+
+        loaded = self.orders.get(self.current_table)
+        stale = removed or len(changes) >= self.CHANGES_BATCH or any(
+            # سفارش بارگذاری شده نسخه جدیدی دارد
+            (loaded is not None and change.order_id == loaded.id
+             and change.version != loaded.version)
+            # سفارش باز دیگری برای همین میز ثبت شده است
+            or (change.table_number == self.current_table and change.status == "open"
+                and (loaded is None or change.order_id != loaded.id))
+            for change in changes
+        )
+        if stale:
+            self.set_table(self.current_table)
+        return stale
+
+    @log_queries()
+    def get_open_orders(self):
+        """سفارش‌های باز همه میزها (برای نمایش آشپزخانه)"""
+        with session_scope() as session:
+            return OrderRepositorySQLAlchemy(session).list_open_orders()
+
     def get_table_number(self) -> int:
         """دریافت شماره میز فعلی"""
         return self.current_table if self.current_table is not None else 0
 
+    @log_queries()
     def print_receipt(self, order_id: int) -> str:
         """چاپ فاکتور سفارش"""
         try:
             # از دیتابیس سفارش را بخوان
-            saved_order = self.repo.get_by_id(order_id)
+            with session_scope() as session:
+                saved_order = OrderRepositorySQLAlchemy(session).get_by_id(order_id)
             return self.printer.print_receipt(saved_order, order_id)
         except Exception as e:
             raise ValueError(f"خطا در چاپ فاکتور: {e}")
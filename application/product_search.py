@@ -0,0 +1,248 @@
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+from infrastructure.database.repositories.product_catalog import (
+    MenuCatalog, MenuProduct, get_product_catalog
+)
+
+# حروف عربی و فارسی هم‌شکل، ارقام فارسی/عربی و نیم‌فاصله به یک شکل
+_CHARACTER_MAP = str.maketrans({
+    "ي": "ی", "ى": "ی", "ئ": "ی",
+    "ك": "ک",
+    "ة": "ه", "ۀ": "ه",
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ؤ": "و",
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},  # ۰-۹
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # ٠-٩
+    "\u200c": " ",  # نیم‌فاصله
+    "\u200d": "",
+    "\u0640": "",  # کشیده
+})
+_DIACRITICS = re.compile("[\u064b-\u065f\u0670]")  # اعراب
+_SEPARATORS = re.compile(r"[\W_]+")
+
+NAME_SCORE = 10  # تطابق در نام از تطابق در دسته‌بندی مهم‌تر است
+EXACT, PREFIX, TYPO = 3, 2, 1
+
+
+def normalize(text: str) -> str:
+    """متن یکسان‌شده برای جستجو: «كيك‌ شكلاتي ۲» -> «کیک شکلاتی 2»"""
+    text = unicodedata.normalize("NFKC", text).casefold().translate(_CHARACTER_MAP)
+    return " ".join(_SEPARATORS.sub(" ", _DIACRITICS.sub("", text)).split())
+
+
+def tokenize(text: str) -> List[str]:
+    return normalize(text).split()
+
+
+def _typo_limit(token: str) -> int:
+    """تعداد اشتباه تایپی مجاز برای یک کلمه جستجو"""
+    if len(token) < 3 or token.isdigit():
+        return 0
+    return 1 if len(token) < 7 else 2
+
+
+def _prefix_distance(query: str, token: str, limit: int) -> Optional[int]:
+    """
+    کمترین فاصله ویرایشی query با یک پیشوند token (یا None اگر بیشتر از
+    limit باشد). جابجایی دو حرف کنار هم یک اشتباه حساب می‌شود.
+    """
+    token = token[:len(query) + limit]
+    previous2 = None
+    previous = list(range(len(token) + 1))
+    for i in range(1, len(query) + 1):
+        current = [i] + [0] * len(token)
+        for j in range(1, len(token) + 1):
+            cost = query[i - 1] != token[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and j > 1 and query[i - 1] == token[j - 2]
+                    and query[i - 2] == token[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return None
+        previous2, previous = previous, current
+    # هر پیشوندی از token قبول است، پس کمترین مقدار ردیف آخر
+    best = min(previous)
+    return best if best <= limit else None
+
+
+class ProductSearchIndex:
+    """
+    ایندکس جستجوی محصولات فعال یک نسخه از منو. هر کلمه جستجو باید با
+    ابتدای یکی از کلمات نام یا دسته‌بندی بخواند (با تحمل اشتباه تایپی)؛
+    اگر هیچ محصولی نخواند، متن بدون فاصله در نام‌ها جستجو می‌شود
+    (مثلاً «کیکشکلاتی» برای «کیک‌شکلاتی»).
+    """
+
+    def __init__(self, catalog: MenuCatalog):
+        self.version = catalog.version
+        self._products: Dict[int, MenuProduct] = {p.id: p for p in catalog.active}
+        # کلمه -> {product_id: امتیاز کلمه در آن محصول}
+        self._tokens: Dict[str, Dict[int, int]] = {}
+        # پیشوند -> کلمات با آن پیشوند
+        self._prefixes: Dict[str, Set[str]] = {}
+        # دوحرفی -> کلمات شامل آن؛ نامزدهای جستجوی اشتباه تایپی
+        self._bigrams: Dict[str, Set[str]] = {}
+        self._compact: List[Tuple[int, str]] = []
+        for product in catalog.active:
+            for token in tokenize(product.name):
+                self._add(token, product.id, NAME_SCORE)
+            for token in tokenize(product.category):
+                self._add(token, product.id, 1)
+            self._compact.append((product.id, normalize(product.name).replace(" ", "")))
+
+    def _add(self, token: str, product_id: int, weight: int) -> None:
+        products = self._tokens.get(token)
+        if products is None:
+            products = self._tokens[token] = {}
+            for end in range(1, len(token) + 1):
+                self._prefixes.setdefault(token[:end], set()).add(token)
+            if not token.isdigit():
+                for start in range(len(token) - 1):
+                    self._bigrams.setdefault(token[start:start + 2], set()).add(token)
+        products[product_id] = max(products.get(product_id, 0), weight)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[MenuProduct]:
+        """محصولات منطبق، مرتب بر اساس امتیاز و سپس نام"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        scores: Optional[Dict[int, int]] = None
+        for token in tokens:
+            matches = self._match_token(token)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {pid: score + matches[pid] for pid, score in scores.items()
+                          if pid in matches}
+            if not scores:
+                break
+        if not scores:
+            compact = "".join(tokens)
+            scores = {pid: 1 for pid, name in self._compact if compact in name}
+        ranked = sorted(scores, key=lambda pid: (-scores[pid], self._products[pid].name, pid))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self._products[pid] for pid in ranked]
+
+    def _match_token(self, token: str) -> Dict[int, int]:
+        """product_id -> امتیاز بهترین تطابق این کلمه جستجو"""
+        matches: Dict[int, int] = {}
+        for word in self._prefixes.get(token, ()):
+            kind = EXACT if word == token else PREFIX
+            for pid, weight in self._tokens[word].items():
+                matches[pid] = max(matches.get(pid, 0), kind * weight)
+        if matches:
+            return matches
+        limit = _typo_limit(token)
+        if not limit:
+            return matches
+        for word in self._typo_candidates(token, limit):
+            if _prefix_distance(token, word, limit) is not None:
+                for pid, weight in self._tokens[word].items():
+                    matches[pid] = max(matches.get(pid, 0), TYPO * weight)
+        return matches
+
+    def _typo_candidates(self, token: str, limit: int) -> List[str]:
+        """
+        کلماتی که ممکن است با token فاصله‌ای تا limit داشته باشند: هر اشتباه
+        (حتی جابجایی) حداکثر سه دوحرفی را عوض می‌کند، پس بقیه باید مشترک باشند.
+        """
+        shared: Dict[str, int] = {}
+        bigrams = {token[start:start + 2] for start in range(len(token) - 1)}
+        for bigram in bigrams:
+            for word in self._bigrams.get(bigram, ()):
+                shared[word] = shared.get(word, 0) + 1
+        needed = max(1, len(bigrams) - 3 * limit)
+        return [word for word, count in shared.items()
+                if count >= needed and len(word) >= len(token) - limit]
+
+
+class ProductSearch:
+    """جستجوی منو؛ ایندکس با انتشار هر نسخه جدید از منو دوباره ساخته می‌شود"""
+
+    def __init__(self, catalog=None):
+        self._catalog = catalog
+        self._lock = threading.Lock()
+        self._index: Optional[ProductSearchIndex] = None
+
+    def search(self, query: str, limit: Optional[int] = None, session=None) -> List[MenuProduct]:
+        return self.index(session).search(query, limit)
+
+    def index(self, session=None) -> ProductSearchIndex:
+        snapshot = (self._catalog or get_product_catalog()).snapshot(session)
+        index = self._index
+        if index is None or index.version != snapshot.version:
+            with self._lock:
+                index = self._index
+                if index is None or index.version != snapshot.version:
+                    index = self._index = ProductSearchIndex(snapshot)
+        return index
+
+
+_product_search: Optional[ProductSearch] = None
+_product_search_lock = threading.Lock()
+
+
+def get_product_search() -> ProductSearch:
+    """جستجوی مشترک منو در این پردازه (دسکتاپ و وب)"""
+    global _product_search
+    with _product_search_lock:
+        if _product_search is None:
+            _product_search = ProductSearch()
+        return _product_search
+
+
+def run_benchmark(items: int = 5000, rounds: int = 200) -> None:
+    """زمان ساخت ایندکس و جستجو برای یک منوی ساختگی با `items` محصول"""
+    import random
+    import statistics
+    import time
+
+    random.seed(7)
+    words = ["قهوه", "لاته", "کاپوچینو", "اسپرسو", "موکا", "چای", "دمنوش", "کیک",
+             "شکلاتی", "وانیلی", "ساندویچ", "مرغ", "پاستا", "پیتزا", "سالاد", "نوشابه",
+             "آب‌معدنی", "بستنی", "شیر", "عسل", "دارچین", "زعفرانی", "نارگیل", "توت‌فرنگی",
+             "Iced", "Latte", "Mocha", "Caramel", "Hazelnut", "Special"]
+    categories = ["نوشیدنی گرم", "نوشیدنی سرد", "دسر", "غذا", "صبحانه", "میان‌وعده"]
+    # واژه‌های ساختگی تا واژگان منو به اندازه یک منوی واقعی بزرگ شود
+    letters = "ابپتثجچحخدذرزژسشصضطظعغفقکگلمنوهی"
+    made_up = ["".join(random.choices(letters, k=random.randint(3, 8))) for _ in range(2000)]
+    products = [
+        MenuProduct(i, f"{' '.join(random.sample(words, 2))} {random.choice(made_up)} {i}", 1000 * i,
+                    random.choice(categories), True)
+        for i in range(1, items + 1)
+    ]
+    catalog = MenuCatalog.build(1, None, products)
+
+    started = time.perf_counter()
+    index = ProductSearchIndex(catalog)
+    build_ms = (time.perf_counter() - started) * 1000
+    print(f"{items} products, index built in {build_ms:.0f} ms")
+    queries = {
+        "prefix": ["قه", "کاپو", "Lat", "شکلا", "دار"],
+        "two words": ["کیک شکلا", "iced lat", "چای دارچ"],
+        "variants": ["كيك", "چاي", "قهوه ۱۲", "توت فرنگی"],
+        "typo": ["کاپوچنو", "قوهه", "Mokca", "زعفران‌ی"],
+        "no match": ["هندوانه", "xyz"],
+    }
+    print(f"{'':<12}{'p50 ms':>9}{'p99 ms':>9}{'results':>9}")
+    for name, batch in queries.items():
+        timings = []
+        results = 0
+        for _ in range(rounds):
+            for query in batch:
+                started = time.perf_counter()
+                results += len(index.search(query))
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(f"{name:<12}{statistics.median(timings):>9.2f}{p99:>9.2f}{results // len(timings):>9}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
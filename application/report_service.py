@@ -1,79 +1,177 @@
-from datetime import datetime, timedelta
+from datetime import date as Date, datetime, time, timedelta
 from typing import Dict, List, Tuple
-from sqlalchemy import func, extract
-from infrastructure.database.session import SessionLocal
+from sqlalchemy import case, func, extract
+from infrastructure.database.read_session import read_session_scope
 from infrastructure.database.models.order_model import OrderModel
 from infrastructure.database.models.order_item_model import OrderItemModel
+from infrastructure.database.models.product_model import ProductModel
+from infrastructure.database.models.daily_sales_model import (
+    DailySalesModel, DailyProductSalesModel
+)
+from infrastructure.database.sales_rollup import CLOSED_STATUS
+from infrastructure.database.archive import all_orders
+from infrastructure.database.query_stats import log_queries
 from domain.value_objects.money import Money
 
 
 class ReportService:
-    def __init__(self):
-        self.session = SessionLocal()
+    """
+    گزارش‌های فروش فقط سفارشات بسته شده را شامل می‌شوند. روزهای گذشته از
+    جداول خلاصه (daily_sales) خوانده می‌شوند و فقط روز جاری از جداول اصلی.
+    """
 
-    def get_daily_sales(self, date: datetime = None) -> Dict:
-        """گزارش فروش روزانه"""
-        if date is None:
-            date = datetime.now().date()
+    @staticmethod
+    def _live_start() -> Date:
+        """اولین روزی که هنوز در حال تغییر است و از جداول اصلی خوانده می‌شود"""
+        # created_at به وقت UTC ذخیره می‌شود؛ هر دو «امروز» زنده حساب می‌شوند
+        return min(datetime.now().date(), datetime.utcnow().date())
 
-        start_date = datetime.combine(date, datetime.min.time())
-        end_date = datetime.combine(date, datetime.max.time())
+    @staticmethod
+    def _as_day(value) -> Date:
+        return value.date() if isinstance(value, datetime) else value
 
-        # تعداد سفارشات
-        orders_count = (
-            self.session.query(func.count(OrderModel.id))
-            .filter(OrderModel.created_at.between(start_date, end_date))
-            .scalar()
-        )
+    def _daily_totals(self, session, start_day: Date, end_day: Date) -> Dict[Date, Tuple[int, int, int, int]]:
+        """(تعداد سفارش، فروش ناخالص، تخفیف، فروش خالص) برای هر روز بازه"""
+        live_start = self._live_start()
+        totals = {}
 
-        # مجموع فروش
-        total_sales = (
-            self.session.query(
-                func.sum(OrderItemModel.unit_price * OrderItemModel.quantity)
+        for row in (
+            session.query(DailySalesModel)
+            .filter(DailySalesModel.day.between(start_day, min(end_day, live_start - timedelta(days=1))))
+        ):
+            totals[row.day] = (row.orders_count, row.gross_sales, row.total_discounts, row.net_sales)
+
+        if end_day >= live_start:
+            day_column = func.date(OrderModel.created_at)
+            live_rows = (
+                session.query(
+                    day_column,
+                    func.count(OrderModel.id),
+                    func.sum(OrderModel.subtotal),
+                    func.sum(func.coalesce(OrderModel.discount, 0)),
+                    func.sum(OrderModel.total)
+                )
+                .filter(
+                    OrderModel.status == CLOSED_STATUS,
+                    OrderModel.created_at.between(
+                        datetime.combine(max(start_day, live_start), time.min),
+                        datetime.combine(end_day, time.max)
+                    )
+                )
+                .group_by(day_column)
+                .all()
             )
-            .join(OrderModel)
-            .filter(OrderModel.created_at.between(start_date, end_date))
-            .scalar()
-        ) or 0
-
-        # مجموع تخفیف‌ها
-        total_discounts = (
-            self.session.query(func.sum(OrderModel.discount))
-            .filter(OrderModel.created_at.between(start_date, end_date))
-            .scalar()
-        ) or 0
-
-        # محصولات پرفروش
-        top_products = (
-            self.session.query(
-                OrderItemModel.product_name,
-                func.sum(OrderItemModel.quantity).label('total_quantity'),
-                func.sum(OrderItemModel.unit_price * OrderItemModel.quantity).label('total_revenue')
+            for day, orders_count, gross, discounts, net in live_rows:
+                totals[Date.fromisoformat(day)] = (orders_count, gross, discounts, net)
+
+        return totals
+
+    @staticmethod
+    def _product_key(product_id, product_name):
+        return (product_id, None) if product_id is not None else (None, product_name)
+
+    def _product_sales(self, session, start_day: Date, end_day: Date) -> List[Tuple]:
+        """
+        فروش هر محصول در بازه: (product_id، نام، تعداد، درآمد، تعداد سفارش)،
+        گروه‌بندی بر اساس product_id و برای آیتم‌های سفارشی بر اساس نام
+        """
+        live_start = self._live_start()
+        merged = {}
+
+        def merge(rows):
+            for product_id, name, quantity, revenue, orders_count in rows:
+                key = self._product_key(product_id, name)
+                if key in merged:
+                    _, _, q, r, c = merged[key]
+                    merged[key] = (product_id, name, q + quantity, r + revenue, c + orders_count)
+                else:
+                    merged[key] = (product_id, name, quantity, revenue, orders_count)
+
+        # روزهای گذشته از جدول خلاصه
+        rollup_custom_name = case(
+            (DailyProductSalesModel.product_id.is_(None), DailyProductSalesModel.product_name),
+            else_=None
+        )
+        merge(
+            session.query(
+                DailyProductSalesModel.product_id,
+                # نام فعلی محصول، تا تغییر نام تاریخچه را دو تکه نکند
+                func.coalesce(ProductModel.name, func.max(DailyProductSalesModel.product_name)),
+                func.sum(DailyProductSalesModel.quantity),
+                func.sum(DailyProductSalesModel.revenue),
+                func.sum(DailyProductSalesModel.orders_count)
             )
-            .join(OrderModel)
-            .filter(OrderModel.created_at.between(start_date, end_date))
-            .group_by(OrderItemModel.product_name)
-            .order_by(func.sum(OrderItemModel.quantity).desc())
-            .limit(10)
+            .outerjoin(ProductModel, ProductModel.id == DailyProductSalesModel.product_id)
+            .filter(DailyProductSalesModel.day.between(start_day, min(end_day, live_start - timedelta(days=1))))
+            .group_by(DailyProductSalesModel.product_id, rollup_custom_name, ProductModel.name)
             .all()
         )
 
+        # روز جاری از جداول اصلی
+        if end_day >= live_start:
+            custom_name = case(
+                (OrderItemModel.product_id.is_(None), OrderItemModel.product_name),
+                else_=None
+            )
+            merge(
+                session.query(
+                    OrderItemModel.product_id,
+                    func.coalesce(ProductModel.name, func.max(OrderItemModel.product_name)),
+                    func.sum(OrderItemModel.quantity),
+                    func.sum(OrderItemModel.unit_price * OrderItemModel.quantity),
+                    func.count(func.distinct(OrderItemModel.order_id))
+                )
+                .join(OrderModel, OrderModel.id == OrderItemModel.order_id)
+                .outerjoin(ProductModel, ProductModel.id == OrderItemModel.product_id)
+                .filter(
+                    OrderModel.status == CLOSED_STATUS,
+                    OrderModel.created_at.between(
+                        datetime.combine(max(start_day, live_start), time.min),
+                        datetime.combine(end_day, time.max)
+                    )
+                )
+                .group_by(OrderItemModel.product_id, custom_name, ProductModel.name)
+                .all()
+            )
+
+        return sorted(merged.values(), key=lambda stat: stat[3], reverse=True)
+
+    @log_queries()
+    def get_daily_sales(self, date: datetime = None) -> Dict:
+        """گزارش فروش روزانه"""
+        if date is None:
+            date = datetime.now().date()
+        day = self._as_day(date)
+
+        with read_session_scope() as session:
+            orders_count, total_sales, total_discounts, net_sales = (
+                self._daily_totals(session, day, day).get(day, (0, 0, 0, 0))
+            )
+
+            # محصولات پرفروش
+            top_products = sorted(
+                self._product_sales(session, day, day),
+                key=lambda stat: stat[2], reverse=True
+            )[:10]
+
         return {
             'date': date.strftime('%Y-%m-%d'),
             'orders_count': orders_count,
             'total_sales': Money(total_sales),
             'total_discounts': Money(total_discounts),
-            'net_sales': Money(total_sales - total_discounts),
+            'net_sales': Money(net_sales),
             'top_products': [
                 {
-                    'name': product.product_name,
-                    'quantity': product.total_quantity,
-                    'revenue': Money(product.total_revenue)
+                    'product_id': product_id,
+                    'name': name,
+                    'quantity': quantity,
+                    'revenue': Money(revenue)
                 }
-                for product in top_products
+                for product_id, name, quantity, revenue, _ in top_products
             ]
         }
 
+    @log_queries()
     def get_monthly_sales(self, year: int = None, month: int = None) -> Dict:
         """گزارش فروش ماهانه"""
         if year is None:
@@ -87,15 +185,18 @@ class ReportService:
         else:
             end_date = datetime(year, month + 1, 1) - timedelta(days=1)
 
+        with read_session_scope() as session:
+            totals = self._daily_totals(session, start_date.date(), end_date.date())
+
         # آمار روزانه
         daily_stats = []
         current_date = start_date
         while current_date <= end_date:
-            daily_report = self.get_daily_sales(current_date)
+            orders_count, _, _, net_sales = totals.get(current_date.date(), (0, 0, 0, 0))
             daily_stats.append({
                 'date': current_date.strftime('%Y-%m-%d'),
-                'orders': daily_report['orders_count'],
-                'sales': daily_report['net_sales'].amount
+                'orders': orders_count,
+                'sales': net_sales
             })
             current_date += timedelta(days=1)
 
@@ -111,6 +212,7 @@ class ReportService:
             'daily_stats': daily_stats
         }
 
+    @log_queries()
     def get_product_sales_report(self, start_date: datetime = None,
                                 end_date: datetime = None) -> List[Dict]:
         """گزارش فروش محصولات"""
@@ -119,31 +221,24 @@ class ReportService:
         if end_date is None:
             end_date = datetime.now()
 
-        product_stats = (
-            self.session.query(
-                OrderItemModel.product_name,
-                func.sum(OrderItemModel.quantity).label('total_quantity'),
-                func.sum(OrderItemModel.unit_price * OrderItemModel.quantity).label('total_revenue'),
-                func.count(func.distinct(OrderModel.id)).label('orders_count')
+        with read_session_scope() as session:
+            product_stats = self._product_sales(
+                session, self._as_day(start_date), self._as_day(end_date)
             )
-            .join(OrderModel)
-            .filter(OrderModel.created_at.between(start_date, end_date))
-            .group_by(OrderItemModel.product_name)
-            .order_by(func.sum(OrderItemModel.unit_price * OrderItemModel.quantity).desc())
-            .all()
-        )
 
         return [
             {
-                'product_name': stat.product_name,
-                'total_quantity': stat.total_quantity,
-                'total_revenue': Money(stat.total_revenue),
-                'orders_count': stat.orders_count,
-                'avg_price_per_order': Money(stat.total_revenue // stat.orders_count) if stat.orders_count > 0 else Money(0)
+                'product_id': product_id,
+                'product_name': name,
+                'total_quantity': quantity,
+                'total_revenue': Money(revenue),
+                'orders_count': orders_count,
+                'avg_price_per_order': Money(revenue // orders_count) if orders_count > 0 else Money(0)
             }
-            for stat in product_stats
+            for product_id, name, quantity, revenue, orders_count in product_stats
         ]
 
+    @log_queries()
     def get_hourly_sales_pattern(self, date: datetime = None) -> List[Dict]:
         """الگوی فروش ساعتی"""
         if date is None:
@@ -152,18 +247,23 @@ class ReportService:
         start_date = datetime.combine(date, datetime.min.time())
         end_date = datetime.combine(date, datetime.max.time())
 
-        hourly_stats = (
-            self.session.query(
-                extract('hour', OrderModel.created_at).label('hour'),
-                func.count(OrderModel.id).label('orders_count'),
-                func.sum(OrderItemModel.unit_price * OrderItemModel.quantity).label('total_sales')
+        # سفارشات زنده و بایگانی شده
+        orders = all_orders()
+        with read_session_scope() as session:
+            hourly_stats = (
+                session.query(
+                    extract('hour', orders.c.created_at).label('hour'),
+                    func.count(orders.c.id).label('orders_count'),
+                    func.sum(orders.c.subtotal).label('total_sales')
+                )
+                .filter(
+                    orders.c.status == CLOSED_STATUS,
+                    orders.c.created_at.between(start_date, end_date)
+                )
+                .group_by(extract('hour', orders.c.created_at))
+                .order_by(extract('hour', orders.c.created_at))
+                .all()
             )
-            .join(OrderItemModel)
-            .filter(OrderModel.created_at.between(start_date, end_date))
-            .group_by(extract('hour', OrderModel.created_at))
-            .order_by(extract('hour', OrderModel.created_at))
-            .all()
-        )
 
         # ایجاد آمار برای تمام ساعات روز (حتی ساعات بدون فروش)
         hourly_report = []
@@ -177,21 +277,23 @@ class ReportService:
 
         return hourly_report
 
+    @log_queries()
     def get_table_performance(self) -> List[Dict]:
         """گزارش عملکرد میزها"""
-        table_stats = (
-            self.session.query(
-                OrderModel.table_number,
-                func.count(OrderModel.id).label('orders_count'),
-                func.sum(OrderItemModel.unit_price * OrderItemModel.quantity).label('total_sales'),
-                func.avg(OrderItemModel.unit_price * OrderItemModel.quantity).label('avg_order_value')
+        orders = all_orders()
+        with read_session_scope() as session:
+            table_stats = (
+                session.query(
+                    orders.c.table_number,
+                    func.count(orders.c.id).label('orders_count'),
+                    func.sum(orders.c.subtotal).label('total_sales'),
+                    func.avg(orders.c.subtotal).label('avg_order_value')
+                )
+                .filter(orders.c.table_number.isnot(None), orders.c.status == CLOSED_STATUS)
+                .group_by(orders.c.table_number)
+                .order_by(func.sum(orders.c.subtotal).desc())
+                .all()
             )
-            .join(OrderItemModel)
-            .filter(OrderModel.table_number.isnot(None))
-            .group_by(OrderModel.table_number)
-            .order_by(func.sum(OrderItemModel.unit_price * OrderItemModel.quantity).desc())
-            .all()
-        )
 
         return [
             {
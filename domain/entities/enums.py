@@ -4,3 +4,4 @@ from enum import Enum
 class OrderStatus(Enum):
     OPEN = "OPEN"
     CLOSED = "CLOSED"
+    CANCELLED = "CANCELLED"
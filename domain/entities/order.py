@@ -3,14 +3,32 @@ from domain.entities.order_item import OrderItem
 from domain.entities.enums import OrderStatus
 from domain.value_objects.money import Money
 
+
+class OrderConflictError(Exception):
+    """سفارش پس از خواندن، توسط کاربر دیگری (مثلاً از وب) تغییر کرده است"""
+
+    def __init__(self, order_id: int, expected_version: int = None, current_version: int = None):
+        super().__init__(f"سفارش {order_id} توسط کاربر دیگری تغییر کرده است")
+        self.order_id = order_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
 class Order:
     def __init__(self, table_number: int = None):
         self.items = []
         self.status = OrderStatus.OPEN
         self.discount = Money(0)
         self.table_number = table_number
-
-    def add_item(self, name: str, price: int, quantity: int):
+        # شناسه و نسخه ذخیره شده در دیتابیس (برای سفارش جدید None)
+        self.id = None
+        self.version = None
+        self.created_at = None
+        # آیتم‌ها و تخفیف در آخرین نسخه خوانده/ذخیره شده (مبنای ادغام)
+        self._persisted_items = {}
+        self._persisted_discount = 0
+
+    def add_item(self, name: str, price: int, quantity: int, product_id: int = None):
         # بررسی قوانین بیزنسی
         if self.status != OrderStatus.OPEN:
             raise ValueError("نمی‌توان به سفارش بسته شده آیتم اضافه کرد")
@@ -25,7 +43,7 @@ class Order:
                 return
 
         # ایجاد آیتم جدید
-        item = OrderItem(name, price, quantity)
+        item = OrderItem(name, price, quantity, product_id)
         self.items.append(item)
 
     def remove_item(self, name: str):
@@ -67,6 +85,43 @@ class Order:
             subtotal += item.total_price()
         return Money(max(0, subtotal.amount - self.discount.amount))
 
+    def mark_persisted(self, order_id: int, version: int):
+        """ثبت شناسه و نسخه دیتابیس و وضعیت فعلی به عنوان مبنای ادغام"""
+        self.id = order_id
+        self.version = version
+        self._persisted_items = self._quantities()
+        self._persisted_discount = self.discount.amount
+
+    def merge_remote(self, remote: "Order"):
+        """
+        ادغام سه‌طرفه با نسخه جدیدتر همین سفارش در دیتابیس: تغییر تعداد هر
+        آیتم نسبت به مبنا روی نسخه دیتابیس اعمال می‌شود، پس آیتم‌هایی که
+        هر دو طرف اضافه کرده‌اند حفظ می‌شوند. تخفیف محلی فقط اگر تغییر کرده باشد.
+        """
+        local, remote_quantities = self._quantities(), remote._quantities()
+        sources = {item.name: item for item in self.items}
+        sources.update({item.name: item for item in remote.items})
+
+        merged = []
+        for name in dict.fromkeys([*remote_quantities, *local]):
+            quantity = (remote_quantities.get(name, 0) + local.get(name, 0)
+                        - self._persisted_items.get(name, 0))
+            if quantity > 0:
+                source = sources[name]
+                merged.append(OrderItem(source.name, source.unit_price.amount,
+                                        quantity, source.product_id))
+        self.items = merged
+
+        if self.discount.amount == self._persisted_discount:
+            self.discount = remote.discount
+        self.id = remote.id
+        self.version = remote.version
+        self._persisted_items = remote_quantities
+        self._persisted_discount = remote.discount.amount
+
+    def _quantities(self):
+        return {item.name: item.quantity for item in self.items}
+
     def close(self):
         if self.status != OrderStatus.OPEN:
             raise ValueError("سفارش قبلاً بسته شده است")
@@ -1,10 +1,14 @@
+from typing import Optional
+
 from domain.value_objects.money import Money
 
 class OrderItem:
-    def __init__(self, name: str, price: int, quantity: int):
+    def __init__(self, name: str, price: int, quantity: int, product_id: Optional[int] = None):
         self.name = name
         self.unit_price = Money(price)
         self.quantity = quantity
+        # شناسه محصول منو؛ برای آیتم‌های سفارشی None است
+        self.product_id = product_id
 
     @property
     def price(self) -> int:
@@ -25,6 +25,11 @@ class ProductRepository(ABC):
         """دریافت محصولات بر اساس دسته‌بندی"""
         pass
 
+    @abstractmethod
+    def get_categories(self) -> List[str]:
+        """دسته‌بندی‌های دارای محصول فعال"""
+        pass
+
     @abstractmethod
     def update(self, product: Product) -> None:
         """به‌روزرسانی محصول"""
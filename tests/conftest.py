@@ -0,0 +1,64 @@
+# tests/conftest.py
+"""
+Shared setup: every test run works on a fresh cafe.db in a temporary
+directory. The database URL and Config/ are relative to the working
+directory, so it is changed before anything from infrastructure is imported.
+
+    python -m pytest tests
+"""
+import importlib.util
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import infrastructure  # noqa: F401
+except ImportError:
+    # The package is imported as `infrastructure` but the directory is
+    # `Infrastructure`, which only resolves on case-insensitive file systems
+    _spec = importlib.util.spec_from_file_location(
+        "infrastructure", os.path.join(ROOT, "Infrastructure", "__init__.py"),
+        submodule_search_locations=[os.path.join(ROOT, "Infrastructure")]
+    )
+    _module = importlib.util.module_from_spec(_spec)
+    sys.modules["infrastructure"] = _module
+    _spec.loader.exec_module(_module)
+
+os.chdir(tempfile.mkdtemp(prefix="cafe_tests_"))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Tables and migrations of the temporary cafe.db"""
+    from infrastructure.database.session import init_db
+
+    init_db()
+
+
+@pytest.fixture(scope="session")
+def admin_headers(database):
+    """Authorization header of an admin user for the web API"""
+    from infrastructure.database.models.user_model import UserModel
+    from infrastructure.database.session import run_in_transaction
+    from web.auth import create_access_token, get_password_hash
+
+    def add_admin(session):
+        session.add(UserModel(username="test_admin", password_hash=get_password_hash("secret"),
+                              full_name="Test Admin", role="admin", is_active=True))
+
+    run_in_transaction(add_admin)
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'test_admin'})}"}
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    from fastapi.testclient import TestClient
+
+    from web.api import app
+
+    return TestClient(app)
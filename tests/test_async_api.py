@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+import httpx
+from sqlalchemy import text
+
+from infrastructure.database.async_session import AsyncReadSessionLocal
+from web.api import app
+
+# About a second of pure SQLite work, standing in for a heavy report
+SLOW_REPORT = text(
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 2000000) "
+    "SELECT count(*) FROM n"
+)
+
+
+async def run_report() -> float:
+    async with AsyncReadSessionLocal() as session:
+        started = time.perf_counter()
+        await session.execute(SLOW_REPORT)
+        return time.perf_counter() - started
+
+
+async def timed_get(client: httpx.AsyncClient, path: str, headers: dict) -> float:
+    started = time.perf_counter()
+    response = await client.get(path, headers=headers)
+    assert response.status_code == 200, response.text
+    return time.perf_counter() - started
+
+
+def test_a_slow_report_does_not_delay_other_requests(admin_headers):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await timed_get(client, "/api/products", admin_headers)  # warm up the pools
+            report = asyncio.create_task(run_report())
+            await asyncio.sleep(0.05)  # the report query is running now
+            latencies = [await timed_get(client, path, admin_headers)
+                         for path in ("/api/server/info", "/api/products") * 5]
+            assert not report.done(), "the requests waited for the report (event loop blocked?)"
+            return await report, latencies
+
+    report_seconds, latencies = asyncio.run(scenario())
+    assert max(latencies) < report_seconds / 4, (report_seconds, latencies)
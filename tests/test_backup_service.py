@@ -0,0 +1,69 @@
+import io
+import json
+
+import pytest
+
+from infrastructure.backup_service import BackupService
+from infrastructure.database.query_stats import assert_max_queries
+from infrastructure.database.repositories.order_repository_sqlalchemy import (
+    OrderFilter, stream_order_models
+)
+from infrastructure.database.session import session_scope
+from infrastructure.json_stream import read_ndjson, write_json_array, write_ndjson
+
+TABLE = 906  # only this module's orders sit at this table
+STREAM_TABLE = 916
+
+
+def test_export_writes_ndjson_and_json_arrays(client, admin_headers, tmp_path):
+    for quantity in (1, 2, 3):
+        response = client.post("/api/orders", headers=admin_headers, json={
+            "table_number": TABLE,
+            "items": [{"product_name": "Export test tea", "unit_price": 20000, "quantity": quantity}],
+        })
+        assert response.status_code == 200, response.text
+    service = BackupService(str(tmp_path / "backups"))
+    order_filter = OrderFilter(table_number=TABLE)
+
+    assert service.export_orders(str(tmp_path / "orders.ndjson"), order_filter) == 3
+    with open(tmp_path / "orders.ndjson", encoding="utf-8") as f:
+        lines = list(read_ndjson(f))
+    assert service.export_orders(str(tmp_path / "orders.json"), order_filter) == 3
+    with open(tmp_path / "orders.json", encoding="utf-8") as f:
+        assert json.load(f) == lines
+
+    assert [order["table_number"] for order in lines] == [TABLE] * 3
+    assert [[item["quantity"] for item in order["items"]] for order in lines] == [[1], [2], [3]]
+
+
+def test_orders_stream_in_batches_with_their_items(client, admin_headers):
+    for quantity in range(1, 6):
+        response = client.post("/api/orders", headers=admin_headers, json={
+            "table_number": STREAM_TABLE,
+            "items": [{"product_name": "Stream test tea", "unit_price": 20000, "quantity": quantity}],
+        })
+        assert response.status_code == 200, response.text
+
+    with session_scope() as session:
+        # The listing query, then one items query per batch
+        with assert_max_queries(4, "stream_order_models"):
+            batches = [[[item.quantity for item in order.items] for order in batch]
+                       for batch in stream_order_models(
+                           session, OrderFilter(table_number=STREAM_TABLE, limit=1), batch_size=2)]
+
+    assert batches == [[[1], [2]], [[3], [4]], [[5]]]
+
+
+def test_ndjson_round_trip_and_errors_name_the_line():
+    records = [{"name": "چای", "quantity": 2}, {"name": "کیک", "quantity": 1}]
+    f = io.StringIO()
+    assert write_ndjson(f, iter(records)) == 2
+    assert "چای" in f.getvalue()
+    assert list(read_ndjson(io.StringIO(f.getvalue() + "\n"))) == records
+
+    with pytest.raises(ValueError, match="line 2"):
+        list(read_ndjson(io.StringIO('{"ok": 1}\n{"broken"\n')))
+
+    f = io.StringIO()
+    assert write_json_array(f, iter([])) == 0
+    assert json.loads(f.getvalue()) == []
@@ -0,0 +1,75 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from infrastructure.database import maintenance
+from infrastructure.database.config import get_database_config_manager
+from infrastructure.database.maintenance import (
+    MaintenanceScheduler, _incremental_vacuum, in_quiet_hours, recent_runs, run_maintenance
+)
+
+
+def database_with_free_pages(tmp_path, auto_vacuum: str):
+    engine = create_engine(f"sqlite:///{tmp_path / 'maintenance.db'}")
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text(f"PRAGMA auto_vacuum={auto_vacuum}"))
+        conn.execute(text("CREATE TABLE filler (data BLOB)"))
+        conn.execute(text("INSERT INTO filler SELECT randomblob(4000) FROM "
+                          "(WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n "
+                          "WHERE i < 200) SELECT i FROM n)"))
+        conn.execute(text("DELETE FROM filler"))
+    return engine
+
+
+def vacuum_with_timeout(engine, timeout: float = 10) -> int:
+    """Free pages left after the vacuum; fails instead of hanging on a loop"""
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        thread = threading.Thread(target=_incremental_vacuum, args=(conn, 16), daemon=True)
+        thread.start()
+        thread.join(timeout)
+        assert not thread.is_alive(), "incremental vacuum did not finish"
+        return conn.execute(text("PRAGMA freelist_count")).scalar()
+
+
+@pytest.mark.parametrize("auto_vacuum", ["NONE", "FULL"])
+def test_incremental_vacuum_skips_databases_without_incremental_mode(tmp_path, auto_vacuum):
+    engine = database_with_free_pages(tmp_path, auto_vacuum)
+    vacuum_with_timeout(engine)
+
+
+def test_incremental_vacuum_frees_every_page(tmp_path):
+    engine = database_with_free_pages(tmp_path, "INCREMENTAL")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA freelist_count")).scalar() > 16
+    assert vacuum_with_timeout(engine) == 0
+
+
+@pytest.mark.parametrize("hour, start, end, quiet", [
+    (3, 3, 5, True), (5, 3, 5, False), (2, 3, 5, False),
+    (23, 22, 2, True), (1, 22, 2, True), (2, 22, 2, False),
+    (3, 3, 3, False),  # same hour: no schedule
+])
+def test_quiet_hours_may_wrap_past_midnight(hour, start, end, quiet):
+    assert in_quiet_hours(hour, start, end) == quiet
+
+
+def test_run_is_recorded_and_the_next_one_waits_for_the_interval(monkeypatch):
+    config = get_database_config_manager().config
+    monkeypatch.setattr(config, "maintenance_start_hour", 3)
+    monkeypatch.setattr(config, "maintenance_end_hour", 5)
+    quiet, busy = datetime(2026, 1, 1, 4), datetime(2026, 1, 1, 12)
+
+    run = run_maintenance("scheduled")
+
+    assert (run.error, run.integrity) == (None, "ok")
+    latest = recent_runs(limit=1)[0]
+    assert (latest.id, latest.trigger) == (run.id, "scheduled")
+    scheduler = MaintenanceScheduler()
+    assert not scheduler.is_due(quiet)  # ran less than MIN_RUN_INTERVAL ago
+    monkeypatch.setattr(maintenance, "MIN_RUN_INTERVAL", timedelta(0))
+    assert scheduler.is_due(quiet)
+    assert not scheduler.is_due(busy)
@@ -0,0 +1,58 @@
+from domain.entities.order import Order
+
+
+def loaded_order(items, discount: int = 0, version: int = 1) -> Order:
+    """An order as read from the database: `items` are (name, price, quantity)"""
+    order = Order(table_number=1)
+    for name, price, quantity in items:
+        order.add_item(name, price, quantity)
+    order.apply_discount(discount)
+    order.mark_persisted(10, version)
+    return order
+
+
+def quantities(order: Order):
+    return {item.name: item.quantity for item in order.items}
+
+
+BASE = [("Tea", 20000, 2), ("Cake", 90000, 1), ("Latte", 60000, 1)]
+
+
+def test_merge_applies_local_changes_to_the_newer_version():
+    local = loaded_order(BASE)
+    local.remove_item("Cake")  # removed here, untouched there
+    local.add_item("Juice", 70000, 1)  # added on both sides
+    local.change_quantity("Tea", 3)  # +1 here, +2 there
+
+    remote = loaded_order([("Tea", 20000, 4), ("Cake", 90000, 1), ("Latte", 60000, 1),
+                           ("Juice", 70000, 2), ("Water", 10000, 1)], version=2)
+    local.merge_remote(remote)
+
+    assert quantities(local) == {"Tea": 5, "Latte": 1, "Juice": 3, "Water": 1}
+    assert local.version == 2
+
+
+def test_merge_drops_items_whose_quantity_reaches_zero():
+    local = loaded_order(BASE)
+    local.change_quantity("Tea", 1)  # -1 here
+    local.remove_item("Latte")  # -1 here, +1 there
+
+    remote = loaded_order([("Tea", 20000, 1), ("Cake", 90000, 1), ("Latte", 60000, 2)],
+                          version=2)
+    local.merge_remote(remote)
+
+    assert quantities(local) == {"Cake": 1, "Latte": 1}
+    # Merged onto a new base: only changes made after this merge count next time
+    local.merge_remote(loaded_order([("Cake", 90000, 1)], version=3))
+    assert quantities(local) == {"Cake": 1}
+
+
+def test_merge_keeps_the_local_discount_only_when_it_changed():
+    unchanged = loaded_order(BASE, discount=5000)
+    unchanged.merge_remote(loaded_order(BASE, discount=8000, version=2))
+    assert unchanged.discount.amount == 8000
+
+    changed = loaded_order(BASE, discount=5000)
+    changed.apply_discount(10000)
+    changed.merge_remote(loaded_order(BASE, discount=8000, version=2))
+    assert changed.discount.amount == 10000
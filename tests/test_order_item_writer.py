@@ -0,0 +1,142 @@
+import pytest
+from sqlalchemy import select, text
+
+from infrastructure.database.models.order_item_model import OrderItemModel
+from infrastructure.database.order_item_writer import (
+    insert_order_items, item_row, sync_order_items
+)
+from infrastructure.database.query_stats import assert_max_queries
+from infrastructure.database.session import engine, run_in_transaction, session_scope
+
+TABLE = 903  # only this module's orders sit at this table
+MENU = [(f"Writer test item {number}", 1000 * number, 1) for number in range(1, 21)]
+
+
+@pytest.fixture
+def item_writes(database):
+    """Number of order_items rows inserted, updated or deleted since the last call"""
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE test_item_writes (row_id INTEGER)"))
+        for operation, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            conn.execute(text(
+                f"CREATE TRIGGER test_item_{operation.lower()} AFTER {operation} ON order_items "
+                f"BEGIN INSERT INTO test_item_writes VALUES ({row}.id); END"
+            ))
+
+    def take() -> int:
+        with engine.begin() as conn:
+            count = conn.execute(text("SELECT count(*) FROM test_item_writes")).scalar()
+            conn.execute(text("DELETE FROM test_item_writes"))
+        return count
+
+    yield take
+    with engine.begin() as conn:
+        for operation in ("insert", "update", "delete"):
+            conn.execute(text(f"DROP TRIGGER test_item_{operation}"))
+        conn.execute(text("DROP TABLE test_item_writes"))
+
+
+def stored_items(order_id: int):
+    with session_scope() as session:
+        return session.execute(
+            select(OrderItemModel.id, OrderItemModel.product_name, OrderItemModel.quantity)
+            .where(OrderItemModel.order_id == order_id)
+            .order_by(OrderItemModel.id)
+        ).all()
+
+
+def create_order(client, headers, lines) -> dict:
+    response = client.post("/api/orders", headers=headers, json={
+        "table_number": TABLE,
+        "items": [{"product_name": name, "unit_price": price, "quantity": quantity}
+                  for name, price, quantity in lines],
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def sync(order_id: int, lines, max_queries: int):
+    rows = [item_row(order_id, name, price, quantity) for name, price, quantity in lines]
+
+    def write(session):
+        with assert_max_queries(max_queries, "sync_order_items"):
+            return sync_order_items(session, order_id, rows)
+
+    return run_in_transaction(write)
+
+
+def test_sync_writes_only_the_changed_lines(client, admin_headers, item_writes):
+    order = create_order(client, admin_headers, MENU)
+    before = {item.product_name: item.id for item in stored_items(order["id"])}
+    item_writes()
+
+    # Unchanged: one SELECT, nothing written
+    assert sync(order["id"], MENU, max_queries=1) == [before[name] for name, _, _ in MENU]
+    assert item_writes() == 0
+
+    # One quantity: one row updated, every id kept
+    edited = [(name, price, 3 if number == 0 else quantity)
+              for number, (name, price, quantity) in enumerate(MENU)]
+    assert sync(order["id"], edited, max_queries=2) == [before[name] for name, _, _ in MENU]
+    assert item_writes() == 1
+
+    # One line swapped for a new one and five quantities changed: seven rows
+    edited = edited[1:] + [("Writer test extra", 500, 1)]
+    edited = [(name, price, quantity + 1 if number < 5 else quantity)
+              for number, (name, price, quantity) in enumerate(edited)]
+    item_ids = sync(order["id"], edited, max_queries=4)
+    assert item_ids[:-1] == [before[name] for name, _, _ in MENU[1:]]
+    assert item_ids[-1] not in before.values()
+    assert item_writes() == 7
+    assert [(item.product_name, item.quantity) for item in stored_items(order["id"])] == \
+        [(name, quantity) for name, _, quantity in edited]
+
+
+def test_put_order_keeps_item_ids_and_writes_only_the_difference(client, admin_headers, item_writes):
+    order = create_order(client, admin_headers, MENU)
+    before = [item["id"] for item in order["items"]]
+    item_writes()
+
+    def put(lines):
+        # user, order, items, item writes, order update: independent of the item count
+        with assert_max_queries(8, "PUT /api/orders/{id}"):
+            response = client.put(f"/api/orders/{order['id']}", headers=admin_headers, json={
+                "table_number": TABLE,
+                "items": [{"product_name": name, "unit_price": price, "quantity": quantity}
+                          for name, price, quantity in lines],
+            })
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    edited = [(name, price, quantity + 1 if number == 3 else quantity)
+              for number, (name, price, quantity) in enumerate(MENU)]
+    result = put(edited)
+    assert [item["id"] for item in result["items"]] == before
+    assert item_writes() == 1
+
+    edited = [(name, price, quantity + 1) for name, price, quantity in edited[:10]]
+    result = put(edited)
+    assert [item["id"] for item in result["items"]] == before[:10]
+    assert item_writes() == 20  # ten quantities updated, ten lines deleted
+    assert result["total"] == sum(price * quantity for _, price, quantity in edited)
+
+
+def test_bulk_insert_returns_ids_in_input_order_from_one_statement(client, admin_headers):
+    first = create_order(client, admin_headers, MENU[:1])["id"]
+    second = create_order(client, admin_headers, MENU[:1])["id"]
+    rows = [item_row(order_id, name, price, quantity)
+            for name, price, quantity in MENU[::-1] + MENU[:3]  # three lines twice
+            for order_id in (second, first)]
+
+    def write(session):
+        with assert_max_queries(1, "insert_order_items"):
+            return insert_order_items(session, rows)
+
+    item_ids = run_in_transaction(write)
+    assert len(set(item_ids)) == len(rows)
+    with session_scope() as session:
+        stored = {item.id: item for item in session.execute(
+            select(OrderItemModel).where(OrderItemModel.id.in_(item_ids))).scalars()}
+        assert [(stored[item_id].order_id, stored[item_id].product_name, stored[item_id].quantity)
+                for item_id in item_ids] == \
+            [(row["order_id"], row["product_name"], row["quantity"]) for row in rows]
@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import select
+
+from domain.entities.order import Order
+from infrastructure.database.config import get_database_config_manager
+from infrastructure.database.models.order_model import OrderModel
+from infrastructure.database.order_loading import items_loader
+from infrastructure.database.query_stats import assert_max_queries
+from infrastructure.database.repositories.order_repository_sqlalchemy import (
+    OrderRepositorySQLAlchemy
+)
+from infrastructure.database.session import run_in_transaction, session_scope
+
+TABLE = 914  # only this module's orders sit at this table
+ORDERS = [[("Loading test tea", 1), ("Loading test cake", 2)],
+          [("Loading test tea", 3)],
+          [("Loading test juice", 1), ("Loading test cake", 1), ("Loading test tea", 2)]]
+
+
+@pytest.fixture(scope="module")
+def order_ids():
+    def save(lines):
+        order = Order(TABLE)
+        for name, quantity in lines:
+            order.add_item(name, 10000, quantity)
+        return run_in_transaction(lambda session: OrderRepositorySQLAlchemy(session).save(order))
+
+    return [save(lines) for lines in ORDERS]
+
+
+@pytest.mark.parametrize("strategy, queries", [("selectin", 2), ("subquery", 2), ("joined", 1)])
+def test_every_strategy_loads_the_same_items_in_fixed_queries(monkeypatch, order_ids,
+                                                              strategy, queries):
+    monkeypatch.setattr(get_database_config_manager().config, "order_items_loading", strategy)
+
+    with session_scope() as session:
+        with assert_max_queries(queries, f"get_many ({strategy})"):
+            orders = OrderRepositorySQLAlchemy(session).get_many(order_ids)
+        with assert_max_queries(queries, f"items_loader ({strategy})"):
+            models = session.execute(
+                select(OrderModel).options(items_loader())
+                .where(OrderModel.id.in_(order_ids)).order_by(OrderModel.id)
+                .execution_options(populate_existing=True)
+            ).unique().scalars().all()
+            lines = [[(item.product_name, item.quantity) for item in model.items] for model in models]
+
+    assert [[(item.name, item.quantity) for item in order.items] for order in orders] == ORDERS
+    assert lines == ORDERS
+
+
+def test_unknown_strategy_is_rejected(monkeypatch):
+    monkeypatch.setattr(get_database_config_manager().config, "order_items_loading", "lazy")
+    with pytest.raises(ValueError, match="order_items_loading"):
+        items_loader()
@@ -0,0 +1,66 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from infrastructure.database.archive import archive_batch
+from infrastructure.database.models.order_model import OrderModel
+from infrastructure.database.session import run_in_transaction
+
+TABLE = 915  # only this module's orders sit at this table
+# Creation time of each order, in the order they are created
+CREATED = [datetime(1999, 1, 2), datetime(1999, 1, 1),
+           datetime(2020, 1, 2), datetime(2020, 1, 2), datetime(2020, 1, 3)]
+ARCHIVED = 2  # the first two, closed and moved to the archive
+
+
+def create_orders(client, headers) -> list:
+    order_ids = []
+    for created_at in CREATED:
+        response = client.post("/api/orders", headers=headers, json={
+            "table_number": TABLE,
+            "items": [{"product_name": "Paging test tea", "unit_price": 10000, "quantity": 1}],
+        })
+        assert response.status_code == 200, response.text
+        order_ids.append(response.json()["id"])
+        run_in_transaction(lambda session: session.execute(
+            update(OrderModel).where(OrderModel.id == order_ids[-1]).values(created_at=created_at)))
+    for order_id in order_ids[:ARCHIVED]:
+        response = client.patch(f"/api/orders/{order_id}/status", headers=headers,
+                                json={"status": "closed"})
+        assert response.status_code == 200, response.text
+    moved = run_in_transaction(lambda session: archive_batch(session, datetime(1999, 12, 31), 100))
+    assert moved == ARCHIVED
+    return order_ids
+
+
+def walk(client, headers, **params) -> list:
+    """Every page of a listing, following X-Next-Cursor"""
+    pages = []
+    cursor = None
+    while True:
+        response = client.get("/api/orders", headers=headers,
+                              params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        pages.append([order["id"] for order in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+def test_pages_list_every_order_once_newest_first_into_the_archive(client, admin_headers):
+    order_ids = create_orders(client, admin_headers)
+
+    pages = walk(client, admin_headers, table_number=TABLE, limit=2)
+
+    assert all(len(page) <= 2 for page in pages)
+    newest_first = sorted(order_ids, key=lambda order_id: (CREATED[order_ids.index(order_id)],
+                                                           order_id), reverse=True)
+    assert [order_id for page in pages for order_id in page] == newest_first
+
+    closed = walk(client, admin_headers, table_number=TABLE, status_filter="closed", limit=1)
+    assert [order_id for page in closed for order_id in page] == newest_first[-ARCHIVED:]
+
+
+def test_a_cursor_that_was_not_issued_is_rejected(client, admin_headers):
+    response = client.get("/api/orders", headers=admin_headers, params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
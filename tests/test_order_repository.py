@@ -0,0 +1,38 @@
+from application.menu_service import MenuService
+from domain.entities.order import Order
+from infrastructure.database.repositories.order_repository_sqlalchemy import (
+    OrderFilter, OrderRepositorySQLAlchemy
+)
+from infrastructure.database.session import run_in_transaction, session_scope
+
+TABLE = 901  # only this module's orders sit at this table
+
+
+def save_order(*lines) -> int:
+    order = Order(TABLE)
+    for name, price, quantity, product_id in lines:
+        order.add_item(name, price, quantity, product_id)
+    return run_in_transaction(lambda session: OrderRepositorySQLAlchemy(session).save(order))
+
+
+def list_ids(**filters):
+    with session_scope() as session:
+        orders = OrderRepositorySQLAlchemy(session).list_orders(
+            OrderFilter(table_number=TABLE, **filters))
+        return [order.id for order in orders]
+
+
+def test_list_orders_applies_every_filter():
+    menu = MenuService()
+    tea = menu.add_product("Repository test tea", 20000, "Tests")
+    cake = menu.add_product("Repository test cake", 90000, "Tests")
+    small = save_order(("Repository test tea", 20000, 1, tea))
+    large = save_order(("Repository test tea", 20000, 1, tea), ("Repository test cake", 90000, 2, cake))
+    cake_only = save_order(("Repository test cake", 90000, 1, cake))
+
+    assert list_ids() == [small, large, cake_only]
+    assert list_ids(newest_first=True, limit=2) == [cake_only, large]
+    assert list_ids(min_total=90000) == [large, cake_only]
+    assert list_ids(max_total=90000) == [small, cake_only]
+    assert list_ids(product_id=tea) == [small, large]
+    assert list_ids(product_id=cake, max_total=100000) == [cake_only]
@@ -0,0 +1,84 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from application.order_service import OrderService
+from infrastructure.database.repositories.order_repository_sqlalchemy import (
+    OrderRepositorySQLAlchemy
+)
+from infrastructure.database.session import session_scope
+from infrastructure.database.write_queue import get_write_queue
+
+
+@pytest.fixture
+def busy_first_commit():
+    """The writer's next COMMIT fails as if another process held the lock"""
+    write_queue = get_write_queue()
+    engine = write_queue._engine
+    failed = []
+
+    def fail_once(conn):
+        if not failed:
+            failed.append(True)
+            raise OperationalError("COMMIT", {}, sqlite3.OperationalError("database is locked"))
+
+    event.listen(engine, "commit", fail_once)
+    retries = write_queue.stats.busy_retries
+    yield lambda: len(failed) == 1 and write_queue.stats.busy_retries == retries + 1
+    event.remove(engine, "commit", fail_once)
+
+
+def stored_items(order_id: int):
+    with session_scope() as session:
+        order = OrderRepositorySQLAlchemy(session).get_by_id(order_id)
+    return {item.name: item.quantity for item in order.items}
+
+
+def test_new_order_survives_a_rerun_of_its_write(busy_first_commit):
+    service = OrderService()
+    service.set_table(907)
+    service.add_item("Rerun test tea", 20000, 2)
+    service.add_item("Rerun test cake", 90000, 1)
+
+    order_id = service.close_and_save()
+
+    assert busy_first_commit()
+    assert stored_items(order_id) == {"Rerun test tea": 2, "Rerun test cake": 1}
+
+
+def test_merged_order_keeps_local_items_after_a_rerun(client, admin_headers, busy_first_commit):
+    service = OrderService()
+    service.set_table(908)
+    service.add_item("Rerun test local", 10000, 3)
+    # Meanwhile the web opens an order for the same table
+    response = client.post("/api/orders", headers=admin_headers, json={
+        "table_number": 908,
+        "items": [{"product_name": "Rerun test web", "unit_price": 50000, "quantity": 1}],
+    })
+    assert response.status_code == 200, response.text
+
+    order_id = service.close_and_save()
+
+    assert busy_first_commit()
+    assert order_id == response.json()["id"]
+    assert stored_items(order_id) == {"Rerun test web": 1, "Rerun test local": 3}
+
+
+def test_failed_save_leaves_the_cart_open_and_unchanged(monkeypatch):
+    service = OrderService()
+    service.set_table(909)
+    service.add_item("Rerun test tea", 20000, 1)
+
+    def broken_save(self, order):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(OrderRepositorySQLAlchemy, "save", broken_save)
+    with pytest.raises(ValueError):
+        service.close_and_save()
+
+    order = service.current_order
+    assert order.id is None and order.version is None
+    service.add_item("Rerun test tea", 20000, 1)  # still open
+    assert [(item.name, item.quantity) for item in order.items] == [("Rerun test tea", 2)]
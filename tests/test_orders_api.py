@@ -0,0 +1,114 @@
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.orm.exc import StaleDataError
+
+import web.api
+from infrastructure.database.archive import archive_batch
+from infrastructure.database.models.order_model import OrderModel
+from infrastructure.database.session import run_in_transaction
+
+TABLE = 902  # only this module's orders sit at this table
+
+
+def create_order(client, headers, *items) -> dict:
+    response = client.post("/api/orders", headers=headers, json={
+        "table_number": TABLE,
+        "items": [{"product_name": name, "unit_price": price, "quantity": quantity}
+                  for name, price, quantity in items],
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_update_accepts_a_weak_etag_and_rejects_a_stale_one(client, admin_headers):
+    order = create_order(client, admin_headers, ("Api test tea", 20000, 1))
+    etag = client.get(f"/api/orders/{order['id']}", headers=admin_headers).headers["ETag"]
+    body = {"table_number": TABLE, "items": [
+        {"product_name": "Api test tea", "unit_price": 20000, "quantity": 2}]}
+
+    response = client.put(f"/api/orders/{order['id']}", json=body,
+                          headers={**admin_headers, "If-Match": f"W/{etag}"})
+    assert response.status_code == 200, response.text
+    assert response.json()["total"] == 40000
+
+    response = client.put(f"/api/orders/{order['id']}", json=body,
+                          headers={**admin_headers, "If-Match": etag})
+    assert response.status_code == 409
+
+
+def test_stale_update_with_a_base_gets_the_server_merge(client, admin_headers):
+    order = create_order(client, admin_headers, ("Api test tea", 20000, 2), ("Api test cake", 50000, 1))
+    url = f"/api/orders/{order['id']}"
+    base = {"items": {"Api test tea": 2, "Api test cake": 1}, "discount": 0, "table_number": TABLE}
+    # Meanwhile the desktop adds a juice
+    response = client.post(f"{url}/items", headers=admin_headers,
+                           json={"product_name": "Api test juice", "unit_price": 30000, "quantity": 1})
+    assert response.status_code == 200, response.text
+
+    # The page loaded before that: one more tea, no cake
+    response = client.put(url, headers={**admin_headers, "If-Match": f'"{order["version"]}"'}, json={
+        "table_number": TABLE, "discount": 0, "base": base,
+        "items": [{"product_name": "Api test tea", "unit_price": 20000, "quantity": 3}],
+    })
+    assert response.status_code == 409, response.text
+    conflict = response.json()["detail"]
+    merged = conflict["merged"]
+    assert {item["product_name"]: item["quantity"] for item in merged["items"]} == \
+        {"Api test tea": 3, "Api test juice": 1}
+    assert merged["base"]["items"] == {"Api test tea": 2, "Api test cake": 1, "Api test juice": 1}
+    assert response.headers["ETag"] == f'"{conflict["version"]}"'
+
+    response = client.put(url, json=merged,
+                          headers={**admin_headers, "If-Match": response.headers["ETag"]})
+    assert response.status_code == 200, response.text
+    assert response.json()["total"] == 3 * 20000 + 30000
+
+
+def test_add_item_retries_once_after_a_concurrent_write(client, admin_headers, monkeypatch):
+    order = create_order(client, admin_headers, ("Api test tea", 20000, 1))
+    add_order_item = web.api.add_order_item
+    attempts = []
+
+    def lose_first_race(session, order_id, item_data):
+        attempts.append(order_id)
+        if len(attempts) == 1:
+            raise StaleDataError("order changed by another writer")
+        return add_order_item(session, order_id, item_data)
+
+    monkeypatch.setattr(web.api, "add_order_item", lose_first_race)
+    response = client.post(f"/api/orders/{order['id']}/items", headers=admin_headers,
+                           json={"product_name": "Api test cake", "unit_price": 50000, "quantity": 1})
+    assert response.status_code == 200, response.text
+    assert len(attempts) == 2
+
+
+def test_add_item_reports_a_conflict_when_the_retry_loses_too(client, admin_headers, monkeypatch):
+    order = create_order(client, admin_headers, ("Api test tea", 20000, 1))
+
+    def always_lose(session, order_id, item_data):
+        raise StaleDataError("order changed by another writer")
+
+    monkeypatch.setattr(web.api, "add_order_item", always_lose)
+    response = client.post(f"/api/orders/{order['id']}/items", headers=admin_headers,
+                           json={"product_name": "Api test cake", "unit_price": 50000, "quantity": 1})
+    assert response.status_code == 409
+
+
+def test_changes_ask_for_a_reload_once_orders_were_archived(client, admin_headers):
+    old = [create_order(client, admin_headers, ("Api test tea", 20000, 1))["id"] for _ in range(2)]
+    create_order(client, admin_headers, ("Api test tea", 20000, 1))  # the newest stays live
+    for order_id in old:
+        response = client.patch(f"/api/orders/{order_id}/status", headers=admin_headers,
+                                json={"status": "closed"})
+        assert response.status_code == 200, response.text
+    run_in_transaction(lambda session: session.execute(
+        update(OrderModel).where(OrderModel.id.in_(old)).values(created_at=datetime(2000, 1, 1))))
+    cursor = client.get("/api/orders/changes", headers=admin_headers).json()["cursor"]
+
+    assert run_in_transaction(lambda session: archive_batch(session, datetime(2001, 1, 1), 100)) == 2
+
+    page = client.get(f"/api/orders/changes?since={cursor}", headers=admin_headers).json()
+    assert page["reset"] and page["orders"] == [] and page["cursor"] > cursor
+    page = client.get(f"/api/orders/changes?since={page['cursor']}", headers=admin_headers).json()
+    assert not page["reset"]
@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine.default import CACHE_HIT
+
+from domain.entities.order import Order
+from infrastructure.database.repositories.order_repository_sqlalchemy import (
+    OrderRepositorySQLAlchemy
+)
+from infrastructure.database.session import engine, run_in_transaction, session_scope
+
+TABLES = (911, 912)  # only this module's orders sit at these tables
+
+
+@pytest.fixture
+def compiled_cache():
+    """(SQL, cache hit) of every statement run through the session engine"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, context.cache_hit == CACHE_HIT))
+
+    event.listen(engine, "after_cursor_execute", record)
+    yield executed
+    event.remove(engine, "after_cursor_execute", record)
+
+
+def save_order(table_number: int, name: str) -> int:
+    order = Order(table_number)
+    order.add_item(name, 10000, 1)
+    return run_in_transaction(lambda session: OrderRepositorySQLAlchemy(session).save(order))
+
+
+def test_open_order_lookup_binds_each_table_into_one_compiled_statement(compiled_cache):
+    order_ids = {table: save_order(table, f"Statement test {table}") for table in TABLES}
+
+    with session_scope() as session:
+        repo = OrderRepositorySQLAlchemy(session)
+        del compiled_cache[:]
+        found = {table: repo.get_open_order_id_by_table(table) for table in (*TABLES, 913)}
+        orders = {table: repo.get_open_order_by_table(table) for table in TABLES}
+
+    assert found == {**order_ids, 913: None}
+    assert {table: [item.name for item in order.items] for table, order in orders.items()} == \
+        {table: [f"Statement test {table}"] for table in TABLES}
+    hits = [hit for statement, hit in compiled_cache if "orders.table_number = ?" in statement]
+    assert len(hits) == 5
+    # The id lookup and the one with items: each compiled at most once, then reused
+    id_lookups, item_lookups = hits[:3], hits[3:]
+    assert all(id_lookups[1:]) and all(item_lookups[1:])
+
+
+def test_orders_by_ids_keep_the_requested_order(compiled_cache):
+    first, second = (save_order(table, "Statement test by id") for table in TABLES)
+
+    with session_scope() as session:
+        repo = OrderRepositorySQLAlchemy(session)
+        del compiled_cache[:]
+        assert [order.id for order in repo.get_many([second, -1, first])] == [second, first]
+        assert [order.id for order in repo.get_many([first])] == [first]
+
+    assert compiled_cache and compiled_cache[-1][1]
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+from infrastructure.database.async_session import AsyncSessionLocal
+from infrastructure.database.repositories.product_catalog import get_product_catalog
+from infrastructure.database.repositories.product_repository_sqlalchemy import (
+    ProductRepositorySQLAlchemy
+)
+
+
+def run_with_timeout(coroutine_factory, timeout: float):
+    """Run an event loop on its own thread; a blocked loop cannot time itself out"""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = asyncio.run(coroutine_factory())
+        except BaseException as e:  # reported to the test below
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "event loop blocked (catalog lock held across an await?)"
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def test_concurrent_async_reads_after_invalidate_do_not_block_the_event_loop():
+    catalog = get_product_catalog()
+    catalog.invalidate()
+
+    async def read_categories():
+        async with AsyncSessionLocal() as session:
+            return await session.run_sync(
+                lambda sync_session: ProductRepositorySQLAlchemy(sync_session).get_categories()
+            )
+
+    async def main():
+        return await asyncio.gather(*(read_categories() for _ in range(10)))
+
+    results = run_with_timeout(main, timeout=20)
+    assert len(results) == 10
+    assert all(categories == results[0] for categories in results)
+
+
+def test_an_older_load_never_replaces_a_newer_snapshot():
+    from application.menu_service import MenuService
+
+    MenuService().add_product("Catalog test", 1000, "Tests")
+    catalog = get_product_catalog()
+    current = catalog.snapshot()
+    assert current.products_version is not None
+
+    published = catalog._publish_loaded(current.products_version - 1, [])
+
+    assert published is current
+    assert catalog.snapshot() is current
+    assert any(product.name == "Catalog test" for product in current.active)
+
+
+def test_committed_writes_reach_the_next_snapshot_without_a_load():
+    from application.menu_service import MenuService
+
+    menu = MenuService()
+    catalog = get_product_catalog()
+    catalog.snapshot()
+    loads = catalog.stats.loads
+
+    product_id = menu.add_product("Catalog write-through test", 1000, "Tests")
+    menu.update_product_price(product_id, 2500)
+    menu.deactivate_product(product_id)
+
+    snapshot = catalog.snapshot()
+    assert catalog.stats.loads == loads
+    assert snapshot.get(product_id).price == 2500
+    assert all(product.id != product_id for product in snapshot.active)
+
+
+def test_a_write_from_another_connection_loads_a_new_snapshot():
+    from sqlalchemy import text
+
+    from application.menu_service import MenuService
+    from infrastructure.database.session import engine
+
+    product_id = MenuService().add_product("Catalog external test", 1000, "Tests")
+    catalog = get_product_catalog()
+    before = catalog.snapshot()
+    invalidations = catalog.stats.invalidations
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE products SET price = 4000 WHERE id = :id"), {"id": product_id})
+
+    snapshot = catalog.snapshot()
+    assert catalog.stats.invalidations == invalidations + 1
+    assert snapshot.products_version > before.products_version
+    assert snapshot.get(product_id).price == 4000
+    assert catalog.snapshot() is snapshot
@@ -0,0 +1,66 @@
+import pytest
+
+from application.product_search import ProductSearchIndex, normalize
+from infrastructure.database.repositories.product_catalog import MenuCatalog, MenuProduct
+
+MENU = MenuCatalog.build(1, 1, [
+    MenuProduct(1, "کیک شکلاتی", 70000, "دسر", True),
+    MenuProduct(2, "کیک وانیلی", 65000, "دسر", True),
+    MenuProduct(3, "قهوه ترک", 50000, "نوشیدنی گرم", True),
+    MenuProduct(4, "چای سبز", 30000, "نوشیدنی گرم", True),
+    MenuProduct(5, "نوشابه ۳۳۰", 20000, "نوشیدنی سرد", True),
+    MenuProduct(6, "کیک‌پای", 90000, "دسر", True),
+    MenuProduct(7, "کیک قدیمی", 10000, "دسر", False),
+])
+
+
+def names(query: str, limit=None):
+    return [product.name for product in ProductSearchIndex(MENU).search(query, limit)]
+
+
+def test_arabic_letters_digits_and_zero_width_non_joiner_are_normalized():
+    assert normalize("كيك‌شكلاتي ۲") == "کیک شکلاتی 2"
+    assert names("كيك شكلاتي") == ["کیک شکلاتی"]
+    assert names("نوشابه 330") == names("نوشابه ٣٣٠") == ["نوشابه ۳۳۰"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("کیک", ["کیک شکلاتی", "کیک وانیلی", "کیک‌پای"]),  # prefix; inactive products left out
+    ("شکل", ["کیک شکلاتی"]),
+    ("قهئه", ["قهوه ترک"]),  # one typo
+    ("کیکپای", ["کیک‌پای"]),  # written without the space
+    ("گرم", ["قهوه ترک", "چای سبز"]),  # category
+    ("کیک دسر", ["کیک شکلاتی", "کیک وانیلی", "کیک‌پای"]),
+    ("پیتزا", []),
+    ("  ", []),
+])
+def test_search_matches(query, expected):
+    assert sorted(names(query)) == sorted(expected)
+
+
+def test_name_matches_rank_before_category_matches_and_limit_applies():
+    menu = MenuCatalog.build(1, 1, [
+        MenuProduct(1, "آب معدنی", 15000, "سرد", True),
+        MenuProduct(2, "نوشابه", 20000, "سرد", True),
+        MenuProduct(3, "چای سرد", 40000, "نوشیدنی", True),
+    ])
+    index = ProductSearchIndex(menu)
+    assert [product.id for product in index.search("سرد")] == [3, 1, 2]
+    assert [product.id for product in index.search("سرد", limit=1)] == [3]
+
+
+def test_search_route_reflects_menu_edits(client, admin_headers):
+    from application.menu_service import MenuService
+
+    menu = MenuService()
+    product_id = menu.add_product("اسموتی زغال‌اخته", 80000, "نوشیدنی سرد")
+
+    def search(q):
+        response = client.get("/api/products/search", headers=admin_headers,
+                              params={"q": q, "limit": 5})
+        assert response.status_code == 200, response.text
+        return [product["id"] for product in response.json()]
+
+    assert search("اسموتي زغال") == [product_id]
+    menu.deactivate_product(product_id)
+    assert search("اسموتی") == []
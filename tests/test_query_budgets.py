@@ -0,0 +1,43 @@
+import pytest
+
+from application.order_service import OrderService
+from infrastructure.database.query_stats import assert_max_queries
+
+TABLE = 905  # only this module's orders sit at this table
+
+
+def add_orders(client, headers, count: int) -> None:
+    for _ in range(count):
+        response = client.post("/api/orders", headers=headers, json={
+            "table_number": TABLE,
+            "items": [{"product_name": "Budget test tea", "unit_price": 20000, "quantity": 1},
+                      {"product_name": "Budget test cake", "unit_price": 90000, "quantity": 2}],
+        })
+        assert response.status_code == 200, response.text
+
+
+@pytest.mark.parametrize("orders", [3, 40])
+def test_order_list_query_count_does_not_grow_with_the_orders(client, admin_headers, orders):
+    add_orders(client, admin_headers, orders)
+    # user, orders, their items, then the (empty) archive once the live orders run out
+    with assert_max_queries(4, "GET /api/orders"):
+        response = client.get(f"/api/orders?table_number={TABLE}&limit=200", headers=admin_headers)
+    assert response.status_code == 200
+    assert all(len(order["items"]) == 2 for order in response.json())
+
+
+def test_server_timing_reports_the_request_query_count(client, admin_headers):
+    with assert_max_queries(3, "GET /api/orders") as stats:
+        response = client.get(f"/api/orders?table_number={TABLE}&limit=1", headers=admin_headers)
+    assert f'desc="{stats.count} queries"' in response.headers["Server-Timing"]
+
+
+def test_dashboard_reads_totals_without_a_query_per_order(client, admin_headers):
+    add_orders(client, admin_headers, 10)
+    with assert_max_queries(5, "GET /api/dashboard/stats"):
+        assert client.get("/api/dashboard/stats", headers=admin_headers).status_code == 200
+
+
+def test_open_orders_load_their_items_in_one_query():
+    with assert_max_queries(2, "OrderService.get_open_orders"):
+        OrderService().get_open_orders()
@@ -0,0 +1,44 @@
+import time
+
+import pytest
+from sqlalchemy import text
+
+from infrastructure.database.async_session import AsyncReadSessionLocal, async_read_engine
+from infrastructure.database.read_session import ReportTimeoutError, read_session_scope
+from web.api import app, get_read_db
+
+# Seconds of work, unless the read deadline interrupts it
+SLOW_QUERY = text(
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000)"
+    " SELECT count(*) FROM n"
+)
+
+
+def test_slow_read_is_interrupted_at_its_timeout():
+    started = time.monotonic()
+    with pytest.raises(ReportTimeoutError):
+        with read_session_scope(timeout_ms=50) as session:
+            session.execute(SLOW_QUERY)
+    assert time.monotonic() - started < 2
+
+    # The deadline ends with the transaction: the pooled connection is reusable
+    with read_session_scope() as session:
+        assert session.execute(text("SELECT count(*) FROM orders")).scalar() >= 0
+
+
+def test_read_route_answers_503_when_its_query_times_out(client, admin_headers):
+    engine = async_read_engine.execution_options(timeout_ms=50)
+
+    async def slow_read_db():
+        async with AsyncReadSessionLocal(bind=engine) as session:
+            await session.execute(SLOW_QUERY)
+            yield session
+
+    app.dependency_overrides[get_read_db] = slow_read_db
+    try:
+        response = client.get("/api/dashboard/stats", headers=admin_headers)
+    finally:
+        del app.dependency_overrides[get_read_db]
+    assert response.status_code == 503
+
+    assert client.get("/api/dashboard/stats", headers=admin_headers).status_code == 200
@@ -0,0 +1,57 @@
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import update
+
+from application.report_service import ReportService
+from infrastructure.database.models.order_model import OrderModel
+from infrastructure.database.session import run_in_transaction
+
+TABLE = 910  # only this module's orders sit at this table
+PRODUCTS = ("Report test open", "Report test closed", "Report test cancelled")
+
+
+def add_order(client, headers, name: str, quantity: int, status: str, created_at=None) -> None:
+    response = client.post("/api/orders", headers=headers, json={
+        "table_number": TABLE,
+        "items": [{"product_name": name, "unit_price": 10000, "quantity": quantity}],
+    })
+    assert response.status_code == 200, response.text
+    order_id = response.json()["id"]
+    if created_at is not None:
+        run_in_transaction(lambda session: session.execute(
+            update(OrderModel).where(OrderModel.id == order_id).values(created_at=created_at)))
+    # Cancelled after being closed: counted once, then taken out again
+    for step in {"open": [], "closed": ["closed"], "cancelled": ["closed", "cancelled"]}[status]:
+        response = client.patch(f"/api/orders/{order_id}/status", headers=headers,
+                                json={"status": step})
+        assert response.status_code == 200, response.text
+
+
+def add_orders(client, headers, created_at=None) -> None:
+    for name, status in zip(PRODUCTS, ("open", "closed", "cancelled")):
+        add_order(client, headers, name, 2, status, created_at)
+
+
+def daily(reports: ReportService, day):
+    report = reports.get_daily_sales(datetime.combine(day, time()))
+    return report["orders_count"], report["net_sales"].amount
+
+
+def test_reports_count_closed_orders_on_both_sides_of_the_live_day(client, admin_headers):
+    reports = ReportService()
+    today = reports._live_start()  # read from orders; earlier days from the rollup
+    yesterday = today - timedelta(days=1)
+    before = {day: daily(reports, day) for day in (yesterday, today)}
+
+    add_orders(client, admin_headers, created_at=datetime.combine(yesterday, time(12)))
+    add_orders(client, admin_headers)
+
+    for day in (yesterday, today):
+        orders_count, net_sales = before[day]
+        assert daily(reports, day) == (orders_count + 1, net_sales + 20000), day
+    products = {stat["product_name"]: stat for stat in reports.get_product_sales_report(
+        datetime.combine(yesterday, time()), datetime.combine(today, time()))}
+    assert PRODUCTS[0] not in products and PRODUCTS[2] not in products
+    closed = products[PRODUCTS[1]]
+    assert (closed["total_quantity"], closed["orders_count"]) == (4, 2)
+    assert closed["total_revenue"].amount == 40000
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import pytest
+
+from application.auth_service import AuthService
+from application.menu_service import MenuService
+from application.order_service import OrderService
+from application.report_service import ReportService
+from infrastructure.database.session import assert_no_session_leaks
+
+TABLE = 904  # only this module's orders sit at this table
+
+
+def test_order_workflow_closes_its_sessions():
+    service = OrderService()
+    with assert_no_session_leaks():
+        service.set_table(TABLE)
+        service.add_item("Leak test tea", 20000, 2)
+        service.apply_discount(5000)
+        order_id = service.close_and_save()
+        service.get_open_orders()
+        service.set_table(TABLE)
+        service.refresh_if_changed()
+        service.refresh_if_changed()
+        assert "Leak test tea" in service.print_receipt(order_id)
+
+
+def test_menu_and_auth_calls_close_their_sessions():
+    menu = MenuService()
+    auth = AuthService()
+    with assert_no_session_leaks():
+        product_id = menu.add_product("Leak test cake", 90000, "Tests")
+        menu.update_product_price(product_id, 95000)
+        menu.get_product_by_id(product_id)
+        menu.get_all_products()
+        menu.deactivate_product(product_id)
+        auth.register("leak_test_user", "secret", "Leak Test")
+        assert auth.login("leak_test_user", "secret")[0]
+        assert not auth.login("leak_test_user", "wrong")[0]
+        auth.get_all_users()
+
+
+def test_failing_calls_close_their_sessions():
+    with assert_no_session_leaks():
+        with pytest.raises(ValueError):
+            MenuService().get_product_by_id(-1)
+        service = OrderService()
+        with pytest.raises(ValueError):
+            service.close_and_save()  # no table selected
+
+
+def test_reports_close_their_sessions():
+    reports = ReportService()
+    now = datetime.now()
+    with assert_no_session_leaks():
+        reports.get_daily_sales(now)
+        reports.get_monthly_sales(now.year, now.month)
+        reports.get_product_sales_report()
+        reports.get_hourly_sales_pattern(now)
+        reports.get_table_performance()
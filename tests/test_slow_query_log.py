@@ -0,0 +1,49 @@
+import pytest
+
+from application.report_service import ReportService
+from infrastructure.database import slow_query_log
+from infrastructure.database.session import db_config
+from infrastructure.database.slow_query_log import read_slow_query_log
+
+
+@pytest.fixture
+def log_every_query(monkeypatch, tmp_path):
+    """The slow-query log switched on with no threshold, into a fresh file"""
+    monkeypatch.setattr(db_config, "slow_query_log", True)
+    monkeypatch.setattr(db_config, "slow_query_threshold_ms", 0)
+    monkeypatch.setattr(db_config, "slow_query_log_file", str(tmp_path / "slow.log"))
+    yield lambda: read_slow_query_log(config=db_config).split("\n\n")
+    handler = slow_query_log._handler
+    if handler is not None:
+        slow_query_log._logger.removeHandler(handler)
+        handler.close()
+        slow_query_log._handler = None
+
+
+def entry(entries, text: str) -> str:
+    found = [e for e in entries if text in e]
+    assert found, f"no log entry with {text!r}"
+    return found[0]
+
+
+def test_report_query_is_logged_with_its_caller_and_plan(log_every_query):
+    ReportService().get_table_performance()
+
+    logged = entry(log_every_query(), "caller:  ReportService.get_table_performance")
+    assert " ms\n" in logged and "sql:     SELECT" in logged
+    plan = logged.split("  plan:\n", 1)[1]
+    assert "SCAN" in plan or "SEARCH" in plan
+
+
+def test_async_route_query_is_logged_with_the_route(log_every_query, client, admin_headers):
+    assert client.get("/api/dashboard/stats", headers=admin_headers).status_code == 200
+
+    logged = entry(log_every_query(), "caller:  get_dashboard_stats")
+    assert "context: GET /api/dashboard/stats" in logged
+    assert "  plan:\n" in logged
+
+
+def test_nothing_is_logged_while_switched_off(log_every_query, monkeypatch):
+    monkeypatch.setattr(db_config, "slow_query_log", False)
+    ReportService().get_table_performance()
+    assert log_every_query() == [""]
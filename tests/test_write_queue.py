@@ -0,0 +1,138 @@
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from infrastructure.database.config import DatabaseConfig
+from infrastructure.database.write_queue import (
+    WriteQueue, call_after_commit, create_writer_engine
+)
+
+
+@pytest.fixture
+def write_queue(tmp_path):
+    """A writer of its own on an empty database with one `notes` table"""
+    config = DatabaseConfig(busy_retry_backoff_ms=1)
+    engine = create_writer_engine(f"sqlite:///{tmp_path / 'writer.db'}", config)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE notes (body TEXT NOT NULL)"))
+    write_queue = WriteQueue(engine, config)
+    yield write_queue
+    write_queue.stop(5)
+    engine.dispose()
+
+
+def add_note(body):
+    def work(session):
+        session.execute(text("INSERT INTO notes VALUES (:body)"), {"body": body})
+        return body
+    return work
+
+
+def failing(session):
+    session.execute(text("INSERT INTO notes VALUES ('from the failing unit')"))
+    raise ValueError("rejected")
+
+
+def notes(write_queue):
+    with write_queue._engine.connect() as conn:
+        return sorted(conn.execute(text("SELECT body FROM notes")).scalars())
+
+
+def submit_together(write_queue, works):
+    """Submit `works` while the writer is held up, so they share one batch"""
+    running, release = threading.Event(), threading.Event()
+
+    def hold(session):
+        running.set()
+        release.wait(5)
+
+    blocker = write_queue.submit(hold)
+    assert running.wait(5)
+    futures = [write_queue.submit(work) for work in works]
+    release.set()
+    blocker.result(5)
+    return futures
+
+
+def test_queued_units_share_one_commit(write_queue):
+    futures = submit_together(write_queue, [add_note(f"note {number}") for number in range(5)])
+
+    assert [future.result(5) for future in futures] == [f"note {number}" for number in range(5)]
+    assert notes(write_queue) == [f"note {number}" for number in range(5)]
+    assert write_queue.stats.batches == 2  # the blocker, then the five together
+    assert write_queue.stats.largest_batch == 5
+
+
+def test_failing_unit_is_rolled_back_alone(write_queue):
+    futures = submit_together(write_queue, [add_note("before"), failing, add_note("after")])
+
+    assert futures[0].result(5) == "before"
+    with pytest.raises(ValueError, match="rejected"):
+        futures[1].result(5)
+    assert futures[2].result(5) == "after"
+    assert notes(write_queue) == ["after", "before"]
+    assert write_queue.stats.largest_batch == 3
+
+
+@pytest.mark.parametrize("batched", [True, False])
+def test_callbacks_of_a_failing_unit_are_dropped(write_queue, batched):
+    called = []
+
+    def register_then_fail(session):
+        call_after_commit(session, lambda: called.append("failing"))
+        failing(session)
+
+    def register(session):
+        call_after_commit(session, lambda: called.append("committed"))
+
+    if batched:
+        futures = submit_together(write_queue, [register_then_fail, register])
+    else:
+        futures = [write_queue.submit(register_then_fail)]
+    with pytest.raises(ValueError):
+        futures[0].result(5)
+    for future in futures[1:]:
+        future.result(5)
+
+    assert called == (["committed"] if batched else [])
+    assert notes(write_queue) == []
+
+
+def test_busy_commit_reruns_the_whole_batch(write_queue):
+    armed, failed = [], []
+
+    def arm(session):
+        armed.append(True)
+        return add_note("first")(session)
+
+    def fail_once(conn):
+        # Only the batch with "first" in it: the blocker commits normally
+        if armed and not failed:
+            failed.append(True)
+            raise OperationalError("COMMIT", {}, sqlite3.OperationalError("database is locked"))
+
+    event.listen(write_queue._engine, "commit", fail_once)
+    futures = submit_together(write_queue, [arm, add_note("second")])
+
+    assert [future.result(5) for future in futures] == ["first", "second"]
+    assert notes(write_queue) == ["first", "second"]  # written once, not twice
+    assert len(armed) == 2 and write_queue.stats.busy_retries == 1
+
+
+def test_after_commit_callback_can_write_and_wait(write_queue):
+    results = []
+
+    def write_from_callback():
+        # run_in_transaction from a callback: waits on the writer thread itself
+        results.append(write_queue.submit(add_note("from the callback")).result(5))
+
+    def work(session):
+        call_after_commit(session, write_from_callback)
+        return add_note("first")(session)
+
+    assert write_queue.submit(work).result(5) == "first"
+    assert results == ["from the callback"]
+    assert notes(write_queue) == ["first", "from the callback"]
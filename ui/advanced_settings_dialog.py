@@ -7,8 +7,10 @@ from PySide6.QtWidgets import (
     QFrame, QGridLayout
 )
 from PySide6.QtCore import Qt
-from PySide6.QtGui import QFont
+from PySide6.QtGui import QFont, QTextCursor
 from application.menu_service import MenuService
+from infrastructure.database.config import get_database_config_manager
+from infrastructure.database.slow_query_log import read_slow_query_log
 from ui.styles import ThemeManager
 
 
@@ -645,6 +647,40 @@ class AdvancedSettingsDialog(QDialog):
         self.sound_enabled.setChecked(True)
         system_layout.addWidget(self.sound_enabled)
 
+        db_config = get_database_config_manager().config
+        slow_query_layout = QHBoxLayout()
+        self.slow_query_log = QCheckBox("ثبت کوئری‌های کند دیتابیس")
+        self.slow_query_log.setChecked(db_config.slow_query_log)
+        slow_query_layout.addWidget(self.slow_query_log)
+
+        self.slow_query_threshold = QSpinBox()
+        self.slow_query_threshold.setRange(1, 60000)
+        self.slow_query_threshold.setSuffix(" ms")
+        self.slow_query_threshold.setValue(db_config.slow_query_threshold_ms)
+        slow_query_layout.addWidget(QLabel("بیشتر از:"))
+        slow_query_layout.addWidget(self.slow_query_threshold)
+
+        view_log_btn = QPushButton("📄 مشاهده گزارش")
+        view_log_btn.setCursor(Qt.PointingHandCursor)
+        view_log_btn.clicked.connect(self.show_slow_query_log)
+        slow_query_layout.addWidget(view_log_btn)
+        slow_query_layout.addStretch()
+        system_layout.addLayout(slow_query_layout)
+
+        cache_stats = self.menu_service.get_cache_stats()
+        cache_label = QLabel(
+            f"🧠 کش منو: {cache_stats.hit_ratio:.0%} خواندن‌ها از حافظه "
+            f"({cache_stats.hits} از {cache_stats.hits + cache_stats.loads}، "
+            f"{cache_stats.invalidations} بار بارگذاری مجدد پس از تغییر از بیرون)"
+        )
+        cache_label.setStyleSheet(f"font-size: 12px; color: {self.theme.get('text_secondary')};")
+        system_layout.addWidget(cache_label)
+
+        backup_btn = QPushButton("💾 پشتیبان‌گیری و نگهداری دیتابیس")
+        backup_btn.setCursor(Qt.PointingHandCursor)
+        backup_btn.clicked.connect(self.show_backup_dialog)
+        system_layout.addWidget(backup_btn)
+
         layout.addWidget(system_group)
 
         layout.addStretch()
@@ -851,8 +887,48 @@ class AdvancedSettingsDialog(QDialog):
         customer_name = self.customers_table.item(current_row, 0).text()
         QMessageBox.information(self, "توجه", f"ویرایش مشتری '{customer_name}' در نسخه‌های بعدی اضافه خواهد شد.")
 
+    def show_backup_dialog(self):
+        """Backups and database maintenance history"""
+        from ui.backup_dialog import BackupDialog
+        # The main window is the parent: a restore reloads its menu and order views
+        BackupDialog(self.parent() or self).exec()
+
+    def show_slow_query_log(self):
+        """Show the latest slow-query log entries"""
+        try:
+            log_text = read_slow_query_log()
+        except OSError as e:
+            QMessageBox.warning(self, "خطا", f"❌ خواندن فایل گزارش ممکن نیست: {e}")
+            return
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("🐢 کوئری‌های کند")
+        dialog.resize(900, 600)
+        dialog_layout = QVBoxLayout(dialog)
+
+        log_view = QTextEdit()
+        log_view.setReadOnly(True)
+        log_view.setLineWrapMode(QTextEdit.LineWrapMode.NoWrap)
+        log_view.setLayoutDirection(Qt.LayoutDirection.LeftToRight)
+        log_view.setFont(QFont("Consolas", 10))
+        log_view.setPlainText(log_text or "هنوز کوئری کندی ثبت نشده است.")
+        # Newest entries are at the end of the file
+        log_view.moveCursor(QTextCursor.MoveOperation.End)
+        dialog_layout.addWidget(log_view)
+
+        close_btn = QPushButton("بستن")
+        close_btn.clicked.connect(dialog.accept)
+        dialog_layout.addWidget(close_btn)
+        dialog.exec()
+
     def save_changes(self):
         """Save all changes"""
+        # Applies to both engines right away (the hooks read the shared config)
+        get_database_config_manager().update(
+            slow_query_log=self.slow_query_log.isChecked(),
+            slow_query_threshold_ms=self.slow_query_threshold.value()
+        )
+
         # Update parent window if exists
         if self.parent():
             try:
@@ -2,11 +2,12 @@
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QTableWidget, QTableWidgetItem, QLineEdit, QMessageBox,
-    QProgressBar, QTextEdit, QFileDialog
+    QProgressBar, QTextEdit, QFileDialog, QWidget
 )
 from PySide6.QtCore import QThread, Signal, Qt
-from datetime import datetime
+from datetime import datetime, timezone
 from infrastructure.backup_service import BackupService
+from infrastructure.database.maintenance import recent_runs, run_maintenance
 
 
 class BackupWorker(QThread):
@@ -33,6 +34,21 @@ class BackupWorker(QThread):
                 self.backup_service.restore_backup(**self.kwargs)
                 self.finished.emit("پشتیبان با موفقیت بازیابی شد")
 
+            elif self.operation == "export":
+                self.progress.emit("در حال نوشتن خروجی سفارشات...")
+                count = self.backup_service.export_orders(**self.kwargs)
+                self.finished.emit(f"{count:,} سفارش در فایل زیر ذخیره شد:\n{self.kwargs['path']}")
+
+            elif self.operation == "maintenance":
+                self.progress.emit("در حال نگهداری دیتابیس...")
+                run = run_maintenance("manual")
+                if run.error:
+                    raise RuntimeError(run.error)
+                self.finished.emit(
+                    f"نگهداری دیتابیس انجام شد: {run.duration_ms} ms، "
+                    f"{run.reclaimed_bytes // 1024:,} KB آزاد شد، سلامت: {run.integrity}"
+                )
+
         except Exception as e:
             self.error.emit(str(e))
 
@@ -88,9 +104,34 @@ class BackupDialog(QDialog):
         self.delete_btn.clicked.connect(self.delete_backup)
         buttons_layout.addWidget(self.delete_btn)
 
+        self.export_btn = QPushButton("📤 خروجی سفارشات")
+        self.export_btn.clicked.connect(self.export_orders)
+        buttons_layout.addWidget(self.export_btn)
+
         buttons_layout.addStretch()
         layout.addLayout(buttons_layout)
 
+        # نگهداری دیتابیس (اجرای خودکار در ساعات خلوت)
+        maintenance_layout = QHBoxLayout()
+        maintenance_title = QLabel("🧹 نگهداری دیتابیس")
+        maintenance_title.setStyleSheet("font-weight: bold;")
+        maintenance_layout.addWidget(maintenance_title)
+        maintenance_layout.addStretch()
+
+        self.maintenance_btn = QPushButton("🧹 اجرای نگهداری")
+        self.maintenance_btn.clicked.connect(self.run_maintenance)
+        maintenance_layout.addWidget(self.maintenance_btn)
+        layout.addLayout(maintenance_layout)
+
+        self.maintenance_table = QTableWidget()
+        self.maintenance_table.setColumnCount(5)
+        self.maintenance_table.setHorizontalHeaderLabels(
+            ["زمان", "نوع", "مدت (ms)", "فضای آزاد شده (KB)", "سلامت"]
+        )
+        self.maintenance_table.horizontalHeader().setStretchLastSection(True)
+        self.maintenance_table.setMaximumHeight(150)
+        layout.addWidget(self.maintenance_table)
+
         # نوار پیشرفت
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
@@ -103,6 +144,38 @@ class BackupDialog(QDialog):
         layout.addWidget(self.log_text)
 
         self.load_backups()
+        self.load_maintenance_runs()
+
+    def load_maintenance_runs(self):
+        """بارگذاری تاریخچه نگهداری دیتابیس"""
+        runs = recent_runs()
+        triggers = {"scheduled": "خودکار", "manual": "دستی"}
+
+        self.maintenance_table.setRowCount(len(runs))
+        for row, run in enumerate(runs):
+            started = run.started_at.replace(tzinfo=timezone.utc).astimezone()
+            self.maintenance_table.setItem(row, 0, QTableWidgetItem(started.strftime("%Y-%m-%d %H:%M")))
+            self.maintenance_table.setItem(row, 1, QTableWidgetItem(triggers.get(run.trigger, run.trigger)))
+            self.maintenance_table.setItem(row, 2, QTableWidgetItem(str(run.duration_ms)))
+            self.maintenance_table.setItem(row, 3, QTableWidgetItem(f"{run.reclaimed_bytes // 1024:,}"))
+            health = f"❌ {run.error}" if run.error else (
+                "✅ ok" if run.integrity == "ok" else f"⚠️ {run.integrity}"
+            )
+            self.maintenance_table.setItem(row, 4, QTableWidgetItem(health))
+
+        self.maintenance_table.resizeColumnsToContents()
+
+    def run_maintenance(self):
+        """اجرای دستی نگهداری دیتابیس"""
+        self.maintenance_btn.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 0)
+
+        self.worker = BackupWorker("maintenance")
+        self.worker.progress.connect(self.update_progress)
+        self.worker.finished.connect(self.on_maintenance_finished)
+        self.worker.error.connect(self.on_maintenance_error)
+        self.worker.start()
 
     def load_backups(self):
         """بارگذاری لیست پشتیبان‌ها"""
@@ -180,6 +253,25 @@ class BackupDialog(QDialog):
             self.worker.error.connect(self.on_restore_error)
             self.worker.start()
 
+    def export_orders(self):
+        """خروجی همه سفارشات (زنده و بایگانی شده) برای تحلیل در برنامه‌های دیگر"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "ذخیره خروجی سفارشات", f"orders_{datetime.now().strftime('%Y%m%d')}.ndjson",
+            "NDJSON (*.ndjson);;JSON (*.json)"
+        )
+        if not file_path:
+            return
+
+        self.export_btn.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 0)
+
+        self.worker = BackupWorker("export", path=file_path)
+        self.worker.progress.connect(self.update_progress)
+        self.worker.finished.connect(self.on_export_finished)
+        self.worker.error.connect(self.on_export_error)
+        self.worker.start()
+
     def delete_backup(self):
         """انتخاب پشتیبان برای حذف"""
         selected_rows = set()
@@ -229,6 +321,35 @@ class BackupDialog(QDialog):
         self.log_message(f"خطا: {error_msg}")
         QMessageBox.warning(self, "خطا", f"خطا در ایجاد پشتیبان:\n{error_msg}")
 
+    def on_export_finished(self, message: str):
+        """پایان خروجی سفارشات"""
+        self.progress_bar.setVisible(False)
+        self.export_btn.setEnabled(True)
+        self.log_message(message)
+        QMessageBox.information(self, "موفق", message)
+
+    def on_export_error(self, error_msg: str):
+        """خطا در خروجی سفارشات"""
+        self.progress_bar.setVisible(False)
+        self.export_btn.setEnabled(True)
+        self.log_message(f"خطا: {error_msg}")
+        QMessageBox.warning(self, "خطا", f"خطا در خروجی سفارشات:\n{error_msg}")
+
+    def on_maintenance_finished(self, message: str):
+        """پایان نگهداری دیتابیس"""
+        self.progress_bar.setVisible(False)
+        self.maintenance_btn.setEnabled(True)
+        self.log_message(message)
+        self.load_maintenance_runs()
+
+    def on_maintenance_error(self, error_msg: str):
+        """خطا در نگهداری دیتابیس"""
+        self.progress_bar.setVisible(False)
+        self.maintenance_btn.setEnabled(True)
+        self.log_message(f"خطا: {error_msg}")
+        self.load_maintenance_runs()
+        QMessageBox.warning(self, "خطا", f"خطا در نگهداری دیتابیس:\n{error_msg}")
+
     def on_restore_finished(self, message: str):
         """پایان عملیات بازیابی"""
         self.progress_bar.setVisible(False)
@@ -237,8 +358,9 @@ class BackupDialog(QDialog):
         QMessageBox.information(self, "موفق", message)
 
         # بروزرسانی رابط کاربری
-        self.parent().menu_view.load_menu()
-        self.parent().order_view.refresh_ui()
+        parent = self.parent()
+        if hasattr(parent, 'load_menu_data'):
+            parent.load_menu_data()
 
     def on_restore_error(self, error_msg: str):
         """خطا در بازیابی"""
@@ -12,8 +12,12 @@ from datetime import datetime
 
 from application.order_service import OrderService
 from application.menu_service import MenuService
+from application.product_search import get_product_search
+from application.report_service import ReportService
 from ui.styles import ThemeManager, StyleGenerator, FontManager, ThemePresets
 from ui.server_settings_dialog import ServerSettingsDialog
+from infrastructure.database.change_detector import get_change_detector
+from infrastructure.database.query_stats import log_queries
 
 
 class KitchenDisplayWidget(QWidget):
@@ -26,6 +30,9 @@ class KitchenDisplayWidget(QWidget):
         self.current_orders = {}
         self.last_order_count = 0
         self.new_order_sound = None
+        # Cards are rebuilt only when orders changed (or the minute changed)
+        self.order_watch = get_change_detector().watch(("orders", "order_items"))
+        self.rendered_minute = None
 
         self.setWindowTitle("🍳 نمایش آشپزخانه")
         self.resize(800, 600)
@@ -107,8 +114,16 @@ class KitchenDisplayWidget(QWidget):
 
         layout.addWidget(status_widget)
 
+    @log_queries()
     def update_orders(self):
         """Update orders display"""
+        # Wait times are shown in minutes, so an unchanged minute with no
+        # new writes means there is nothing to redraw
+        minute = datetime.now().strftime("%H:%M")
+        if not self.order_watch.changed() and minute == self.rendered_minute:
+            return
+        self.rendered_minute = minute
+
         while self.orders_layout.count():
             item = self.orders_layout.takeAt(0)
             if item.widget():
@@ -261,6 +276,7 @@ class POSMainWindow(QMainWindow):
         super().__init__()
         self.order_service = OrderService()
         self.menu_service = MenuService()
+        self.report_service = ReportService()
         
         # Initialize theme manager
         self.theme_manager = ThemeManager()
@@ -270,6 +286,9 @@ class POSMainWindow(QMainWindow):
         self.dual_mode = False
         self.kitchen_display = None
         self.current_customer = None
+        self.product_cards = []  # (product_id, card) of every tab, for the search box
+        self.stats_watch = get_change_detector().watch(("orders",))
+        self.stats_day = None
 
         self.setWindowTitle("🍽️ سیستم ثبت سفارش کافه")
         self.resize(1400, 900)
@@ -305,16 +324,17 @@ class POSMainWindow(QMainWindow):
         self.update_time()
         self.update_stats()
     
+    @log_queries()
     def refresh_current_order_from_db(self):
         """Refresh current order from database to sync with web orders"""
         if self.order_service.current_table is None:
             return
         
         try:
-            # Reload order from database
-            self.order_service.set_table(self.order_service.current_table)
-            # Refresh UI
-            self.refresh_cart()
+            # Reload only when the table's order changed (a single counter
+            # read otherwise), so the cart is not rebuilt every tick
+            if self.order_service.refresh_if_changed():
+                self.refresh_cart()
         except Exception as e:
             # Silently fail to avoid interrupting user
             pass
@@ -1055,16 +1075,6 @@ class POSMainWindow(QMainWindow):
 
         parent_layout.addWidget(cart_widget, 1)
 
-    def setup_timers(self):
-        """Setup timers for real-time updates"""
-        self.time_timer = QTimer()
-        self.time_timer.timeout.connect(self.update_time)
-        self.time_timer.start(1000)
-
-        self.stats_timer = QTimer()
-        self.stats_timer.timeout.connect(self.update_stats)
-        self.stats_timer.start(5000)
-
     def setup_shortcuts(self):
         """Setup keyboard shortcuts"""
         from PySide6.QtGui import QShortcut, QKeySequence
@@ -1081,17 +1091,19 @@ class POSMainWindow(QMainWindow):
     def load_menu_data(self):
         """Load menu data and create category tabs"""
         self.category_tabs.clear()
-        categories = self.menu_service.get_categories()
+        self.product_cards = []
+        # One snapshot for every tab, so tabs and products always agree
+        catalog = self.menu_service.get_menu_catalog()
 
         # "همه" tab
-        all_tab = self.create_category_tab("همه")
+        all_tab = self.create_category_tab("همه", catalog)
         self.category_tabs.addTab(all_tab, "🍽️ همه")
 
-        for category in sorted(categories):
-            tab = self.create_category_tab(category)
+        for category in catalog.categories:
+            tab = self.create_category_tab(category, catalog)
             self.category_tabs.addTab(tab, f"📂 {category}")
 
-    def create_category_tab(self, category):
+    def create_category_tab(self, category, catalog=None):
         """Create a category tab with products"""
         tab = QWidget()
         tab_layout = QVBoxLayout(tab)
@@ -1107,16 +1119,15 @@ class POSMainWindow(QMainWindow):
         grid.setSpacing(12)
         grid.setContentsMargins(5, 5, 5, 5)
 
-        if category == "همه":
-            products = self.menu_service.get_active_products()
-        else:
-            products = self.menu_service.get_products_by_category(category)
+        catalog = catalog or self.menu_service.get_menu_catalog()
+        products = catalog.in_category(None if category == "همه" else category)
 
         row, col = 0, 0
         max_cols = 4  # More columns for better use of space
 
         for product in products:
             product_card = self.create_product_card(product)
+            self.product_cards.append((product.id, product_card))
             grid.addWidget(product_card, row, col)
             col += 1
             if col >= max_cols:
@@ -1277,7 +1288,7 @@ class POSMainWindow(QMainWindow):
         """Add product to current order"""
         try:
             product = self.menu_service.get_product_by_id(product_id)
-            self.order_service.add_item(product.name, product.price, 1)
+            self.order_service.add_item(product.name, product.price, 1, product_id=product.id)
             self.refresh_cart()
             self.show_notification("محصول اضافه شد", f"{product.name} به سفارش اضافه شد", "✅")
         except ValueError as e:
@@ -1502,34 +1513,31 @@ class POSMainWindow(QMainWindow):
         """Update the time display"""
         self.time_label.setText(f"📅 {datetime.now().strftime('%Y/%m/%d')} 🕐 {datetime.now().strftime('%H:%M:%S')}")
 
+    @log_queries()
     def update_stats(self):
         """Update daily statistics display"""
+        # Today's figures only move when an order is written or the day rolls over
+        today = datetime.now().date()
+        if not self.stats_watch.changed() and today == self.stats_day:
+            return
+        self.stats_day = today
         try:
-            from application.report_service import ReportService
-            report_service = ReportService()
-            today_stats = report_service.get_daily_sales()
+            today_stats = self.report_service.get_daily_sales()
             self.stats_label.setText(f"📊 {today_stats['orders_count']} سفارش • {today_stats['net_sales'].amount:,} تومان")
         except:
             self.stats_label.setText(f"📊 {len(self.order_service.get_items())} آیتم")
 
     def filter_products(self):
-        """Filter products based on search text"""
-        search_text = self.search_input.text().lower().strip()
-
-        for tab_index in range(self.category_tabs.count()):
-            tab_widget = self.category_tabs.widget(tab_index)
-            if tab_widget:
-                scroll_area = tab_widget.findChild(QScrollArea)
-                if scroll_area and scroll_area.widget():
-                    for child in scroll_area.widget().findChildren(QWidget):
-                        if child.parent() == scroll_area.widget():
-                            labels = child.findChildren(QLabel)
-                            visible = not search_text
-                            for label in labels:
-                                if search_text in label.text().lower():
-                                    visible = True
-                                    break
-                            child.setVisible(visible)
+        """Filter products based on search text (shared Persian-aware index)"""
+        search_text = self.search_input.text()
+        if not search_text.strip():
+            for _, card in self.product_cards:
+                card.setVisible(True)
+            return
+
+        matches = {product.id for product in get_product_search().search(search_text)}
+        for product_id, card in self.product_cards:
+            card.setVisible(product_id in matches)
 
     # ========== Dual Mode ==========
 
@@ -1587,8 +1595,7 @@ class POSMainWindow(QMainWindow):
     def show_recent_orders(self):
         """Show recent orders dialog"""
         try:
-            from application.report_service import ReportService
-            today_report = ReportService().get_daily_sales()
+            today_report = self.report_service.get_daily_sales()
             popular_products = today_report.get('top_products', [])
 
             if popular_products:
@@ -61,8 +61,7 @@ class MenuView(QWidget):
         self.category_combo.clear()
         self.category_combo.addItem("همه")
 
-        categories = self.menu_service.get_categories()
-        for category in sorted(categories):
+        for category in self.menu_service.get_menu_catalog().categories:
             self.category_combo.addItem(category)
 
     def on_category_changed(self, category: str):
@@ -78,11 +77,11 @@ class MenuView(QWidget):
             if child.widget():
                 child.widget().deleteLater()
 
-        # دریافت محصولات
-        if self.current_category == "همه":
-            products = self.menu_service.get_active_products()
-        else:
-            products = self.menu_service.get_products_by_category(self.current_category)
+        # دریافت محصولات از نسخه فعلی منو (بدون کوئری)
+        catalog = self.menu_service.get_menu_catalog()
+        products = catalog.in_category(
+            None if self.current_category == "همه" else self.current_category
+        )
 
         # گروه‌بندی محصولات در ردیف‌های ۲ تایی
         row_layout = None
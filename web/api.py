@@ -1,24 +1,56 @@
 # web/api.py - FastAPI Application and API Routes
 import os
 from datetime import datetime, timedelta
-from typing import List, Optional
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from typing import Dict, List, Optional
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Header, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import select, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 
 from web.auth import (
     Token, UserLogin, UserCreate, UserUpdate, UserResponse,
     authenticate_user, create_access_token, get_current_user, get_current_admin,
     get_password_hash
 )
-from infrastructure.database.session import SessionLocal
+from application.product_search import get_product_search
+from domain.entities.order import Order
+from domain.entities.order_item import OrderItem
+from domain.value_objects.money import Money
+from infrastructure.database.async_session import get_async_read_session, get_async_session
+from infrastructure.database.read_session import ReportTimeoutError
 from infrastructure.database.models.user_model import UserModel
 from infrastructure.database.models.product_model import ProductModel
 from infrastructure.database.models.order_model import OrderModel
 from infrastructure.database.models.order_item_model import OrderItemModel
+from infrastructure.database.models.archive_model import OrderArchiveModel
+from infrastructure.database.order_totals import (
+    set_order_totals, set_order_totals_from_lines, totals_statement
+)
+from infrastructure.database import sales_rollup
+from infrastructure.database.change_tracking import (
+    current_change_seq, orders_removed_since, touch_order
+)
+from infrastructure.database.order_loading import items_loader
+from infrastructure.database.query_stats import track_queries
+from infrastructure.database.write_queue import run_write
+from infrastructure.database.repositories.product_catalog import get_product_catalog
+from infrastructure.database.repositories.order_repository_sqlalchemy import (
+    OrderCursor, OrderFilter, OrderRepositorySQLAlchemy, fetch_order_page
+)
+from infrastructure.database.repositories.product_repository_sqlalchemy import (
+    ProductRepositorySQLAlchemy
+)
+from infrastructure.database.order_item_writer import (
+    insert_order_items, item_row, sync_order_items
+)
 
 
 # Initialize FastAPI app
@@ -35,8 +67,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing", "X-Next-Cursor"],
 )
 
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Report the request's SQL statement count and DB time as Server-Timing"""
+    with track_queries(f"{request.method} {request.url.path}") as stats:
+        response = await call_next(request)
+    response.headers["Server-Timing"] = stats.server_timing()
+    return response
+
+
+@app.exception_handler(ReportTimeoutError)
+async def report_timeout(request: Request, exc: ReportTimeoutError):
+    """A report ran past report_timeout_ms and was cancelled"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "گزارش بیش از حد طول کشید و لغو شد"}
+    )
+
 # Setup templates directory
 TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
@@ -77,10 +128,18 @@ class OrderItemResponse(BaseModel):
     total: int
 
 
+class OrderMergeBase(BaseModel):
+    """The order as the client loaded it, for merging its edit on a conflict"""
+    items: Dict[str, int] = {}  # product name -> quantity
+    discount: int = 0
+    table_number: Optional[int] = None
+
+
 class OrderCreate(BaseModel):
     table_number: Optional[int] = None
     items: List[OrderItemCreate]
     discount: int = 0
+    base: Optional[OrderMergeBase] = None  # PUT only
 
 
 class OrderResponse(BaseModel):
@@ -92,6 +151,16 @@ class OrderResponse(BaseModel):
     items: List[OrderItemResponse]
     subtotal: int
     total: int
+    item_count: int = 0
+    version: int = 1
+    updated_at: Optional[datetime] = None
+
+
+class OrderChangesResponse(BaseModel):
+    cursor: int
+    has_more: bool
+    orders: List[OrderResponse]
+    reset: bool = False  # orders were removed since the cursor: reload the list
 
 
 class OrderStatusUpdate(BaseModel):
@@ -108,13 +177,131 @@ class DashboardStats(BaseModel):
 
 # ============== Helper Functions ==============
 
-def get_db():
-    """Get database session"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Request-scoped AsyncSession; shared with get_current_user within a request
+get_db = get_async_session
+# Read-only snapshot on the reporting engine, for dashboards and reports
+get_read_db = get_async_read_session
+
+
+def item_response(item: OrderItemModel) -> OrderItemResponse:
+    return OrderItemResponse(
+        id=item.id,
+        product_name=item.product_name,
+        unit_price=item.unit_price,
+        quantity=item.quantity,
+        total=item.unit_price * item.quantity
+    )
+
+
+def order_response(order, items: List[OrderItemResponse]) -> OrderResponse:
+    """Totals come from the stored order columns, not from the items"""
+    return OrderResponse(
+        id=order.id,
+        table_number=order.table_number,
+        status=order.status,
+        discount=order.discount,
+        created_at=order.created_at,
+        items=items,
+        subtotal=order.subtotal,
+        total=order.total,
+        item_count=order.item_count,
+        version=order.version,
+        updated_at=order.updated_at
+    )
+
+
+def item_rows_response(item_ids: List[int], rows: List[dict]) -> List[OrderItemResponse]:
+    return [
+        OrderItemResponse(
+            id=item_id,
+            product_name=row["product_name"],
+            unit_price=row["unit_price"],
+            quantity=row["quantity"],
+            total=row["unit_price"] * row["quantity"]
+        )
+        for item_id, row in zip(item_ids, rows)
+    ]
+
+
+def order_etag(order) -> str:
+    return f'"{order.version}"'
+
+
+def check_if_match(order, if_match: Optional[str]) -> None:
+    """
+    Optimistic concurrency: a client that sends the ETag (version) it read
+    gets 409 instead of overwriting changes made since. Without If-Match the
+    write is unconditional, as before.
+    """
+    if not version_matches(order, if_match):
+        raise order_conflict(order)
+
+
+def version_matches(order, if_match: Optional[str]) -> bool:
+    if if_match is None or if_match.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in if_match.split(","))
+    versions = {(tag[2:] if tag.startswith("W/") else tag).strip('"') for tag in tags}
+    return str(order.version) in versions
+
+
+ORDER_CONFLICT_DETAIL = "این سفارش در این فاصله توسط کاربر دیگری تغییر کرده است"
+
+
+def order_conflict(order) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=ORDER_CONFLICT_DETAIL,
+        headers={"ETag": order_etag(order)}
+    )
+
+
+def order_edit_conflict(session: Session, order: OrderModel, order_data: OrderCreate) -> HTTPException:
+    """
+    409 for a PUT based on an older version. With `base` the detail also
+    carries `merged`: the edit applied to the current order by
+    Order.merge_remote, the merge the desktop cart uses, ready to be sent
+    again with the new ETag.
+    """
+    base = order_data.base
+    if base is None or order.status != "open":
+        return order_conflict(order)
+
+    local = Order(base.table_number)
+    for name, quantity in base.items.items():
+        local.items.append(OrderItem(name, 0, quantity))
+    local.discount = Money(base.discount)
+    local.mark_persisted(order.id, None)
+    rows = order_item_rows(order.id, order_data.items, validated_products(session, order_data.items))
+    local.items = [OrderItem(row["product_name"], row["unit_price"], row["quantity"], row["product_id"])
+                   for row in rows]
+    local.discount = Money(order_data.discount)
+    current = OrderRepositorySQLAlchemy(session).get_by_id(order.id)
+    local.merge_remote(current)
+
+    # The table is not part of the domain merge: the edit wins only if it moved it
+    table_number = (order.table_number if order_data.table_number == base.table_number
+                    else order_data.table_number)
+    merged = OrderCreate(
+        table_number=table_number,
+        discount=local.discount.amount,
+        items=[OrderItemCreate(product_id=item.product_id, product_name=item.name,
+                               unit_price=item.unit_price.amount, quantity=item.quantity)
+               for item in local.items],
+        base=OrderMergeBase(items={item.name: item.quantity for item in current.items},
+                            discount=current.discount.amount, table_number=order.table_number)
+    )
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={"message": ORDER_CONFLICT_DETAIL, "version": order.version,
+                "merged": jsonable_encoder(merged)},
+        headers={"ETag": order_etag(order)}
+    )
+
+
+def order_with_items_response(order) -> OrderResponse:
+    """Response of an order loaded with items_loader()"""
+    return order_response(order, [item_response(item) for item in order.items])
 
 
 # ============== Web Routes (HTML) ==============
@@ -158,9 +345,9 @@ async def admin_page(request: Request):
 # ============== API Routes ==============
 
 @app.post("/api/auth/login", response_model=Token)
-async def login(user_data: UserLogin):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
     """Login and get access token"""
-    user = authenticate_user(user_data.username, user_data.password)
+    user = await authenticate_user(db, user_data.username, user_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -169,14 +356,9 @@ async def login(user_data: UserLogin):
         )
     
     # Update last login
-    session = SessionLocal()
-    try:
-        db_user = session.query(UserModel).filter_by(id=user.id).first()
-        if db_user:
-            db_user.last_login = datetime.utcnow()
-            session.commit()
-    finally:
-        session.close()
+    await run_write(lambda session: session.execute(
+        update(UserModel).where(UserModel.id == user.id).values(last_login=datetime.utcnow())
+    ))
     
     access_token = create_access_token(
         data={"sub": user.username, "role": user.role}
@@ -211,89 +393,211 @@ async def get_me(current_user: UserModel = Depends(get_current_user)):
 # ============== Products API ==============
 
 @app.get("/api/products", response_model=List[ProductResponse])
-async def get_products(current_user: UserModel = Depends(get_current_user)):
-    """Get all active products"""
-    session = SessionLocal()
-    try:
-        products = session.query(ProductModel).filter_by(is_active=True).all()
-        return [
-            ProductResponse(
-                id=p.id,
-                name=p.name,
-                price=p.price,
-                category=p.category,
-                is_active=p.is_active
-            )
-            for p in products
-        ]
-    finally:
-        session.close()
+async def get_products(
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get all active products (served from the product catalog cache)"""
+    products = await db.run_sync(
+        lambda session: ProductRepositorySQLAlchemy(session).get_all_active()
+    )
+    return [
+        ProductResponse(
+            id=p.id,
+            name=p.name,
+            price=p.price,
+            category=p.category,
+            is_active=p.is_active
+        )
+        for p in products
+    ]
 
 
 @app.get("/api/products/categories")
-async def get_categories(current_user: UserModel = Depends(get_current_user)):
+async def get_categories(
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
     """Get all product categories"""
-    session = SessionLocal()
-    try:
-        products = session.query(ProductModel).filter_by(is_active=True).all()
-        categories = list(set(p.category for p in products))
-        return {"categories": sorted(categories)}
-    finally:
-        session.close()
+    categories = await db.run_sync(
+        lambda session: ProductRepositorySQLAlchemy(session).get_categories()
+    )
+    return {"categories": categories}
+
+
+@app.get("/api/products/search", response_model=List[ProductResponse])
+async def search_products(
+    q: str,
+    limit: int = 20,
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Search active products by name or category, best matches first"""
+    products = await db.run_sync(
+        lambda session: get_product_search().search(q, max(1, min(limit, 100)), session)
+    )
+    return [
+        ProductResponse(
+            id=p.id,
+            name=p.name,
+            price=p.price,
+            category=p.category,
+            is_active=p.is_active
+        )
+        for p in products
+    ]
 
 
 # ============== Orders API ==============
 
 @app.get("/api/orders", response_model=List[OrderResponse])
 async def get_orders(
+    response: Response,
     status_filter: Optional[str] = None,
     limit: int = 50,
-    current_user: UserModel = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    table_number: Optional[int] = None,
+    min_total: Optional[int] = None,
+    max_total: Optional[int] = None,
+    product_id: Optional[int] = None,
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get orders (all for admin, today's for others)"""
-    session = SessionLocal()
-    try:
-        query = session.query(OrderModel)
-        
-        # Non-admin users see only today's orders
-        if current_user.role != "admin":
-            today = datetime.utcnow().date()
-            query = query.filter(OrderModel.created_at >= today)
-        
-        if status_filter:
-            query = query.filter(OrderModel.status == status_filter)
-        
-        orders = query.order_by(OrderModel.created_at.desc()).limit(limit).all()
-        
-        result = []
-        for order in orders:
-            items = session.query(OrderItemModel).filter_by(order_id=order.id).all()
-            order_items = [
-                OrderItemResponse(
-                    id=item.id,
-                    product_name=item.product_name,
-                    unit_price=item.unit_price,
-                    quantity=item.quantity,
-                    total=item.unit_price * item.quantity
+    """
+    Orders, newest first (all for admin, today's for others).
+
+    Pages are keyset-paginated: when more orders follow, the response has
+    an `X-Next-Cursor` header; pass it back as `cursor` with the same
+    filters for the next page. `created_to` is exclusive.
+    """
+    after = None
+    if cursor:
+        try:
+            after = OrderCursor.decode(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="cursor نامعتبر است"
+            )
+    
+    # Non-admin users see only today's orders
+    if current_user.role != "admin":
+        today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        created_from = max(created_from, today) if created_from else today
+    
+    order_filter = OrderFilter(
+        status=status_filter or None,
+        table_number=table_number,
+        created_from=created_from,
+        created_to=created_to,
+        newest_first=True,
+        limit=max(1, min(limit, 200)),
+        min_total=min_total,
+        max_total=max_total,
+        product_id=product_id,
+    )
+    # Admin history continues into the archive once the live orders run out
+    page = await db.run_sync(
+        lambda session: fetch_order_page(session, order_filter, after,
+                                         include_archive=current_user.role == "admin")
+    )
+    if page.next_cursor is not None:
+        response.headers["X-Next-Cursor"] = page.next_cursor.encode()
+    return [order_with_items_response(order) for order in page.orders]
+
+
+@app.get("/api/orders/changes", response_model=OrderChangesResponse)
+async def get_order_changes(
+    since: Optional[int] = None,
+    limit: int = 100,
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Orders changed after the `since` cursor, oldest change first.
+
+    Without `since` only the current cursor is returned. Clients keep the
+    returned cursor and pass it back; when nothing changed the answer is an
+    empty list, and `has_more` asks them to call again with the new cursor.
+    Archived or restored-over orders are gone from `orders` and never show
+    up as changes: then `reset` is set and the client reloads its list.
+    """
+    cursor = await db.run_sync(current_change_seq)
+    if since is None or since >= cursor:
+        return OrderChangesResponse(cursor=cursor, has_more=False, orders=[])
+    if await db.run_sync(lambda session: orders_removed_since(session, since)):
+        return OrderChangesResponse(cursor=cursor, has_more=False, orders=[], reset=True)
+    
+    # Changes committed after the counter was read are left for the next call
+    query = select(OrderModel).options(items_loader()).filter(
+        OrderModel.change_seq > since,
+        OrderModel.change_seq <= cursor
+    )
+    if current_user.role != "admin":
+        today = datetime.utcnow().date()
+        query = query.filter(OrderModel.created_at >= today)
+    
+    orders = (await db.execute(
+        query.order_by(OrderModel.change_seq).limit(limit + 1)
+    )).unique().scalars().all()
+    has_more = len(orders) > limit
+    if has_more:
+        orders = orders[:limit]
+        cursor = orders[-1].change_seq if orders else since
+    
+    return OrderChangesResponse(
+        cursor=cursor,
+        has_more=has_more,
+        orders=[order_with_items_response(order) for order in orders]
+    )
+
+
+def validated_products(session: Session, items: List[OrderItemCreate]) -> dict:
+    """Active products of the regular items by id; rejects unknown products
+    and custom items without name or price"""
+    product_ids = [item.product_id for item in items if item.product_id is not None]
+    products = {}
+    if product_ids:
+        products = {
+            p.id: p
+            for p in session.execute(select(ProductModel).filter(
+                ProductModel.id.in_(product_ids),
+                ProductModel.is_active == True
+            )).scalars()
+        }
+    
+    for item in items:
+        if item.product_id is not None and item.product_id not in products:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"محصول با شناسه {item.product_id} یافت نشد"
+            )
+        # Custom items need a name and a price
+        if item.product_id is None:
+            if not item.product_name or item.unit_price is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="آیتم سفارشی باید نام و قیمت داشته باشد"
                 )
-                for item in items
-            ]
-            subtotal = sum(item.total for item in order_items)
-            
-            result.append(OrderResponse(
-                id=order.id,
-                table_number=order.table_number,
-                status=order.status,
-                discount=order.discount,
-                created_at=order.created_at,
-                items=order_items,
-                subtotal=subtotal,
-                total=max(0, subtotal - order.discount)
-            ))
-        
-        return result
-    finally:
-        session.close()
+    return products
+
+
+def order_item_rows(order_id: int, items: List[OrderItemCreate], products: dict) -> List[dict]:
+    rows = []
+    for item in items:
+        if item.product_id is not None:
+            # Regular product
+            product = products[item.product_id]
+            name = product.name
+            price = product.price
+        else:
+            # Custom item
+            name = item.product_name
+            price = item.unit_price
+        rows.append(item_row(order_id, name, price, item.quantity, item.product_id))
+    return rows
 
 
 @app.post("/api/orders", response_model=OrderResponse)
@@ -302,34 +606,8 @@ async def create_order(
     current_user: UserModel = Depends(get_current_user)
 ):
     """Create a new order (supports regular products and custom items)"""
-    session = SessionLocal()
-    try:
-        # Get products for regular items
-        product_ids = [item.product_id for item in order_data.items if item.product_id is not None]
-        products = {}
-        if product_ids:
-            products = {
-                p.id: p 
-                for p in session.query(ProductModel).filter(
-                    ProductModel.id.in_(product_ids),
-                    ProductModel.is_active == True
-                ).all()
-            }
-        
-        # Validate regular products exist
-        for item in order_data.items:
-            if item.product_id is not None and item.product_id not in products:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"محصول با شناسه {item.product_id} یافت نشد"
-                )
-            # Validate custom items have name and price
-            if item.product_id is None:
-                if not item.product_name or item.unit_price is None:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="آیتم سفارشی باید نام و قیمت داشته باشد"
-                    )
+    def create(session: Session) -> OrderResponse:
+        products = validated_products(session, order_data.items)
         
         # Create order
         order = OrderModel(
@@ -339,69 +617,38 @@ async def create_order(
             created_at=datetime.utcnow()
         )
         session.add(order)
+        touch_order(session, order)  # version 1 and its change_seq
         session.flush()  # Get order ID
         
-        # Create order items
-        order_items = []
-        for item in order_data.items:
-            if item.product_id is not None:
-                # Regular product
-                product = products[item.product_id]
-                name = product.name
-                price = product.price
-            else:
-                # Custom item
-                name = item.product_name
-                price = item.unit_price
-            
-            order_item = OrderItemModel(
-                order_id=order.id,
-                product_name=name,
-                unit_price=price,
-                quantity=item.quantity
-            )
-            session.add(order_item)
-            order_items.append(OrderItemResponse(
-                id=0,
-                product_name=name,
-                unit_price=price,
-                quantity=item.quantity,
-                total=price * item.quantity
-            ))
-        
-        session.commit()
-        
-        subtotal = sum(item.total for item in order_items)
-        
-        return OrderResponse(
-            id=order.id,
-            table_number=order.table_number,
-            status=order.status,
-            discount=order.discount,
-            created_at=order.created_at,
-            items=order_items,
-            subtotal=subtotal,
-            total=max(0, subtotal - order.discount)
+        # Create order items (one INSERT ... RETURNING)
+        rows = order_item_rows(order.id, order_data.items, products)
+        order_items = item_rows_response(insert_order_items(session, rows), rows)
+        set_order_totals_from_lines(
+            order, [(item.unit_price, item.quantity) for item in order_items]
         )
+        return order_response(order, order_items)
+    
+    try:
+        return await run_write(create)
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"خطا در ایجاد سفارش: {str(e)}"
         )
-    finally:
-        session.close()
 
 
 @app.patch("/api/orders/{order_id}/status")
 async def update_order_status(
     order_id: int,
     status_data: OrderStatusUpdate,
-    current_user: UserModel = Depends(get_current_user)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Update order status"""
+    """Update order status (If-Match: the order's ETag, optional)"""
     valid_statuses = ["open", "closed", "cancelled"]
     if status_data.status not in valid_statuses:
         raise HTTPException(
@@ -409,75 +656,72 @@ async def update_order_status(
             detail=f"وضعیت نامعتبر. وضعیت‌های مجاز: {', '.join(valid_statuses)}"
         )
     
-    session = SessionLocal()
-    try:
-        order = session.query(OrderModel).filter_by(id=order_id).first()
+    def change_status(session: Session) -> OrderModel:
+        order = session.get(OrderModel, order_id)
         if not order:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="سفارش یافت نشد"
             )
         
-        order.status = status_data.status
-        session.commit()
+        check_if_match(order, if_match)
         
-        return {"message": "وضعیت سفارش به‌روزرسانی شد", "status": status_data.status}
-    finally:
-        session.close()
+        old_status = order.status
+        order.status = status_data.status
+        touch_order(session, order)
+        # Closing or cancelling updates the daily sales rollup in the same transaction
+        sales_rollup.on_status_change(session, order, old_status)
+        return order
+    
+    try:
+        order = await run_write(change_status)
+    except StaleDataError:
+        raise order_conflict(await db.get(OrderModel, order_id, populate_existing=True))
+    
+    response.headers["ETag"] = order_etag(order)
+    return {"message": "وضعیت سفارش به‌روزرسانی شد", "status": status_data.status,
+            "version": order.version}
 
 
 @app.get("/api/orders/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: int,
-    current_user: UserModel = Depends(get_current_user)
+    response: Response,
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get a specific order"""
-    session = SessionLocal()
-    try:
-        order = session.query(OrderModel).filter_by(id=order_id).first()
-        if not order:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="سفارش یافت نشد"
-            )
-        
-        items = session.query(OrderItemModel).filter_by(order_id=order.id).all()
-        order_items = [
-            OrderItemResponse(
-                id=item.id,
-                product_name=item.product_name,
-                unit_price=item.unit_price,
-                quantity=item.quantity,
-                total=item.unit_price * item.quantity
-            )
-            for item in items
-        ]
-        subtotal = sum(item.total for item in order_items)
-        
-        return OrderResponse(
-            id=order.id,
-            table_number=order.table_number,
-            status=order.status,
-            discount=order.discount,
-            created_at=order.created_at,
-            items=order_items,
-            subtotal=subtotal,
-            total=max(0, subtotal - order.discount)
+    """Get a specific order (live or archived)"""
+    order = await db.get(OrderModel, order_id, options=[items_loader()])
+    if not order:
+        order = await db.get(OrderArchiveModel, order_id,
+                             options=[items_loader(OrderArchiveModel)])
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="سفارش یافت نشد"
         )
-    finally:
-        session.close()
+    
+    response.headers["ETag"] = order_etag(order)
+    return order_with_items_response(order)
 
 
 @app.put("/api/orders/{order_id}", response_model=OrderResponse)
 async def update_order(
     order_id: int,
     order_data: OrderCreate,
-    current_user: UserModel = Depends(get_current_user)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Update an existing order (supports regular products and custom items)"""
-    session = SessionLocal()
-    try:
-        order = session.query(OrderModel).filter_by(id=order_id).first()
+    """
+    Update an existing order (supports regular products and custom items).
+    Send the ETag from GET as If-Match to get 409 instead of overwriting
+    changes made elsewhere in the meantime; with `base` as well, the 409
+    carries the edit merged onto the current order.
+    """
+    def edit(session: Session) -> OrderResponse:
+        order = session.get(OrderModel, order_id)
         if not order:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -489,238 +733,223 @@ async def update_order(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="فقط سفارشات باز قابل ویرایش هستند"
             )
+        if not version_matches(order, if_match):
+            raise order_edit_conflict(session, order, order_data)
         
-        # Get products for regular items
-        product_ids = [item.product_id for item in order_data.items if item.product_id is not None]
-        products = {}
-        if product_ids:
-            products = {
-                p.id: p 
-                for p in session.query(ProductModel).filter(
-                    ProductModel.id.in_(product_ids),
-                    ProductModel.is_active == True
-                ).all()
-            }
-        
-        # Validate items
-        for item in order_data.items:
-            if item.product_id is not None and item.product_id not in products:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"محصول با شناسه {item.product_id} یافت نشد"
-                )
-            if item.product_id is None:
-                if not item.product_name or item.unit_price is None:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="آیتم سفارشی باید نام و قیمت داشته باشد"
-                    )
+        products = validated_products(session, order_data.items)
         
         # Update order fields
         order.table_number = order_data.table_number
         order.discount = order_data.discount
         
-        # Delete existing items
-        session.query(OrderItemModel).filter_by(order_id=order.id).delete()
-        
-        # Create new items
-        order_items = []
-        for item in order_data.items:
-            if item.product_id is not None:
-                product = products[item.product_id]
-                name = product.name
-                price = product.price
-            else:
-                name = item.product_name
-                price = item.unit_price
-            
-            order_item = OrderItemModel(
-                order_id=order.id,
-                product_name=name,
-                unit_price=price,
-                quantity=item.quantity
-            )
-            session.add(order_item)
-            order_items.append(OrderItemResponse(
-                id=0,
-                product_name=name,
-                unit_price=price,
-                quantity=item.quantity,
-                total=price * item.quantity
-            ))
-        
-        session.commit()
-        
-        subtotal = sum(item.total for item in order_items)
-        
-        return OrderResponse(
-            id=order.id,
-            table_number=order.table_number,
-            status=order.status,
-            discount=order.discount,
-            created_at=order.created_at,
-            items=order_items,
-            subtotal=subtotal,
-            total=max(0, subtotal - order.discount)
+        # Wanted items; only the difference to the stored rows is written
+        rows = order_item_rows(order.id, order_data.items, products)
+        order_items = item_rows_response(sync_order_items(session, order.id, rows), rows)
+        set_order_totals_from_lines(
+            order, [(item.unit_price, item.quantity) for item in order_items]
         )
+        touch_order(session, order)
+        return order_response(order, order_items)
+    
+    try:
+        result = await run_write(edit)
     except HTTPException:
         raise
+    except StaleDataError:
+        # Another writer committed between our read and our write
+        def conflict(session: Session) -> HTTPException:
+            order = session.get(OrderModel, order_id, populate_existing=True)
+            return order_edit_conflict(session, order, order_data)
+        raise await db.run_sync(conflict)
     except Exception as e:
-        session.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"خطا در ویرایش سفارش: {str(e)}"
         )
-    finally:
-        session.close()
+    
+    response.headers["ETag"] = order_etag(result)
+    return result
 
 
-@app.post("/api/orders/{order_id}/items")
-async def add_item_to_order(
-    order_id: int,
-    item_data: OrderItemCreate,
-    current_user: UserModel = Depends(get_current_user)
-):
-    """Add a single item to an existing order"""
-    session = SessionLocal()
-    try:
-        order = session.query(OrderModel).filter_by(id=order_id).first()
-        if not order:
+def add_order_item(session: Session, order_id: int, item_data: OrderItemCreate):
+    """Write unit of POST /api/orders/{order_id}/items: (order, item name)"""
+    order = session.get(OrderModel, order_id)
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="سفارش یافت نشد"
+        )
+    
+    if order.status != "open":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="فقط به سفارشات باز می‌توان آیتم اضافه کرد"
+        )
+    
+    # Get product info or use custom item data
+    if item_data.product_id is not None:
+        product = session.execute(select(ProductModel).filter_by(
+            id=item_data.product_id, 
+            is_active=True
+        )).scalars().first()
+        if not product:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="سفارش یافت نشد"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="محصول یافت نشد"
             )
-        
-        if order.status != "open":
+        name = product.name
+        price = product.price
+    else:
+        # Custom item
+        if not item_data.product_name or item_data.unit_price is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="فقط به سفارشات باز می‌توان آیتم اضافه کرد"
+                detail="آیتم سفارشی باید نام و قیمت داشته باشد"
             )
-        
-        # Get product info or use custom item data
-        if item_data.product_id is not None:
-            product = session.query(ProductModel).filter_by(
-                id=item_data.product_id, 
-                is_active=True
-            ).first()
-            if not product:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="محصول یافت نشد"
-                )
-            name = product.name
-            price = product.price
-        else:
-            # Custom item
-            if not item_data.product_name or item_data.unit_price is None:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="آیتم سفارشی باید نام و قیمت داشته باشد"
-                )
-            name = item_data.product_name
-            price = item_data.unit_price
-        
-        # Check if item already exists in order
-        existing_item = session.query(OrderItemModel).filter_by(
+        name = item_data.product_name
+        price = item_data.unit_price
+    
+    # Check if item already exists in order
+    existing_item = session.execute(select(OrderItemModel).filter_by(
+        order_id=order.id,
+        product_id=item_data.product_id,
+        product_name=name,
+        unit_price=price
+    )).scalars().first()
+    
+    if existing_item:
+        # Update quantity in SQL, on top of whatever the row holds now
+        session.execute(
+            update(OrderItemModel)
+            .where(OrderItemModel.id == existing_item.id)
+            .values(quantity=OrderItemModel.quantity + item_data.quantity)
+        )
+    else:
+        # Add new item
+        session.add(OrderItemModel(
             order_id=order.id,
+            product_id=item_data.product_id,
             product_name=name,
-            unit_price=price
-        ).first()
-        
-        if existing_item:
-            # Update quantity
-            existing_item.quantity += item_data.quantity
-        else:
-            # Add new item
-            new_item = OrderItemModel(
-                order_id=order.id,
-                product_name=name,
-                unit_price=price,
-                quantity=item_data.quantity
+            unit_price=price,
+            quantity=item_data.quantity
+        ))
+    
+    session.flush()
+    subtotal, item_count = session.execute(totals_statement(order.id)).one()
+    set_order_totals(order, subtotal, item_count)
+    touch_order(session, order)
+    return order, name
+
+
+@app.post("/api/orders/{order_id}/items")
+async def add_item_to_order(
+    order_id: int,
+    item_data: OrderItemCreate,
+    response: Response,
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Add a single item to an existing order. Additions merge with whatever
+    the order holds at write time, so this route takes no If-Match: the
+    write unit reads and updates the order under the write lock. If a
+    writer outside this process commits in between, the addition is
+    applied again on top of the new state.
+    """
+    for attempt in range(2):
+        try:
+            order, name = await run_write(lambda session: add_order_item(session, order_id, item_data))
+            break
+        except HTTPException:
+            raise
+        except StaleDataError:
+            if attempt == 1:
+                raise order_conflict(await db.get(OrderModel, order_id, populate_existing=True))
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"خطا در افزودن آیتم: {str(e)}"
             )
-            session.add(new_item)
-        
-        session.commit()
-        
-        return {"message": f"{name} به سفارش اضافه شد", "quantity": item_data.quantity}
-    except HTTPException:
-        raise
-    except Exception as e:
-        session.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"خطا در افزودن آیتم: {str(e)}"
-        )
-    finally:
-        session.close()
+    
+    response.headers["ETag"] = order_etag(order)
+    return {"message": f"{name} به سفارش اضافه شد", "quantity": item_data.quantity,
+            "version": order.version}
 
 
 # ============== Dashboard API ==============
 
 @app.get("/api/dashboard/stats", response_model=DashboardStats)
-async def get_dashboard_stats(current_user: UserModel = Depends(get_current_user)):
+async def get_dashboard_stats(
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
     """Get dashboard statistics"""
-    session = SessionLocal()
-    try:
-        today = datetime.utcnow().date()
-        
-        # Today's orders
-        today_orders = session.query(OrderModel).filter(
-            OrderModel.created_at >= today
-        ).all()
-        
-        # Calculate revenue
-        total_revenue = 0
-        for order in today_orders:
-            if order.status != "cancelled":
-                items = session.query(OrderItemModel).filter_by(order_id=order.id).all()
-                subtotal = sum(item.unit_price * item.quantity for item in items)
-                total_revenue += max(0, subtotal - order.discount)
-        
-        # Pending orders (open orders)
-        pending_orders = session.query(OrderModel).filter_by(status="open").count()
-        
-        # Active products
-        total_products = session.query(ProductModel).filter_by(is_active=True).count()
-        
-        # Total users (admin only)
-        total_users = 0
-        if current_user.role == "admin":
-            total_users = session.query(UserModel).count()
-        
-        return DashboardStats(
-            total_orders_today=len(today_orders),
-            total_revenue_today=total_revenue,
-            pending_orders=pending_orders,
-            total_products=total_products,
-            total_users=total_users
-        )
-    finally:
-        session.close()
+    today = datetime.utcnow().date()
+    
+    # Today's orders and revenue, from the stored order totals
+    orders_today, total_revenue = (await db.execute(
+        select(
+            func.count(OrderModel.id),
+            func.coalesce(func.sum(OrderModel.total).filter(OrderModel.status != "cancelled"), 0)
+        ).filter(OrderModel.created_at >= today)
+    )).one()
+    
+    # Pending orders (open orders)
+    pending_orders = (await db.execute(
+        select(func.count(OrderModel.id)).filter_by(status="open")
+    )).scalar()
+    
+    # Active products
+    total_products = (await db.execute(
+        select(func.count(ProductModel.id)).filter_by(is_active=True)
+    )).scalar()
+    
+    # Total users (admin only)
+    total_users = 0
+    if current_user.role == "admin":
+        total_users = (await db.execute(select(func.count(UserModel.id)))).scalar()
+    
+    return DashboardStats(
+        total_orders_today=orders_today,
+        total_revenue_today=total_revenue,
+        pending_orders=pending_orders,
+        total_products=total_products,
+        total_users=total_users
+    )
 
 
 # ============== Admin API ==============
 
+def user_response(user: UserModel) -> UserResponse:
+    return UserResponse(
+        id=user.id,
+        username=user.username,
+        full_name=user.full_name,
+        role=user.role,
+        is_active=user.is_active,
+        created_at=user.created_at,
+        last_login=user.last_login
+    )
+
+
+def get_user_or_404(session: Session, user_id: int) -> UserModel:
+    user = session.get(UserModel, user_id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="کاربر یافت نشد"
+        )
+    return user
+
+
 @app.get("/api/admin/users", response_model=List[UserResponse])
-async def get_all_users(current_user: UserModel = Depends(get_current_admin)):
+async def get_all_users(
+    current_user: UserModel = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
     """Get all users (admin only)"""
-    session = SessionLocal()
-    try:
-        users = session.query(UserModel).all()
-        return [
-            UserResponse(
-                id=u.id,
-                username=u.username,
-                full_name=u.full_name,
-                role=u.role,
-                is_active=u.is_active,
-                created_at=u.created_at,
-                last_login=u.last_login
-            )
-            for u in users
-        ]
-    finally:
-        session.close()
+    users = (await db.execute(select(UserModel))).scalars().all()
+    return [user_response(u) for u in users]
 
 
 @app.post("/api/admin/users", response_model=UserResponse)
@@ -729,61 +958,53 @@ async def create_user(
     current_user: UserModel = Depends(get_current_admin)
 ):
     """Create a new user (admin only)"""
-    session = SessionLocal()
-    try:
+    # Validate
+    if len(user_data.username) < 3:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="نام کاربری باید حداقل ۳ کاراکتر باشد"
+        )
+    if len(user_data.password) < 4:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="رمز عبور باید حداقل ۴ کاراکتر باشد"
+        )
+    
+    # bcrypt is slow; hash before queueing so the writer never waits for it
+    password_hash = await run_in_threadpool(get_password_hash, user_data.password)
+    
+    def create(session: Session) -> UserResponse:
         # Check if username exists
-        existing = session.query(UserModel).filter_by(username=user_data.username).first()
+        existing = session.execute(
+            select(UserModel).filter_by(username=user_data.username)
+        ).scalars().first()
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="این نام کاربری قبلاً استفاده شده است"
             )
         
-        # Validate
-        if len(user_data.username) < 3:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="نام کاربری باید حداقل ۳ کاراکتر باشد"
-            )
-        if len(user_data.password) < 4:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="رمز عبور باید حداقل ۴ کاراکتر باشد"
-            )
-        
-        # Create user with bcrypt hash
         user = UserModel(
             username=user_data.username,
-            password_hash=get_password_hash(user_data.password),
+            password_hash=password_hash,
             full_name=user_data.full_name,
             role=user_data.role,
             is_active=True,
             created_at=datetime.utcnow()
         )
-        
         session.add(user)
-        session.commit()
-        session.refresh(user)
-        
-        return UserResponse(
-            id=user.id,
-            username=user.username,
-            full_name=user.full_name,
-            role=user.role,
-            is_active=user.is_active,
-            created_at=user.created_at,
-            last_login=user.last_login
-        )
+        session.flush()
+        return user_response(user)
+    
+    try:
+        return await run_write(create)
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"خطا در ایجاد کاربر: {str(e)}"
         )
-    finally:
-        session.close()
 
 
 @app.put("/api/admin/users/{user_id}", response_model=UserResponse)
@@ -793,20 +1014,19 @@ async def update_user(
     current_user: UserModel = Depends(get_current_admin)
 ):
     """Update a user (admin only)"""
-    session = SessionLocal()
-    try:
-        user = session.query(UserModel).filter_by(id=user_id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="کاربر یافت نشد"
-            )
+    # Update password only if provided
+    password_hash = None
+    if user_data.password:
+        password_hash = await run_in_threadpool(get_password_hash, user_data.password)
+    
+    def edit(session: Session) -> UserResponse:
+        user = get_user_or_404(session, user_id)
         
         # Check username uniqueness
-        existing = session.query(UserModel).filter(
+        existing = session.execute(select(UserModel).filter(
             UserModel.username == user_data.username,
             UserModel.id != user_id
-        ).first()
+        )).scalars().first()
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -816,33 +1036,29 @@ async def update_user(
         user.username = user_data.username
         user.full_name = user_data.full_name
         user.role = user_data.role
-        
-        # Update password only if provided
-        if user_data.password:
-            user.password_hash = get_password_hash(user_data.password)
-        
-        session.commit()
-        session.refresh(user)
-        
-        return UserResponse(
-            id=user.id,
-            username=user.username,
-            full_name=user.full_name,
-            role=user.role,
-            is_active=user.is_active,
-            created_at=user.created_at,
-            last_login=user.last_login
-        )
+        if password_hash:
+            user.password_hash = password_hash
+        session.flush()
+        return user_response(user)
+    
+    try:
+        return await run_write(edit)
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"خطا در ویرایش کاربر: {str(e)}"
         )
-    finally:
-        session.close()
+
+
+async def set_user_active(user_id: int, active: Optional[bool]) -> bool:
+    """Set (or with None, toggle) is_active as one write unit; the new value"""
+    def change(session: Session) -> bool:
+        user = get_user_or_404(session, user_id)
+        user.is_active = (not user.is_active) if active is None else active
+        return user.is_active
+    return await run_write(change)
 
 
 @app.patch("/api/admin/users/{user_id}/activate")
@@ -851,21 +1067,8 @@ async def activate_user(
     current_user: UserModel = Depends(get_current_admin)
 ):
     """Activate a user (admin only)"""
-    session = SessionLocal()
-    try:
-        user = session.query(UserModel).filter_by(id=user_id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="کاربر یافت نشد"
-            )
-        
-        user.is_active = True
-        session.commit()
-        
-        return {"message": "کاربر فعال شد", "is_active": True}
-    finally:
-        session.close()
+    await set_user_active(user_id, True)
+    return {"message": "کاربر فعال شد", "is_active": True}
 
 
 @app.patch("/api/admin/users/{user_id}/deactivate")
@@ -880,21 +1083,8 @@ async def deactivate_user(
             detail="نمی‌توانید حساب خودتان را غیرفعال کنید"
         )
     
-    session = SessionLocal()
-    try:
-        user = session.query(UserModel).filter_by(id=user_id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="کاربر یافت نشد"
-            )
-        
-        user.is_active = False
-        session.commit()
-        
-        return {"message": "کاربر غیرفعال شد", "is_active": False}
-    finally:
-        session.close()
+    await set_user_active(user_id, False)
+    return {"message": "کاربر غیرفعال شد", "is_active": False}
 
 
 @app.patch("/api/admin/users/{user_id}/toggle-active")
@@ -909,22 +1099,9 @@ async def toggle_user_active(
             detail="نمی‌توانید حساب خودتان را غیرفعال کنید"
         )
     
-    session = SessionLocal()
-    try:
-        user = session.query(UserModel).filter_by(id=user_id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="کاربر یافت نشد"
-            )
-        
-        user.is_active = not user.is_active
-        session.commit()
-        
-        status_text = "فعال" if user.is_active else "غیرفعال"
-        return {"message": f"کاربر {status_text} شد", "is_active": user.is_active}
-    finally:
-        session.close()
+    is_active = await set_user_active(user_id, None)
+    status_text = "فعال" if is_active else "غیرفعال"
+    return {"message": f"کاربر {status_text} شد", "is_active": is_active}
 
 
 @app.delete("/api/admin/users/{user_id}")
@@ -939,21 +1116,23 @@ async def delete_user(
             detail="نمی‌توانید حساب خودتان را حذف کنید"
         )
     
-    session = SessionLocal()
-    try:
-        user = session.query(UserModel).filter_by(id=user_id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="کاربر یافت نشد"
-            )
-        
-        session.delete(user)
-        session.commit()
-        
-        return {"message": "کاربر حذف شد"}
-    finally:
-        session.close()
+    await run_write(lambda session: session.delete(get_user_or_404(session, user_id)))
+    return {"message": "کاربر حذف شد"}
+
+
+@app.get("/api/admin/cache-stats")
+async def get_cache_stats(current_user: UserModel = Depends(get_current_admin)):
+    """Hit ratio of the product catalog cache (admin only)"""
+    stats = get_product_catalog().stats
+    return {
+        "product_catalog": {
+            "hits": stats.hits,
+            "loads": stats.loads,
+            "write_throughs": stats.write_throughs,
+            "invalidations": stats.invalidations,
+            "hit_ratio": round(stats.hit_ratio, 4)
+        }
+    }
 
 
 # ============== Server Info ==============
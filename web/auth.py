@@ -4,11 +4,14 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from web.config import get_config_manager
-from infrastructure.database.session import SessionLocal
+from infrastructure.database.async_session import get_async_session
 from infrastructure.database.models.user_model import UserModel
 
 
@@ -107,21 +110,23 @@ def decode_token(token: str) -> Optional[TokenData]:
         return None
 
 
-def get_user_by_username(username: str) -> Optional[UserModel]:
+# Runs on every authenticated request; built once so only the parameter changes
+_USER_BY_USERNAME = select(UserModel).where(UserModel.username == bindparam("username"))
+
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[UserModel]:
     """Get a user by username from the database"""
-    session = SessionLocal()
-    try:
-        return session.query(UserModel).filter_by(username=username).first()
-    finally:
-        session.close()
+    result = await db.execute(_USER_BY_USERNAME, {"username": username})
+    return result.scalars().first()
 
 
-def authenticate_user(username: str, password: str) -> Optional[UserModel]:
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[UserModel]:
     """Authenticate a user with username and password"""
-    user = get_user_by_username(username)
+    user = await get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    # bcrypt is deliberately slow; keep it off the event loop
+    if not await run_in_threadpool(verify_password, password, user.password_hash):
         return None
     if not user.is_active:
         return None
@@ -129,7 +134,8 @@ def authenticate_user(username: str, password: str) -> Optional[UserModel]:
 
 
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_session)
 ) -> UserModel:
     """Get the current authenticated user from the JWT token"""
     credentials_exception = HTTPException(
@@ -144,7 +150,7 @@ async def get_current_user(
     if token_data is None:
         raise credentials_exception
     
-    user = get_user_by_username(token_data.username)
+    user = await get_user_by_username(db, token_data.username)
     if user is None:
         raise credentials_exception
     
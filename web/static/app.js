@@ -122,7 +122,13 @@ class API {
             
             if (!response.ok) {
                 const error = await response.json();
-                throw new Error(error.detail || 'Request failed');
+                // detail is a message, or an object with one (e.g. a 409 with a merge)
+                const message = typeof error.detail === 'object' && error.detail !== null
+                    ? error.detail.message : error.detail;
+                const requestError = new Error(message || 'Request failed');
+                requestError.status = response.status;
+                requestError.detail = error.detail;
+                throw requestError;
             }
             
             return await response.json();
@@ -142,10 +148,11 @@ class API {
         });
     }
     
-    static async put(url, data) {
+    static async put(url, data, headers = {}) {
         return this.request(url, {
             method: 'PUT',
             body: JSON.stringify(data),
+            headers,
         });
     }
     
@@ -287,14 +294,18 @@ class ProductsManager {
 class OrdersManager {
     constructor() {
         this.orders = [];
+        this.limit = 100;
+        this.changeCursor = null;
     }
     
     async loadOrders(statusFilter = null) {
         try {
-            let url = '/api/orders?limit=100';
+            let url = `/api/orders?limit=${this.limit}`;
             if (statusFilter) {
                 url += `&status_filter=${statusFilter}`;
             }
+            // Cursor first: anything written while the list loads is synced later
+            this.changeCursor = await this.fetchChangeCursor();
             this.orders = await API.get(url);
             return this.orders;
         } catch (error) {
@@ -303,6 +314,51 @@ class OrdersManager {
         }
     }
     
+    // Server change cursor; it only moves when an order is written
+    async fetchChangeCursor() {
+        const changes = await API.get('/api/orders/changes');
+        return changes.cursor;
+    }
+    
+    // Merge orders changed since the last load; returns false when nothing changed
+    async syncChanges() {
+        if (this.changeCursor === null) {
+            await this.loadOrders();
+            return true;
+        }
+        try {
+            let changed = false;
+            let page;
+            do {
+                page = await API.get(`/api/orders/changes?since=${this.changeCursor}&limit=${this.limit}`);
+                if (page.reset) {
+                    // Orders were archived or restored over: they are not in the changes
+                    await this.loadOrders();
+                    return true;
+                }
+                this.changeCursor = page.cursor;
+                for (const order of page.orders) {
+                    const index = this.orders.findIndex(o => o.id === order.id);
+                    if (index >= 0) {
+                        this.orders[index] = order;
+                    } else {
+                        this.orders.push(order);
+                    }
+                    changed = true;
+                }
+            } while (page.has_more);
+            
+            if (changed) {
+                this.orders.sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+                this.orders = this.orders.slice(0, this.limit);
+            }
+            return changed;
+        } catch (error) {
+            console.error('Error syncing orders:', error);
+            throw error;
+        }
+    }
+    
     async getOrder(orderId) {
         try {
             return await API.get(`/api/orders/${orderId}`);
@@ -322,9 +378,14 @@ class OrdersManager {
         }
     }
     
-    async updateOrder(orderId, orderData) {
+    // With the version that was loaded the server answers 409 (error.status)
+    // instead of overwriting changes made elsewhere in the meantime; when
+    // orderData.base is the order as loaded, error.detail.merged is the edit
+    // merged onto the newer version
+    async updateOrder(orderId, orderData, version = null) {
         try {
-            const order = await API.put(`/api/orders/${orderId}`, orderData);
+            const headers = version !== null ? { 'If-Match': `"${version}"` } : {};
+            const order = await API.put(`/api/orders/${orderId}`, orderData, headers);
             return order;
         } catch (error) {
             console.error('Error updating order:', error);